@@ -6,14 +6,25 @@ backend_dir = Path(__file__).parent
 if str(backend_dir) not in sys.path:
     sys.path.insert(0, str(backend_dir))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.routes import casos
+from src.utils.temp_cleanup import TempCleaner
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Limpieza periódica de archivos temporales (antes se hacía en cada previsualización)
+    temp_cleaner = TempCleaner()
+    temp_cleaner.start()
+    yield
+    temp_cleaner.stop()
 
 app = FastAPI(
     title="SEC Reclamos API",
     description="API para gestión de reclamos SEC",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS para permitir requests desde el frontend
@@ -23,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],  # Paginación de GET /api/casos y ETags
 )
 
 # Incluir routers
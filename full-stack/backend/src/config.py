@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # La raíz del directorio del backend, definida como el directorio padre de 'src'.
@@ -20,9 +21,69 @@ SCRAPERS_DIR = BACKEND_ROOT / "scrapers"  # Directorio para scrapers personaliza
 
 # --- Archivos de Datos Específicos ---
 MOCK_CASOS_PATH = DATA_DIR / "mock_casos.json"
+# Manifiesto de compilación incremental del OMC (huellas de archivos y registros por caso)
+OMC_MANIFEST_PATH = DATABASE_DIR / "omc_manifest.json"
+OMC_RECORDS_DIR = DATABASE_DIR / "omc_records"
+# Catálogo de archivos por caso (lo escribe create_json_database.py; el backend lo valida con los mtime de los directorios)
+FILE_CATALOG_PATH = DATABASE_DIR / "file_catalog.json"
 
 # --- Directorios de Plantillas ---
 TEMPLATES_DIR = BACKEND_ROOT / "templates"
 CHECKLIST_TEMPLATES_DIR = TEMPLATES_DIR / "checklist"
 RESOLUCION_TEMPLATES_DIR = TEMPLATES_DIR / "resolucion"
 EXPEDIENTE_TEMPLATES_DIR = TEMPLATES_DIR / "expediente"
+
+# --- Backend de almacenamiento ---
+# "json" (archivos en DATABASE_DIR) o "sqlite" (DBManager sobre SQLITE_DB_PATH)
+STORAGE_BACKEND = os.environ.get("SEC_STORAGE_BACKEND", "json").lower()
+SQLITE_DB_PATH = DATA_DIR / "sec_reclamos.db"
+# Los archivos de la base JSON se escriben compactos; SEC_JSON_DB_PRETTY=1 los indenta (diffs legibles en git)
+JSON_DB_PRETTY = os.environ.get("SEC_JSON_DB_PRETTY", "0").lower() in ("1", "true", "yes")
+# EDNs de la base JSON: un archivo por caso en DATABASE_DIR/edn/, con un LRU de EDNs en memoria
+EDN_CACHE_SIZE = int(os.environ.get("SEC_EDN_CACHE_SIZE", "256"))
+# Registros en edn.log.jsonl (log de mutaciones de EDN) que disparan su compactación en los archivos por caso (0 = nunca)
+EDN_LOG_COMPACT_RECORDS = int(os.environ.get("SEC_EDN_LOG_COMPACT_RECORDS", "500"))
+# Estado compartido entre workers de uvicorn (cambios en memoria de los casos y registro de cambios), SQLite en modo WAL
+SHARED_STATE_PATH = Path(os.environ.get("SEC_SHARED_STATE_PATH", str(DATABASE_DIR / "shared_state.db")))
+
+# --- Motor OMC ---
+# Número de procesos para extraer archivos de un caso en paralelo (1 = modo serial)
+OMC_MAX_WORKERS = int(os.environ.get("OMC_MAX_WORKERS", "1"))
+# Cache persistente de extracción de texto (por SHA-256 del archivo); tamaño máximo en MB (0 = deshabilitado)
+EXTRACTION_CACHE_DIR = DATA_DIR / "cache" / "extraction"
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("OMC_EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Pre-renderizar al compilar la vista previa de los DOCX (en PREVIEW_CACHE_DIR, en segundo plano)
+OMC_PRERENDER_PREVIEWS = os.environ.get("OMC_PRERENDER_PREVIEWS", "1").lower() in ("1", "true", "yes")
+# Páginas de cada documento crítico (level_1_critical) que se renderizan al compilar, como página y miniatura (0 = ninguna)
+OMC_PRERENDER_PAGES = int(os.environ.get("OMC_PRERENDER_PAGES", "2"))
+
+# --- Conversión de documentos (vista previa de DOCX) ---
+# Procesos de LibreOffice headless que se mantienen abiertos para convertir a PDF
+OFFICE_WORKERS = int(os.environ.get("SEC_OFFICE_WORKERS", "2"))
+# Conversiones en espera como máximo; con la cola llena la vista previa responde 503 (reintentar)
+OFFICE_QUEUE_SIZE = int(os.environ.get("SEC_OFFICE_QUEUE_SIZE", "16"))
+# Segundos máximos por conversión (al vencer se cierra el proceso de office y se lanza otro)
+OFFICE_JOB_TIMEOUT = int(os.environ.get("SEC_OFFICE_JOB_TIMEOUT", "60"))
+# Segundos que un request espera su conversión (cola incluida); al vencer responde 503 y la conversión sigue en curso
+OFFICE_WAIT_TIMEOUT = int(os.environ.get("SEC_OFFICE_WAIT_TIMEOUT", str(OFFICE_JOB_TIMEOUT)))
+# Cache persistente de los PDFs convertidos (por dispositivo, inodo, tamaño y mtime del DOCX); tamaño máximo en MB (0 = sin límite)
+PREVIEW_CACHE_DIR = DATA_DIR / "cache" / "previews"
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("SEC_PREVIEW_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# --- Renderizado de páginas (imágenes de páginas y miniaturas de documentos) ---
+# Cache persistente de las páginas renderizadas; tamaño máximo en MB (0 = sin límite)
+PAGE_CACHE_DIR = DATA_DIR / "cache" / "pages"
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("SEC_PAGE_CACHE_MAX_MB", "256")) * 1024 * 1024
+# Resolución por defecto de una página y de una miniatura; las pedidas se limitan a [MIN, MAX]
+PAGE_RENDER_DPI = int(os.environ.get("SEC_PAGE_RENDER_DPI", "110"))
+PAGE_THUMBNAIL_DPI = int(os.environ.get("SEC_PAGE_THUMBNAIL_DPI", "24"))
+PAGE_RENDER_MIN_DPI = 12
+PAGE_RENDER_MAX_DPI = int(os.environ.get("SEC_PAGE_RENDER_MAX_DPI", "300"))
+
+# --- Previsualización de resoluciones ---
+# PDFs de previsualización que se mantienen en memoria por worker (LRU por hash de contenido y datos del caso; 0 = sin cache)
+RESOLUCION_PREVIEW_CACHE_SIZE = int(os.environ.get("SEC_RESOLUCION_PREVIEW_CACHE_SIZE", "32"))
+# Cada cuántos segundos se limpian en segundo plano los archivos antiguos de TEMP_PDFS_DIR (0 = nunca)
+TEMP_CLEANUP_INTERVAL = int(os.environ.get("SEC_TEMP_CLEANUP_INTERVAL", "900"))
+# Edad en horas a partir de la cual un archivo de TEMP_PDFS_DIR se considera antiguo
+TEMP_MAX_AGE_HOURS = int(os.environ.get("SEC_TEMP_MAX_AGE_HOURS", "1"))
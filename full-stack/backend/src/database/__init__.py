@@ -4,6 +4,7 @@ Módulo de gestión de base de datos
 
 from .db_manager import DBManager
 from .json_db_manager import JSONDBManager
+from .factory import get_db_manager
 
-__all__ = ['DBManager', 'JSONDBManager']
+__all__ = ['DBManager', 'JSONDBManager', 'get_db_manager']
 
@@ -0,0 +1,155 @@
+"""
+Benchmark de los backends de almacenamiento (JSON vs SQLite)
+Genera un corpus sintético clonando los casos de data/DataBase/ y mide lecturas y escrituras
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Agregar el directorio backend al path para imports
+# Este script está en: full-stack/backend/src/database/benchmark_storage.py
+backend_dir = Path(__file__).resolve().parent.parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from src.config import DATABASE_DIR
+from src.database.db_manager import DBManager
+from src.database.json_db_manager import JSONDBManager
+from src.utils.benchmark import timed
+
+
+def build_corpus(target_dir: Path, num_cases: int, source_dir: Path = DATABASE_DIR):
+    """
+    Escribe una base JSON sintética con num_cases casos clonados de la base real
+    
+    Args:
+        target_dir: Directorio donde escribir los archivos JSON
+        num_cases: Número de casos a generar
+        source_dir: Base JSON de la que se clonan los casos
+    """
+    def load(name):
+        with open(source_dir / name, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    src_casos, src_edns = load("casos.json"), load("edn.json")
+    src_personas, src_suministros = load("personas.json"), load("suministros.json")
+    src_documentos = load("documentos.json")
+    docs_by_case: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in src_documentos:
+        docs_by_case.setdefault(doc.get("case_id"), []).append(doc)
+    
+    personas, suministros, casos, edns, documentos = [], [], [], {}, []
+    for i in range(num_cases):
+        base = src_casos[i % len(src_casos)]
+        case_id = f"BENCH-{i:06d}"
+        persona = dict(next(p for p in src_personas if p["id"] == base["persona_id"]))
+        persona.update(id=i + 1, rut=f"{i:08d}-B")
+        suministro = dict(next(s for s in src_suministros if s["id"] == base["suministro_id"]))
+        suministro.update(id=i + 1, nis=f"NIS-{i:06d}")
+        personas.append(persona)
+        suministros.append(suministro)
+        
+        edn = json.loads(json.dumps(src_edns.get(base["case_id"], {})))
+        edn.setdefault("compilation_metadata", {})["case_id"] = case_id
+        unified_context = edn.setdefault("unified_context", {})
+        unified_context.update(rut_client=persona["rut"], service_nis=suministro["nis"])
+        edns[case_id] = edn
+        casos.append(dict(base, id=i + 1, case_id=case_id, persona_id=i + 1, suministro_id=i + 1))
+        for doc in docs_by_case.get(base["case_id"], []):
+            documentos.append(dict(doc, id=len(documentos) + 1, caso_id=i + 1, case_id=case_id))
+    
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for name, data in [("casos.json", casos), ("edn.json", edns), ("personas.json", personas),
+                       ("suministros.json", suministros), ("documentos.json", documentos)]:
+        with open(target_dir / name, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def run_benchmark(manager, case_ids: List[str], reads: int, writes: int) -> Dict[str, float]:
+    """Mide las operaciones que usa la API sobre un gestor ya inicializado"""
+    rng = random.Random(42)
+    results = {}
+    
+    read_ids = [rng.choice(case_ids) for _ in range(reads)]
+    times = [timed(lambda cid=cid: manager.get_caso_by_case_id(cid))[0] for cid in read_ids]
+    results["get_caso_by_case_id (ms, mediana)"] = statistics.median(times)
+    
+    results["get_all_casos (ms)"] = min(timed(manager.get_all_casos, repeat=3))
+    
+    # Página del listado ordenada por una columna, al inicio y al final del corpus
+    list_page = lambda offset: manager.list_casos(sort_by="client_name", offset=offset, limit=100)
+    results["list_casos página 1 (ms)"] = min(timed(lambda: list_page(0), repeat=3))
+    results["list_casos última página (ms)"] = min(timed(lambda: list_page(len(case_ids) - 100), repeat=3))
+    
+    # Consultas típicas del buscador: RUT compacto, prefijo de NIS y nombre de documento
+    queries = [f"{rng.randrange(len(case_ids)):08d}" for _ in range(10)] + ["NIS-0001", "carta resp"]
+    times = [timed(lambda q=q: manager.search_casos(q))[0] for q in queries]
+    results["search_casos (ms, mediana)"] = statistics.median(times)
+    
+    write_ids = [rng.choice(case_ids) for _ in range(writes)]
+    times = []
+    for cid in write_ids:
+        edn = manager.get_caso_by_case_id(cid)
+        edn = {k: v for k, v in edn.items() if k not in ['materia', 'monto_disputa', 'empresa', 'fecha_ingreso']}
+        edn["unified_context"]["email"] = f"{cid.lower()}@example.com"
+        times.extend(timed(lambda: manager.update_edn(cid, edn)))
+    results["update_edn (ms, mediana)"] = statistics.median(times)
+    
+    times = [timed(lambda cid=cid: manager.update_caso(cid, {"estado": "EN_REVISION"}))[0] for cid in write_ids]
+    results["update_caso (ms, mediana)"] = statistics.median(times)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los backends de almacenamiento JSON y SQLite")
+    parser.add_argument("--cases", type=int, default=10000, help="Casos del corpus sintético (default: 10000)")
+    parser.add_argument("--reads", type=int, default=500, help="Lecturas aleatorias de un caso (default: 500)")
+    parser.add_argument("--writes", type=int, default=20, help="Escrituras aleatorias (default: 20)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        print(f"Generando corpus sintético de {args.cases} casos...")
+        build_corpus(json_dir, args.cases)
+        case_ids = [f"BENCH-{i:06d}" for i in range(args.cases)]
+        
+        # JSONDBManager es singleton: descartar la instancia previa para apuntar al corpus.
+        # El primer inicio parte edn.json en archivos por caso; el segundo sólo lee el índice
+        JSONDBManager._instance = None
+        split_ms = timed(lambda: JSONDBManager(base_path=json_dir))[0]
+        JSONDBManager._instance = None
+        tracemalloc.start()
+        load_ms = timed(lambda: JSONDBManager(base_path=json_dir))[0]
+        json_memory_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        tracemalloc.stop()
+        json_manager = JSONDBManager._instance
+        sqlite_manager = DBManager(Path(tmp) / "bench.db")
+        import_ms = timed(lambda: sqlite_manager.import_from_json(json_manager))[0]
+        
+        backends = {
+            "json": ({"inicio (ms)": load_ms, "importación desde edn.json (ms)": split_ms,
+                      "memoria tras inicio (MB)": json_memory_mb}, json_manager),
+            "sqlite": ({"inicio (ms)": timed(lambda: DBManager(Path(tmp) / "bench.db"))[0],
+                        "importación desde JSON (ms)": import_ms}, sqlite_manager),
+        }
+        for name, (results, manager) in backends.items():
+            print(f"Midiendo backend {name}...")
+            results.update(run_benchmark(manager, case_ids, args.reads, args.writes))
+        JSONDBManager._instance = None
+    
+    metrics = list(dict.fromkeys(m for results, _ in backends.values() for m in results))
+    print(f"\n{'Operación':<38}{'json':>14}{'sqlite':>14}")
+    for metric in metrics:
+        row = [backends[name][0].get(metric) for name in backends]
+        print(f"{metric:<38}" + "".join(f"{v:>14.2f}" if v is not None else f"{'-':>14}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Índice del listado de casos (GET /casos): filas resumidas, órdenes precalculados por columna y paginación por cursor
+"""
+
+import base64
+import bisect
+import binascii
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.utils.serialization import dumps, loads
+
+# Normalización de cada columna ordenable del listado (la misma para filas y CaseSummary)
+SORT_KEYS: Dict[str, Callable[[Any], Any]] = {
+    'case_id': lambda v: v,
+    'client_name': lambda v: v.lower(),
+    'rut_client': lambda v: v.lower(),
+    'materia': lambda v: v.lower(),
+    'monto_disputa': lambda v: v or 0,
+    'empresa': lambda v: v.lower(),
+    'status': lambda v: v.value if hasattr(v, 'value') else str(v),
+    'fecha_ingreso': lambda v: v or ''
+}
+
+# Columnas con filtro por igualdad (conjunto de casos por valor)
+FILTER_FIELDS = ('status', 'tipo_caso', 'empresa')
+
+# Si los candidatos filtrados son menos que 1/N del total, se ordenan aparte en vez de recorrer el orden completo
+_SPARSE_RATIO = 16
+
+
+class InvalidCursorError(ValueError):
+    """Cursor mal formado o de otro ordenamiento"""
+
+
+def encode_cursor(column: Optional[str], descending: bool, key: Tuple[Any, int]) -> str:
+    """Cursor opaco que apunta a la última fila entregada"""
+    payload = dumps([column, descending, key[0], key[1]])
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, column: Optional[str], descending: bool) -> Tuple[Any, int]:
+    """
+    Posición (valor, posición) codificada en un cursor
+    
+    Raises:
+        InvalidCursorError: Si el cursor no es válido o es de otro ordenamiento
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_column, cursor_descending, value, position = loads(payload)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursorError("Cursor inválido")
+    if cursor_column != column or cursor_descending != descending:
+        raise InvalidCursorError("El cursor corresponde a otro ordenamiento")
+    return value, position
+
+
+class CaseListIndex:
+    """
+    Filas del listado de casos con los órdenes y filtros que usa GET /casos.
+    
+    - Cada fila tiene una posición fija (orden de casos.json), que desempata los órdenes.
+    - Por cada columna de SORT_KEYS se mantiene una lista ordenada de (valor normalizado, posición),
+      construida la primera vez que se ordena por esa columna y actualizada en cada put().
+    - Por cada columna de FILTER_FIELDS, el conjunto de casos de cada valor.
+    
+    page() pagina por cursor (keyset): el cursor guarda el (valor, posición) de la última fila
+    entregada y la página siguiente empieza con una búsqueda binaria, así que una página profunda
+    cuesta lo mismo que la primera. También acepta un offset, para los clientes que piden por número de página.
+    """
+    
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self._lock = threading.RLock()
+        self.rebuild(rows)
+    
+    def rebuild(self, rows: Iterable[Dict[str, Any]]):
+        """Reemplaza todas las filas (en el orden dado)"""
+        with self._lock:
+            self._rows: Dict[str, Dict[str, Any]] = {}
+            self._positions: Dict[str, int] = {}
+            self._ids_by_position: Dict[int, str] = {}
+            self._sorted: Dict[Tuple[Optional[str], bool], List[Tuple[Any, int]]] = {}
+            self._by_value: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in FILTER_FIELDS}
+            self._next_position = 0
+            for row in rows:
+                self.put(row)
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Fila de un caso, o None si no existe"""
+        return self._rows.get(case_id)
+    
+    def rows(self) -> List[Dict[str, Any]]:
+        """Todas las filas en el orden de casos.json"""
+        with self._lock:
+            return list(self._rows.values())
+    
+    def rows_for(self, case_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Filas de los casos indicados que existen, en el orden de casos.json"""
+        with self._lock:
+            rows = [self._rows[case_id] for case_id in case_ids if case_id in self._rows]
+            rows.sort(key=lambda row: self._positions[row['case_id']])
+            return rows
+    
+    def _key(self, column: Optional[str], descending: bool, row: Dict[str, Any]) -> Tuple[Any, int]:
+        # En orden descendente la posición va negada: al recorrer la lista al revés los empates
+        # quedan en el orden de casos.json, igual que sorted(reverse=True)
+        value = SORT_KEYS[column](row.get(column)) if column else 0
+        position = self._positions[row['case_id']]
+        return value, -position if descending else position
+    
+    def _sorted_keys(self, column: Optional[str], descending: bool = False) -> List[Tuple[Any, int]]:
+        """Lista ordenada de una columna (None = orden de casos.json), construida al primer uso"""
+        keys = self._sorted.get((column, descending))
+        if keys is None:
+            keys = self._sorted[(column, descending)] = sorted(
+                self._key(column, descending, row) for row in self._rows.values()
+            )
+        return keys
+    
+    def put(self, row: Dict[str, Any]):
+        """Agrega o reemplaza la fila de un caso (mantiene los órdenes y filtros ya construidos)"""
+        case_id = row['case_id']
+        with self._lock:
+            previous = self._rows.get(case_id)
+            if previous is not None:
+                self._unlink(previous)
+            else:
+                self._positions[case_id] = self._next_position
+                self._ids_by_position[self._next_position] = case_id
+                self._next_position += 1
+            
+            self._rows[case_id] = row
+            for (column, descending), keys in self._sorted.items():
+                bisect.insort(keys, self._key(column, descending, row))
+            for field in FILTER_FIELDS:
+                self._by_value[field].setdefault(row.get(field), set()).add(case_id)
+    
+    def remove(self, case_id: str):
+        """Quita la fila de un caso"""
+        with self._lock:
+            row = self._rows.get(case_id)
+            if row is None:
+                return
+            self._unlink(row)
+            del self._rows[case_id]
+            del self._ids_by_position[self._positions.pop(case_id)]
+    
+    def _unlink(self, row: Dict[str, Any]):
+        """Saca una fila de los órdenes y filtros (sigue en _rows)"""
+        case_id = row['case_id']
+        for (column, descending), keys in self._sorted.items():
+            key = self._key(column, descending, row)
+            index = bisect.bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                del keys[index]
+        for field in FILTER_FIELDS:
+            ids = self._by_value[field].get(row.get(field))
+            if ids is not None:
+                ids.discard(case_id)
+                if not ids:
+                    del self._by_value[field][row.get(field)]
+    
+    def _candidates(self, candidates: Optional[Set[str]], filters: Dict[str, Any],
+                    fecha_desde: Optional[str], fecha_hasta: Optional[str]) -> Optional[Set[str]]:
+        """Casos que cumplen todos los filtros (None = todos)"""
+        for field, value in filters.items():
+            if value is None:
+                continue
+            ids = self._by_value[field].get(value, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+        
+        if fecha_desde or fecha_hasta:
+            keys = self._sorted_keys('fecha_ingreso')
+            # Sin límite superior se usa una fecha máxima, que además deja fuera las fechas 'N/A'
+            start = bisect.bisect_left(keys, (fecha_desde or '', -1))
+            end = bisect.bisect_right(keys, (fecha_hasta or '9999-12-31', float('inf')))
+            ids = {self._ids_by_position[position] for _, position in keys[start:end]}
+            candidates = ids if candidates is None else candidates & ids
+        return candidates
+    
+    def page(self, sort_by: Optional[str] = None, descending: bool = False,
+             candidates: Optional[Set[str]] = None, filters: Optional[Dict[str, Any]] = None,
+             fecha_desde: Optional[str] = None, fecha_hasta: Optional[str] = None,
+             cursor: Optional[str] = None, offset: int = 0,
+             limit: int = 100) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        Una página del listado
+        
+        Args:
+            sort_by: Columna de SORT_KEYS (otra o None = orden de casos.json)
+            descending: Orden descendente
+            candidates: case_ids a los que restringir el listado (p. ej. resultado de una búsqueda)
+            filters: Igualdades sobre FILTER_FIELDS ({'status': 'CERRADO', ...}); None se ignora
+            fecha_desde: Fecha de ingreso mínima (YYYY-MM-DD, inclusive)
+            fecha_hasta: Fecha de ingreso máxima (YYYY-MM-DD, inclusive)
+            cursor: Cursor de la página anterior (X-Next-Cursor); si se da, se ignora offset
+            offset: Filas a saltar desde el inicio
+            limit: Tamaño de página
+        
+        Returns:
+            (filas de la página, total de filas que cumplen los filtros, cursor de la página siguiente o None)
+        
+        Raises:
+            InvalidCursorError: Si el cursor no es válido para este ordenamiento
+        """
+        column = sort_by.lower() if sort_by and sort_by.lower() in SORT_KEYS else None
+        with self._lock:
+            candidates = self._candidates(candidates, filters or {}, fecha_desde, fecha_hasta)
+            total = len(self._rows) if candidates is None else len(candidates)
+            
+            keys = self._sorted_keys(column, descending)
+            if candidates is not None and len(candidates) * _SPARSE_RATIO < len(keys):
+                # Pocos candidatos: ordenarlos aparte es más barato que recorrer el orden completo
+                keys = sorted(self._key(column, descending, self._rows[case_id]) for case_id in candidates)
+                candidates = None
+            
+            if cursor:
+                start_key = decode_cursor(cursor, column, descending)
+                offset = 0
+                if descending:
+                    start = bisect.bisect_left(keys, tuple(start_key)) - 1
+                else:
+                    start = bisect.bisect_right(keys, tuple(start_key))
+            else:
+                start = len(keys) - 1 if descending else 0
+            if candidates is None and offset:
+                # Sin filtros pendientes el offset se salta directamente
+                start = start - offset if descending else start + offset
+                offset = 0
+            
+            page_keys = []
+            has_more = False
+            for key in self._walk(keys, start, descending):
+                if candidates is not None and self._ids_by_position[abs(key[1])] not in candidates:
+                    continue
+                if offset:
+                    offset -= 1
+                    continue
+                if len(page_keys) == limit:
+                    has_more = True
+                    break
+                page_keys.append(key)
+            
+            rows = [self._rows[self._ids_by_position[abs(position)]] for _, position in page_keys]
+            next_cursor = encode_cursor(column, descending, page_keys[-1]) if has_more and page_keys else None
+            return rows, total, next_cursor
+    
+    @staticmethod
+    def _walk(keys: List[Tuple[Any, int]], start: int, descending: bool) -> Iterator[Tuple[Any, int]]:
+        if descending:
+            for index in range(start, -1, -1):
+                yield keys[index]
+        else:
+            for index in range(start, len(keys)):
+                yield keys[index]
@@ -1,16 +1,60 @@
 """
 Gestor de base de datos con esquema estrella y lógica de upsert
+
+Implementa la misma interfaz de lectura/escritura que JSONDBManager, por lo que
+puede usarse como backend de almacenamiento de la API (ver src/database/factory.py).
 """
 
 import sqlite3
 import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import logging
 
+from src.database.json_db_manager import SUMMARY_STATUSES
+from src.database.case_list_index import CaseListIndex
+from src.database.document_index import find_inventory_documento
+from src.database.search_index import CaseSearchIndex, document_names
+
 logger = logging.getLogger(__name__)
 
+# Valores de unified_context que no cuentan como dato real
+_PLACEHOLDERS = ['—', 'N/A', '']
+
+# Columnas de casos que se pueden actualizar con update_caso
+_CASO_FIELDS = ['empresa', 'materia', 'monto_disputa', 'fecha_ingreso', 'estado', 'fecha_cierre']
+
+# Columnas de casos que se leen como fila de casos.json (sin EDN)
+_CASO_COLUMNS = ['id', 'case_id', 'persona_id', 'suministro_id', 'empresa', 'materia',
+                 'monto_disputa', 'fecha_ingreso', 'estado', 'fecha_cierre']
+
+# Columnas de documentos que se pueden actualizar con update_documento
+_DOCUMENTO_FIELDS = ['type', 'standardized_name', 'level', 'file_path', 'relative_path']
+
+# Filas del listado de casos escritas después de un seq (ver _summary_from_row);
+# json_extract evita deserializar el EDN completo de cada caso en Python
+_SUMMARY_QUERY = '''
+    SELECT c.case_id, c.seq, c.empresa, c.materia, c.monto_disputa, c.fecha_ingreso, c.estado,
+           json_extract(c.edn_json, '$.unified_context.client_name') as edn_client_name,
+           json_extract(c.edn_json, '$.unified_context.rut_client') as edn_rut_client,
+           json_extract(c.edn_json, '$.materia') as edn_materia,
+           json_extract(c.edn_json, '$.monto_disputa') as edn_monto_disputa,
+           json_extract(c.edn_json, '$.compilation_metadata.tipo_caso') as tipo_caso,
+           p.nombre as persona_nombre, p.rut as persona_rut{search_columns}
+    FROM casos c
+    LEFT JOIN personas p ON c.persona_id = p.id
+    WHERE c.seq > ?
+    ORDER BY c.id
+'''
+
+# Columnas extra de _SUMMARY_QUERY para los términos de búsqueda (NIS y nombres de documentos)
+_SEARCH_COLUMNS = ''',
+           json_extract(c.edn_json, '$.unified_context.service_nis') as service_nis,
+           json_extract(c.edn_json, '$.document_inventory') as document_inventory'''
+
 
 class DBManager:
     """Gestor de base de datos SQLite con esquema estrella"""
@@ -22,22 +66,49 @@ class DBManager:
         Args:
             db_path: Ruta al archivo de base de datos
         """
-        self.db_path = db_path
+        self.db_path = str(db_path)
         # Crear directorio si no existe
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._create_schema()
+        
+        # Listado e índice de búsqueda en memoria, puestos al día con los seq de casos en cada lectura
+        # (ver _sync_case_list); el índice de búsqueda se construye la primera vez que se busca
+        self.case_list = CaseListIndex()
+        self.search_index = CaseSearchIndex()
+        self._search_index_ready = False
+        self._synced_seq: Optional[int] = None
+        self._sync_lock = threading.Lock()
     
     def _get_connection(self):
         """Obtiene una conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=30)
         conn.row_factory = sqlite3.Row
+        # Con WAL, NORMAL sólo arriesga la última transacción ante un corte de energía
+        conn.execute("PRAGMA synchronous=NORMAL")
         return conn
     
+    @contextmanager
+    def _transaction(self):
+        """Conexión con una transacción de escritura: commit al salir, rollback si hay error"""
+        conn = self._get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
     def _create_schema(self):
         """Crea el esquema de base de datos si no existe"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # WAL: los lectores no bloquean al escritor (persistente en el archivo de base de datos)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # Tabla PERSONAS
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS personas (
@@ -103,10 +174,53 @@ class DBManager:
             )
         ''')
         
+        # Columnas agregadas después de la versión inicial del esquema
+        self._add_missing_columns(cursor, 'casos', {'fecha_cierre': 'TEXT', 'seq': 'INTEGER NOT NULL DEFAULT 0'})
+        self._add_missing_columns(cursor, 'documentos', {'relative_path': 'TEXT'})
+        
+        # Índices: case_id, rut y (nis, comuna) ya están indexados por sus restricciones UNIQUE;
+        # el índice (nis, comuna) también sirve para búsquedas sólo por NIS
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_casos_persona_id ON casos(persona_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_casos_suministro_id ON casos(suministro_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documentos_file_id ON documentos(file_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_casos_seq ON casos(seq)")
+        
+        # seq: contador de cambios de casos, compartido por todos los procesos que escriben la base.
+        # Cada escritura de un caso (o de la persona de la que sale su nombre de cliente) le asigna
+        # el siguiente valor, así que cada proceso lee sólo los casos cambiados desde su última lectura
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_seq_insert AFTER INSERT ON casos
+            BEGIN
+                UPDATE casos SET seq = (SELECT MAX(seq) FROM casos) + 1 WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS casos_seq_update AFTER UPDATE ON casos
+            WHEN NEW.seq = OLD.seq
+            BEGIN
+                UPDATE casos SET seq = (SELECT MAX(seq) FROM casos) + 1 WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS personas_seq_update AFTER UPDATE ON personas
+            BEGIN
+                UPDATE casos SET seq = (SELECT MAX(seq) FROM casos) + 1 WHERE persona_id = NEW.id;
+            END
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info("Esquema de base de datos inicializado")
     
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+        """Agrega a una tabla existente las columnas que le falten"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, col_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+    
     def upsert_persona(self, rut: str, nombre: Optional[str] = None, 
                       email: Optional[str] = None, telefono: Optional[str] = None) -> int:
         """
@@ -117,7 +231,7 @@ class DBManager:
             nombre: Nombre (opcional)
             email: Email (opcional)
             telefono: Teléfono (opcional)
-            
+        
         Returns:
             ID de la persona
         """
@@ -177,7 +291,7 @@ class DBManager:
             comuna: Comuna
             direccion: Dirección (opcional)
             numero_cliente: Número de cliente (opcional)
-            
+        
         Returns:
             ID del suministro
         """
@@ -234,7 +348,7 @@ class DBManager:
             materia: Materia (opcional)
             monto_disputa: Monto en disputa (opcional)
             fecha_ingreso: Fecha de ingreso (opcional)
-            
+        
         Returns:
             ID del caso
         """
@@ -278,7 +392,8 @@ class DBManager:
                         doc_type: str, level: str, file_path: Optional[str] = None,
                         standardized_name: Optional[str] = None,
                         extracted_data: Optional[Dict] = None,
-                        metadata: Optional[Dict] = None):
+                        metadata: Optional[Dict] = None,
+                        relative_path: Optional[str] = None):
         """
         Inserta o actualiza un documento
         
@@ -292,6 +407,7 @@ class DBManager:
             standardized_name: Nombre estandarizado (opcional)
             extracted_data: Datos extraídos (opcional)
             metadata: Metadatos (opcional)
+            relative_path: Ruta relativa desde FILES_DIR (opcional)
         """
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -309,70 +425,618 @@ class DBManager:
             cursor.execute('''
                 UPDATE documentos 
                 SET original_name = ?, standardized_name = ?, type = ?, level = ?,
-                    file_path = ?, extracted_data = ?, metadata = ?
+                    file_path = ?, relative_path = ?, extracted_data = ?, metadata = ?
                 WHERE id = ?
-            ''', (original_name, standardized_name, doc_type, level, file_path,
+            ''', (original_name, standardized_name, doc_type, level, file_path, relative_path,
                   extracted_data_json, metadata_json, row['id']))
         else:
             # Insertar
             cursor.execute('''
                 INSERT INTO documentos (caso_id, file_id, original_name, standardized_name,
-                                      type, level, file_path, extracted_data, metadata,
-                                      fecha_creacion)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                      type, level, file_path, relative_path, extracted_data,
+                                      metadata, fecha_creacion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (caso_id, file_id, original_name, standardized_name, doc_type, level,
-                  file_path, extracted_data_json, metadata_json, datetime.utcnow().isoformat()))
+                  file_path, relative_path, extracted_data_json, metadata_json,
+                  datetime.utcnow().isoformat()))
         
         conn.commit()
         conn.close()
     
+    # --- Interfaz de almacenamiento compartida con JSONDBManager ---
+    
+    @staticmethod
+    def _caso_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """Fila de casos con el mismo formato que casos.json"""
+        caso = {
+            "id": row['id'],
+            "case_id": row['case_id'],
+            "persona_id": row['persona_id'],
+            "suministro_id": row['suministro_id'],
+            "empresa": row['empresa'],
+            "materia": row['materia'],
+            "monto_disputa": row['monto_disputa'],
+            "fecha_ingreso": row['fecha_ingreso'],
+            "estado": row['estado']
+        }
+        if row['fecha_cierre']:
+            caso["fecha_cierre"] = row['fecha_cierre']
+        return caso
+    
+    @staticmethod
+    def _persona_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {"id": row['id'], "rut": row['rut'], "nombre": row['nombre'],
+                "email": row['email'], "telefono": row['telefono']}
+    
+    @staticmethod
+    def _suministro_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {"id": row['id'], "nis": row['nis'], "comuna": row['comuna'],
+                "direccion": row['direccion'], "numero_cliente": row['numero_cliente']}
+    
+    @staticmethod
+    def _documento_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """Fila de documentos con el mismo formato que documentos.json"""
+        documento = {
+            "id": row['id'],
+            "caso_id": row['caso_id'],
+            "case_id": row['case_id'],
+            "type": row['type'],
+            "file_id": row['file_id'],
+            "original_name": row['original_name'],
+            "standardized_name": row['standardized_name'],
+            "file_path": row['file_path'],
+            "relative_path": row['relative_path'],
+            "level": row['level']
+        }
+        if row['extracted_data']:
+            documento['extracted_data'] = json.loads(row['extracted_data'])
+        if row['metadata']:
+            documento['metadata'] = json.loads(row['metadata'])
+        return documento
+    
+    def count_casos(self) -> int:
+        """Número de casos en la base"""
+        conn = self._get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM casos").fetchone()[0]
+        conn.close()
+        return count
+    
+    def get_caso_record(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Fila de un caso (sin EDN), o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute(f"SELECT {', '.join(_CASO_COLUMNS)} FROM casos WHERE case_id = ?", (case_id,)).fetchone()
+        conn.close()
+        return self._caso_from_row(row) if row else None
+    
+    def get_persona_by_id(self, persona_id: Any) -> Optional[Dict[str, Any]]:
+        """Persona por su id, o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute("SELECT * FROM personas WHERE id = ?", (persona_id,)).fetchone()
+        conn.close()
+        return self._persona_from_row(row) if row else None
+    
+    def get_persona_by_rut(self, rut: str) -> Optional[Dict[str, Any]]:
+        """Persona por su RUT, o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute("SELECT * FROM personas WHERE rut = ?", (rut,)).fetchone()
+        conn.close()
+        return self._persona_from_row(row) if row else None
+    
+    def get_suministro_by_id(self, suministro_id: Any) -> Optional[Dict[str, Any]]:
+        """Suministro por su id, o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute("SELECT * FROM suministros WHERE id = ?", (suministro_id,)).fetchone()
+        conn.close()
+        return self._suministro_from_row(row) if row else None
+    
+    def get_casos_by_rut(self, rut: str) -> List[Dict[str, Any]]:
+        """Filas de casos de la persona con ese RUT"""
+        conn = self._get_connection()
+        rows = conn.execute(f'''
+            SELECT {', '.join('c.' + col for col in _CASO_COLUMNS)}
+            FROM casos c JOIN personas p ON c.persona_id = p.id
+            WHERE p.rut = ?
+            ORDER BY c.id
+        ''', (rut,)).fetchall()
+        conn.close()
+        return [self._caso_from_row(row) for row in rows]
+    
     def get_caso_by_case_id(self, case_id: str) -> Optional[Dict[str, Any]]:
         """
-        Obtiene un caso por su case_id
+        Obtiene un caso por su case_id, fusionando metadatos del caso con el EDN
         
         Args:
             case_id: ID del caso
-            
+        
         Returns:
-            Diccionario con el EDN o None si no existe
+            Diccionario con el EDN fusionado con metadatos del caso, o None si no existe
         """
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT edn_json FROM casos WHERE case_id = ?", (case_id,))
+        cursor.execute(
+            "SELECT edn_json, materia, monto_disputa, empresa, fecha_ingreso FROM casos WHERE case_id = ?",
+            (case_id,)
+        )
         row = cursor.fetchone()
         conn.close()
         
-        if row:
+        if not row:
+            return None
+        
+        # Fusionar metadatos del caso con el EDN (mismo formato que JSONDBManager)
+        merged = json.loads(row['edn_json']) if row['edn_json'] else {}
+        merged['materia'] = row['materia']
+        merged['monto_disputa'] = row['monto_disputa']
+        merged['empresa'] = row['empresa']
+        merged['fecha_ingreso'] = row['fecha_ingreso']
+        return merged
+    
+    @staticmethod
+    def _summary_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """
+        Fila del listado de casos a partir de una fila de _SUMMARY_QUERY
+        Usa el EDN como fuente de verdad para unified_context (cliente, RUT, etc.)
+        """
+        case_id = row['case_id']
+        client_name = row['edn_client_name']
+        rut_client = row['edn_rut_client']
+
+        # Fallback a personas solo si no hay datos en EDN
+        if not client_name or client_name in ('—', 'N/A'):
+            if row['persona_nombre'] is not None or row['persona_rut'] is not None:
+                client_name = row['persona_nombre'] or 'N/A'
+                if not rut_client or rut_client in ('—', 'N/A'):
+                    rut_client = row['persona_rut'] or 'N/A'
+
+        # Si aún no hay nombre, usar un placeholder
+        if not client_name or client_name == '—':
+            client_name = f"Cliente {case_id}"
+        if not rut_client or rut_client == '—':
+            rut_client = f"RUT-{case_id}"
+        
+        materia = row['materia'] or row['edn_materia'] or row['tipo_caso'] or 'N/A'
+        if materia == 'Reclamo SEC' and row['tipo_caso']:
+            materia = row['tipo_caso']
+        
+        try:
+            monto_disputa = float(row['monto_disputa'] or row['edn_monto_disputa'] or 0)
+        except (TypeError, ValueError):
+            monto_disputa = 0.0
+        
+        estado = row['estado'] or 'PENDIENTE'
+        return {
+            'case_id': case_id,
+            'empresa': row['empresa'] or 'N/A',
+            'materia': materia,
+            'monto_disputa': monto_disputa,
+            'fecha_ingreso': row['fecha_ingreso'] or 'N/A',
+            'estado': estado,
+            'status': estado if estado in SUMMARY_STATUSES else 'PENDIENTE',
+            'client_name': client_name,
+            'rut_client': rut_client,
+            'tipo_caso': row['tipo_caso']
+        }
+    
+    @staticmethod
+    def _search_terms(row: Dict[str, Any], extra: sqlite3.Row) -> set:
+        """Términos del índice de búsqueda de un caso (NIS y documentos desde las columnas _SEARCH_COLUMNS)"""
+        inventory = json.loads(extra['document_inventory']) if extra['document_inventory'] else {}
+        return CaseSearchIndex.case_terms(row, extra['service_nis'], document_names(inventory))
+    
+    def _sync_case_list(self):
+        """
+        Pone al día el listado y el índice de búsqueda con los casos escritos desde la última
+        lectura, por este o por otro proceso (seq mayor que el último visto)
+        
+        Si no hubo escrituras cuesta una consulta sobre el índice de seq. Si la base tiene menos
+        casos que el listado o un seq menor (base reemplazada), se vuelve a leer completa.
+        """
+        with self._sync_lock:
+            conn = self._get_connection()
+            try:
+                # Conteo y filas de la misma instantánea de la base
+                conn.execute("BEGIN")
+                count, max_seq = conn.execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM casos").fetchone()
+                if max_seq == self._synced_seq and count == len(self.case_list):
+                    return
+                
+                full = self._synced_seq is None or max_seq < self._synced_seq
+                if not full:
+                    search_columns = _SEARCH_COLUMNS if self._search_index_ready else ''
+                    changed = conn.execute(_SUMMARY_QUERY.format(search_columns=search_columns),
+                                           (self._synced_seq,)).fetchall()
+                    for extra in changed:
+                        row = self._summary_from_row(extra)
+                        self.case_list.put(row)
+                        if self._search_index_ready:
+                            self.search_index.put(row['case_id'], self._search_terms(row, extra))
+                    # Casos eliminados: no tienen seq nuevo, sólo se notan en el conteo
+                    full = count != len(self.case_list)
+                
+                if full:
+                    rows = conn.execute(_SUMMARY_QUERY.format(search_columns=''), (-1,)).fetchall()
+                    self.case_list.rebuild(self._summary_from_row(row) for row in rows)
+                    self.search_index.clear()
+                    self._search_index_ready = False
+                self._synced_seq = max_seq
+            finally:
+                conn.close()
+    
+    def get_all_casos(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene todos los casos con información resumida (ver _summary_from_row)
+        
+        Las filas vienen del listado en memoria, que sólo relee los casos cambiados (ver
+        _sync_case_list). Las filas son compartidas: no modificarlas.
+        
+        Returns:
+            Lista de diccionarios con información resumida de casos, en orden de id
+        """
+        self._sync_case_list()
+        return self.case_list.rows()
+    
+    def _search_case_ids(self, query: str) -> Optional[set]:
+        """case_ids que coinciden con la consulta (None si no tiene términos); construye el índice al primer uso"""
+        self._sync_case_list()
+        with self._sync_lock:
+            if not self._search_index_ready:
+                conn = self._get_connection()
+                extras = conn.execute(_SUMMARY_QUERY.format(search_columns=_SEARCH_COLUMNS), (-1,)).fetchall()
+                conn.close()
+                # Los casos escritos después de la última sincronización entran en la siguiente
+                self.search_index.rebuild({
+                    extra['case_id']: self._search_terms(row, extra)
+                    for extra in extras
+                    for row in [self.case_list.get(extra['case_id'])] if row is not None
+                })
+                self._search_index_ready = True
+        return self.search_index.search(query)
+    
+    def search_casos(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Busca casos con las mismas reglas que JSONDBManager.search_casos (ver CaseSearchIndex)
+        
+        El índice invertido se mantiene en memoria y se actualiza caso a caso con los seq
+        (ver _sync_case_list), así que una búsqueda no recorre los EDNs.
+        
+        Args:
+            query: Texto buscado
+        
+        Returns:
+            Filas de get_all_casos que coinciden, en orden de id
+        """
+        case_ids = self._search_case_ids(query)
+        if case_ids is None:
+            return self.get_all_casos()
+        return self.case_list.rows_for(case_ids)
+    
+    def list_casos(self, q: Optional[str] = None, estado: Optional[str] = None,
+                   tipo_caso: Optional[str] = None, empresa: Optional[str] = None,
+                   fecha_desde: Optional[str] = None, fecha_hasta: Optional[str] = None,
+                   sort_by: Optional[str] = None, descending: bool = False,
+                   cursor: Optional[str] = None, offset: int = 0,
+                   limit: int = 100) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        Página del listado de casos, con los mismos parámetros y cursores que JSONDBManager.list_casos
+        
+        Usa el listado en memoria (ver _sync_case_list): los órdenes por columna se construyen una
+        vez y se mantienen caso a caso, así que una página no recorre todos los casos.
+        
+        Returns:
+            (filas de la página, total que cumple los filtros, cursor de la página siguiente o None)
+        """
+        if q:
+            candidates = self._search_case_ids(q)
+        else:
+            self._sync_case_list()
+            candidates = None
+        return self.case_list.page(
+            sort_by=sort_by, descending=descending, candidates=candidates,
+            filters={'status': estado, 'tipo_caso': tipo_caso, 'empresa': empresa},
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+            cursor=cursor, offset=offset, limit=limit
+        )
+    
+    def case_revision(self, case_id: str) -> Optional[str]:
+        """
+        Revisión de un caso para su ETag (id y fecha_actualizacion de la fila, que cambian con cada escritura)
+        
+        Returns:
+            Texto opaco, o None si el caso no existe
+        """
+        conn = self._get_connection()
+        row = conn.execute("SELECT id, fecha_actualizacion FROM casos WHERE case_id = ?", (case_id,)).fetchone()
+        conn.close()
+        return f"{row['id']}:{row['fecha_actualizacion']}" if row else None
+    
+    def list_revision(self) -> str:
+        """Revisión del listado de casos para su ETag (casos y personas, de las que sale el nombre del cliente)"""
+        conn = self._get_connection()
+        casos = conn.execute("SELECT COUNT(*), MAX(fecha_actualizacion) FROM casos").fetchone()
+        personas = conn.execute("SELECT COUNT(*), MAX(fecha_actualizacion) FROM personas").fetchone()
+        conn.close()
+        return f"{casos[0]}:{casos[1]}:{personas[0]}:{personas[1]}"
+    
+    def reload(self):
+        """Sin efecto: SQLite siempre lee desde disco (se mantiene por compatibilidad con JSONDBManager)"""
+        pass
+    
+    def apply_shared_changes(self, changes: List[Tuple[str, Optional[str]]]):
+        """Sin efecto: todos los workers leen la misma base SQLite (se mantiene por compatibilidad con JSONDBManager)"""
+        pass
+    
+    def reload_case(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna el EDN almacenado de un caso (no hay cache que recargar)
+        
+        Returns:
+            Diccionario con el EDN o None si no existe
+        """
+        return self.get_edn(case_id)
+    
+    def get_edn(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """EDN de un caso tal como está guardado (sin metadatos de la tabla casos), o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute("SELECT edn_json FROM casos WHERE case_id = ?", (case_id,)).fetchone()
+        conn.close()
+        if row and row['edn_json']:
             return json.loads(row['edn_json'])
         return None
     
-    def get_all_casos(self) -> list:
+    def update_edn(self, case_id: str, edn: Dict[str, Any]) -> bool:
         """
-        Obtiene todos los casos
+        Actualiza el EDN de un caso y sincroniza personas y suministros en una sola transacción
+        
+        Args:
+            case_id: ID del caso
+            edn: Diccionario con el EDN a guardar
         
         Returns:
-            Lista de diccionarios con información resumida de casos
+            True si se actualizó correctamente, False en caso contrario
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE casos SET edn_json = ?, fecha_actualizacion = ? WHERE case_id = ?",
+                    (json.dumps(edn, ensure_ascii=False), datetime.utcnow().isoformat(), case_id)
+                )
+                if cursor.rowcount == 0:
+                    logger.warning(f"No se puede guardar EDN: caso {case_id} no existe")
+                    return False
+                
+                # Sincronizar unified_context con personas y suministros
+                unified_context = edn.get('unified_context', {})
+                if unified_context:
+                    rut = unified_context.get('rut_client')
+                    if rut and rut not in _PLACEHOLDERS:
+                        self._sync_persona(conn, rut, unified_context.get('client_name'),
+                                           unified_context.get('email'), unified_context.get('phone'))
+                    
+                    nis = unified_context.get('service_nis')
+                    if nis and nis not in _PLACEHOLDERS:
+                        self._sync_suministro(conn, nis, unified_context.get('commune'),
+                                              unified_context.get('address_standard'))
+            return True
+        except Exception as e:
+            print(f"Error actualizando EDN en SQLite: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def _sync_persona(self, conn, rut: str, nombre: str = None, email: str = None, telefono: str = None):
+        """Sincroniza datos de persona desde EDN (dentro de la transacción de update_edn)"""
+        now = datetime.utcnow().isoformat()
+        nombre_valido = nombre if nombre and nombre not in _PLACEHOLDERS else None
+        row = conn.execute("SELECT id FROM personas WHERE rut = ?", (rut,)).fetchone()
+        if row:
+            conn.execute('''
+                UPDATE personas
+                SET nombre = COALESCE(?, nombre), email = COALESCE(?, email),
+                    telefono = COALESCE(?, telefono), fecha_actualizacion = ?
+                WHERE id = ?
+            ''', (nombre_valido, email or None, telefono or None, now, row['id']))
+        else:
+            conn.execute('''
+                INSERT INTO personas (rut, nombre, email, telefono, fecha_creacion, fecha_actualizacion)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (rut, nombre_valido or f"Cliente {rut}", email, telefono, now, now))
+    
+    def _sync_suministro(self, conn, nis: str, comuna: str = None, direccion: str = None):
+        """Sincroniza datos de suministro desde EDN (dentro de la transacción de update_edn)"""
+        comuna_valida = comuna if comuna and comuna not in _PLACEHOLDERS else None
+        direccion_valida = direccion if direccion and direccion not in _PLACEHOLDERS else None
+        row = conn.execute("SELECT id FROM suministros WHERE nis = ? ORDER BY id LIMIT 1", (nis,)).fetchone()
+        if row:
+            conn.execute('''
+                UPDATE OR IGNORE suministros
+                SET comuna = COALESCE(?, comuna), direccion = COALESCE(?, direccion)
+                WHERE id = ?
+            ''', (comuna_valida, direccion_valida, row['id']))
+        else:
+            conn.execute('''
+                INSERT INTO suministros (nis, comuna, direccion, numero_cliente, fecha_creacion)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (nis, comuna_valida or "Desconocida", direccion, None, datetime.utcnow().isoformat()))
+    
+    def update_caso(self, case_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza metadatos de un caso (estado, materia, empresa, etc.)
         
-        cursor.execute('''
-            SELECT c.case_id, 
-                   COALESCE(c.empresa, 'N/A') as empresa, 
-                   COALESCE(c.materia, 'N/A') as materia, 
-                   COALESCE(c.monto_disputa, 0) as monto_disputa, 
-                   COALESCE(c.fecha_ingreso, '') as fecha_ingreso, 
-                   COALESCE(c.estado, 'PENDIENTE') as estado,
-                   COALESCE(p.nombre, 'N/A') as client_name, 
-                   COALESCE(p.rut, 'N/A') as rut_client
-            FROM casos c
-            JOIN personas p ON c.persona_id = p.id
-            ORDER BY c.fecha_creacion DESC
-        ''')
+        Args:
+            case_id: ID del caso
+            fields: Campos a actualizar (los que no son columnas de casos se ignoran)
         
-        rows = cursor.fetchall()
+        Returns:
+            Fila actualizada del caso o None si no existe
+        """
+        updates = {k: v for k, v in fields.items() if k in _CASO_FIELDS}
+        ignored = set(fields) - set(updates)
+        if ignored:
+            logger.warning(f"Campos de caso no soportados en SQLite: {sorted(ignored)}")
+        if updates:
+            with self._transaction() as conn:
+                conn.execute(
+                    f"UPDATE casos SET {', '.join(f'{k} = ?' for k in updates)}, fecha_actualizacion = ? WHERE case_id = ?",
+                    [*updates.values(), datetime.utcnow().isoformat(), case_id]
+                )
+        return self.get_caso_record(case_id)
+    
+    def update_persona(self, rut: str, nombre: str = None, email: str = None, telefono: str = None):
+        """Actualiza una persona existente (no crea personas nuevas)"""
+        with self._transaction() as conn:
+            conn.execute('''
+                UPDATE personas
+                SET nombre = COALESCE(?, nombre), email = COALESCE(?, email),
+                    telefono = COALESCE(?, telefono), fecha_actualizacion = ?
+                WHERE rut = ?
+            ''', (nombre or None, email or None, telefono or None, datetime.utcnow().isoformat(), rut))
+    
+    def update_suministro(self, nis: str, comuna: str = None, direccion: str = None):
+        """Actualiza un suministro existente (no crea suministros nuevos)"""
+        with self._transaction() as conn:
+            conn.execute('''
+                UPDATE OR IGNORE suministros
+                SET comuna = COALESCE(?, comuna), direccion = COALESCE(?, direccion)
+                WHERE id = (SELECT id FROM suministros WHERE nis = ? ORDER BY id LIMIT 1)
+            ''', (comuna or None, direccion or None, nis))
+    
+    def get_documento(self, case_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Documento por (case_id, file_id), o None si no existe"""
+        conn = self._get_connection()
+        row = conn.execute('''
+            SELECT d.*, c.case_id FROM documentos d JOIN casos c ON d.caso_id = c.id
+            WHERE c.case_id = ? AND d.file_id = ?
+        ''', (case_id, file_id)).fetchone()
+        conn.close()
+        return self._documento_from_row(row) if row else None
+    
+    def get_documentos_by_file_id(self, file_id: str) -> List[Dict[str, Any]]:
+        """Documentos con ese file_id (de cualquier caso)"""
+        conn = self._get_connection()
+        rows = conn.execute('''
+            SELECT d.*, c.case_id FROM documentos d JOIN casos c ON d.caso_id = c.id
+            WHERE d.file_id = ? ORDER BY d.id
+        ''', (file_id,)).fetchall()
         conn.close()
+        return [self._documento_from_row(row) for row in rows]
+    
+    def find_documento(self, case_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Busca un documento en la tabla documentos y, si no está, en el document_inventory del EDN del caso"""
+        documento = self.get_documento(case_id, file_id)
+        if documento is None:
+            edn = self.get_edn(case_id)
+            documento = find_inventory_documento(edn.get('document_inventory') if edn else None, file_id)
+        return documento
+    
+    def add_documento(self, documento: Dict[str, Any]):
+        """Agrega un documento (con el mismo formato que documentos.json) al caso indicado en case_id"""
+        caso = self.get_caso_record(documento["case_id"])
+        if not caso:
+            raise ValueError(f"Caso {documento['case_id']} no encontrado")
+        self.upsert_documento(
+            caso_id=caso["id"],
+            file_id=documento["file_id"],
+            original_name=documento.get("original_name") or "",
+            doc_type=documento.get("type") or "DESCONOCIDO",
+            level=documento.get("level") or "otros",
+            file_path=documento.get("file_path"),
+            standardized_name=documento.get("standardized_name"),
+            extracted_data=documento.get("extracted_data"),
+            metadata=documento.get("metadata"),
+            relative_path=documento.get("relative_path")
+        )
+    
+    def update_documento(self, case_id: str, file_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Actualiza campos de un documento
         
-        return [dict(row) for row in rows]
-
+        Returns:
+            True si el documento existía y se actualizó
+        """
+        updates = {k: v for k, v in fields.items() if k in _DOCUMENTO_FIELDS}
+        if not updates:
+            return False
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f'''UPDATE documentos SET {', '.join(f'{k} = ?' for k in updates)}
+                    WHERE file_id = ? AND caso_id = (SELECT id FROM casos WHERE case_id = ?)''',
+                [*updates.values(), file_id, case_id]
+            )
+            return cursor.rowcount > 0
+    
+    @property
+    def casos(self) -> List[Dict[str, Any]]:
+        """Filas de todos los casos (sin EDN), en orden de id"""
+        conn = self._get_connection()
+        rows = conn.execute(f"SELECT {', '.join(_CASO_COLUMNS)} FROM casos ORDER BY id").fetchall()
+        conn.close()
+        return [self._caso_from_row(row) for row in rows]
+    
+    @property
+    def personas(self) -> Dict[str, Dict[str, Any]]:
+        """Personas indexadas por RUT"""
+        conn = self._get_connection()
+        rows = conn.execute("SELECT * FROM personas ORDER BY id").fetchall()
+        conn.close()
+        return {row['rut']: self._persona_from_row(row) for row in rows}
+    
+    @property
+    def suministros(self) -> Dict[str, Dict[str, Any]]:
+        """Suministros indexados por nis-comuna"""
+        conn = self._get_connection()
+        rows = conn.execute("SELECT * FROM suministros ORDER BY id").fetchall()
+        conn.close()
+        return {f"{row['nis']}-{row['comuna']}": self._suministro_from_row(row) for row in rows}
+    
+    def import_from_json(self, json_db) -> int:
+        """
+        Importa la base JSON (personas, suministros, casos, EDNs y documentos) conservando los ids
+        
+        Args:
+            json_db: JSONDBManager con los datos cargados
+        
+        Returns:
+            Número de casos importados
+        """
+        data = json_db.data_store
+        now = datetime.utcnow().isoformat()
+        with self._transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO personas (id, rut, nombre, email, telefono, fecha_creacion, fecha_actualizacion)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(p.get('id'), p['rut'], p.get('nombre'), p.get('email'), p.get('telefono'), now, now)
+                  for p in data["personas"].values()])
+            
+            conn.executemany('''
+                INSERT OR REPLACE INTO suministros (id, nis, comuna, direccion, numero_cliente, fecha_creacion)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(s.get('id'), s['nis'], s['comuna'], s.get('direccion'), s.get('numero_cliente'), now)
+                  for s in data["suministros"].values()])
+            
+            conn.executemany('''
+                INSERT OR REPLACE INTO casos (id, case_id, persona_id, suministro_id, empresa, materia,
+                                              monto_disputa, fecha_ingreso, estado, fecha_cierre, edn_json,
+                                              fecha_creacion, fecha_actualizacion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(c.get('id'), c['case_id'], c.get('persona_id'), c.get('suministro_id'), c.get('empresa'),
+                   c.get('materia'), c.get('monto_disputa'), c.get('fecha_ingreso'), c.get('estado') or 'PENDIENTE',
+                   c.get('fecha_cierre'), json.dumps(json_db.get_edn(c['case_id']) or {}, ensure_ascii=False),
+                   now, now)
+                  for c in data["casos"] if c.get('case_id')])
+            
+            # Si un archivo aparece repetido en un caso, gana la primera entrada (igual que en JSONDBManager)
+            caso_ids = {c['case_id']: c.get('id') for c in data["casos"] if c.get('case_id')}
+            conn.executemany('''
+                INSERT OR IGNORE INTO documentos (id, caso_id, file_id, original_name, standardized_name, type,
+                                                  level, file_path, relative_path, extracted_data, metadata,
+                                                  fecha_creacion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(d.get('id'), caso_ids[d['case_id']], d['file_id'], d.get('original_name') or '', d.get('standardized_name'),
+                   d.get('type') or 'DESCONOCIDO', d.get('level'), d.get('file_path'), d.get('relative_path'),
+                   json.dumps(d['extracted_data'], ensure_ascii=False) if d.get('extracted_data') else None,
+                   json.dumps(d['metadata'], ensure_ascii=False) if d.get('metadata') else None, now)
+                  for d in data["documentos"] if d.get('case_id') in caso_ids and d.get('file_id')])
+        
+        logger.info(f"Importados {len(caso_ids)} casos desde la base JSON a {self.db_path}")
+        return len(caso_ids)
@@ -0,0 +1,121 @@
+"""
+Índice en memoria de documentos por (case_id, file_id) y por file_id
+Cubre documentos.json y los documentos del document_inventory de cada EDN
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Secciones de document_inventory donde puede estar un documento, en orden de búsqueda
+# (categorías funcionales primero, después los niveles)
+INVENTORY_SECTIONS = [
+    "reclamo_respuesta", "informe_evidencias", "historial_calculos", "otros",
+    "level_1_critical", "level_2_supporting", "level_0_missing"
+]
+
+
+def inventory_documentos(document_inventory: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Documentos de un inventario por file_id
+    
+    Si un file_id aparece en varias secciones se queda el de la primera según INVENTORY_SECTIONS,
+    el mismo que encontraría un recorrido sección por sección.
+    """
+    documentos: Dict[str, Dict[str, Any]] = {}
+    for section in INVENTORY_SECTIONS:
+        docs = (document_inventory or {}).get(section, [])
+        if not isinstance(docs, list):
+            continue
+        for doc in docs:
+            if isinstance(doc, dict) and doc.get("file_id") is not None:
+                documentos.setdefault(doc["file_id"], doc)
+    return documentos
+
+
+def find_inventory_documento(document_inventory: Optional[Dict[str, Any]],
+                             file_id: str) -> Optional[Dict[str, Any]]:
+    """Documento de un inventario por file_id (sin índice), o None si no está"""
+    return inventory_documentos(document_inventory).get(file_id)
+
+
+class DocumentIndex:
+    """
+    Documentos por (case_id, file_id), sin recorrer listas en cada consulta.
+    
+    - documentos.json: diccionarios (case_id, file_id) -> documento y file_id -> documentos
+      (un file_id puede repetirse entre casos). Apuntan a los mismos diccionarios de data_store.
+    - Inventarios de EDN: por caso, file_id -> documento del document_inventory, construido al
+      primer acceso y mantenido en un LRU acotado. invalidate(case_id) lo descarta cuando el EDN cambia.
+    """
+    
+    def __init__(self, documentos: Iterable[Dict[str, Any]] = (), inventory_cache_size: int = 256):
+        self._lock = threading.RLock()
+        self.inventory_cache_size = max(1, inventory_cache_size)
+        self._inventories: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self.rebuild(documentos)
+    
+    def rebuild(self, documentos: Iterable[Dict[str, Any]]):
+        """Reemplaza los documentos de documentos.json (los inventarios de EDN se conservan)"""
+        with self._lock:
+            self._by_key: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            self._by_file_id: Dict[str, List[Dict[str, Any]]] = {}
+            for doc in documentos:
+                self.put(doc)
+    
+    def __len__(self) -> int:
+        return len(self._by_key)
+    
+    def put(self, doc: Dict[str, Any]):
+        """
+        Agrega un documento de documentos.json
+        
+        Si ya hay uno con el mismo (case_id, file_id), get() sigue retornando el primero,
+        igual que un recorrido de la lista.
+        """
+        file_id = doc.get("file_id")
+        with self._lock:
+            self._by_key.setdefault((doc.get("case_id"), file_id), doc)
+            self._by_file_id.setdefault(file_id, []).append(doc)
+    
+    def get(self, case_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Documento de documentos.json por (case_id, file_id), o None si no existe"""
+        return self._by_key.get((case_id, file_id))
+    
+    def by_file_id(self, file_id: str) -> List[Dict[str, Any]]:
+        """Documentos de documentos.json con ese file_id (de cualquier caso)"""
+        return list(self._by_file_id.get(file_id, []))
+    
+    def inventory(self, case_id: str,
+                  load_inventory: Callable[[str], Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Documentos del document_inventory del EDN de un caso, por file_id
+        
+        Args:
+            case_id: ID del caso
+            load_inventory: Función que retorna el document_inventory del caso (se llama sólo si no está en el LRU)
+        
+        Returns:
+            Diccionario file_id -> documento (vacío si el caso no existe)
+        """
+        with self._lock:
+            documentos = self._inventories.get(case_id)
+            if documentos is not None:
+                self._inventories.move_to_end(case_id)
+                return documentos
+        
+        documentos = inventory_documentos(load_inventory(case_id))
+        with self._lock:
+            self._inventories[case_id] = documentos
+            self._inventories.move_to_end(case_id)
+            while len(self._inventories) > self.inventory_cache_size:
+                self._inventories.popitem(last=False)
+        return documentos
+    
+    def invalidate(self, case_id: Optional[str] = None):
+        """Descarta el inventario indexado de un caso (o de todos si case_id es None)"""
+        with self._lock:
+            if case_id is None:
+                self._inventories.clear()
+            else:
+                self._inventories.pop(case_id, None)
@@ -0,0 +1,125 @@
+"""
+Log de escritura anticipada (write-ahead log) para las mutaciones de EDN
+Cada cambio se agrega como una línea JSON a edn.log.jsonl en vez de reescribir el EDN completo
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+from src.database.write_coordinator import fsync_dir
+from src.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def _section_digest(value: Any) -> int:
+    """Huella de una sección del EDN (sólo válida dentro del proceso)"""
+    return hash(dumps(value))
+
+
+class EDNLog:
+    """
+    Log de parches de EDN.
+    
+    Cada registro es una línea {"case_id", "set": {sección: valor}, "unset": [secciones]}
+    con sólo las secciones de primer nivel del EDN que cambiaron (checklist, unified_context, ...),
+    por lo que el costo de una escritura depende del tamaño del cambio y no del corpus.
+    
+    - append() escribe el registro y hace fsync antes de retornar.
+    - read() retorna los registros pendientes; una última línea incompleta
+      (caída a mitad de escritura) se descarta y se trunca.
+    - Aplicar un registro dos veces da el mismo resultado, así que quien compacta el log
+      (EDNStore) puede caerse entre escribir los EDNs y vaciar el log sin corromper datos.
+    
+    El log no toma locks: el llamador serializa el acceso entre procesos.
+    """
+    
+    def __init__(self, log_path: Path):
+        """
+        Args:
+            log_path: Ruta al archivo de log
+        """
+        self.log_path = log_path
+        self._digests: Dict[str, Dict[str, int]] = {}
+    
+    def track_case(self, case_id: str, edn: Optional[Dict[str, Any]]):
+        """Registra el estado persistido del EDN de un caso (None para olvidarlo)"""
+        if edn is None:
+            self._digests.pop(case_id, None)
+            return
+        self._digests[case_id] = {key: _section_digest(value) for key, value in edn.items()}
+    
+    def forget(self):
+        """Olvida el estado persistido de todos los casos"""
+        self._digests = {}
+    
+    def read(self) -> List[Dict[str, Any]]:
+        """Registros del log en orden de escritura"""
+        records = []
+        if not self.log_path.exists():
+            return records
+        
+        valid_bytes = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    record = loads(line)
+                except ValueError:
+                    logger.warning(f"Registro incompleto en {self.log_path} (byte {valid_bytes}); se descarta el resto del log")
+                    break
+                records.append(record)
+                valid_bytes += len(line)
+        
+        if valid_bytes < self.log_path.stat().st_size:
+            with open(self.log_path, "r+b") as f:
+                f.truncate(valid_bytes)
+                os.fsync(f.fileno())
+        return records
+    
+    @staticmethod
+    def apply(edn: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica un registro sobre un EDN (en el lugar) y lo retorna"""
+        edn.update(record.get("set", {}))
+        for key in record.get("unset", []):
+            edn.pop(key, None)
+        return edn
+    
+    def diff(self, case_id: str, edn: Dict[str, Any]) -> Dict[str, Any]:
+        """Secciones del EDN que cambiaron respecto del último estado persistido"""
+        previous = self._digests.get(case_id, {})
+        changed = {key: value for key, value in edn.items()
+                   if previous.get(key) != _section_digest(value)}
+        removed: List[str] = [key for key in previous if key not in edn]
+        return {"set": changed, "unset": removed}
+    
+    def append(self, case_id: str, edn: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Agrega al log los cambios del EDN de un caso
+        
+        Args:
+            case_id: ID del caso
+            edn: EDN completo tras la mutación
+        
+        Returns:
+            Registro escrito, o None si no había cambios
+        """
+        patch = self.diff(case_id, edn)
+        if not patch["set"] and not patch["unset"] and case_id in self._digests:
+            return None
+        
+        record = {"case_id": case_id, **patch}
+        line = dumps(record) + b"\n"
+        with open(self.log_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.track_case(case_id, edn)
+        return record
+    
+    def discard(self):
+        """Vacía el log (tras compactar, o cuando los EDNs se regeneran completos)"""
+        self.log_path.unlink(missing_ok=True)
+        fsync_dir(self.log_path.parent)
@@ -0,0 +1,305 @@
+"""
+Almacenamiento de EDNs particionado por caso, con carga diferida
+Cada EDN vive en su propio archivo; en memoria sólo se mantiene un índice pequeño y un LRU de EDNs
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote
+import logging
+
+from src.database.edn_log import EDNLog
+from src.database.search_index import document_names
+from src.database.write_coordinator import atomic_write_json, file_lock
+from src.utils.serialization import load_file
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cuando cambie el formato del índice (p. ej. los campos de edn_summary):
+# un índice con otra versión se recalcula desde los archivos por caso
+INDEX_VERSION = 2
+
+
+def edn_summary(edn: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos del EDN que necesitan el listado y la búsqueda de casos (se guardan en el índice)"""
+    unified_context = edn.get('unified_context', {}) or {}
+    compilation_metadata = edn.get('compilation_metadata', {}) or {}
+    return {
+        "client_name": unified_context.get('client_name'),
+        "rut_client": unified_context.get('rut_client'),
+        "tipo_caso": compilation_metadata.get('tipo_caso'),
+        "materia": edn.get('materia'),
+        "monto_disputa": edn.get('monto_disputa'),
+        "service_nis": unified_context.get('service_nis'),
+        "document_names": document_names(edn.get('document_inventory'))
+    }
+
+
+class EDNStore:
+    """
+    EDNs guardados como un archivo JSON por caso en {root}/cases/.
+    
+    - index.json: por caso, el resumen que usan el listado y la búsqueda (ver edn_summary), más
+      la huella del edn.json del que se importaron los EDNs. Un índice de otra versión se recalcula
+      desde los archivos por caso sin perder las modificaciones.
+    - edn.log.jsonl: mutaciones pendientes (ver EDNLog). Al acumular compact_every registros
+      se aplican a los archivos de los casos afectados y se reescribe el índice.
+    - Los EDNs se leen de disco al primer acceso y se mantienen en un LRU acotado.
+    
+    edn.json sigue siendo la salida del OMC (create_json_database.py): si su tamaño o mtime
+    cambia respecto de lo registrado en el índice, se vuelve a importar completo y se descarta
+    el log, igual que cuando antes se regeneraba la base.
+    
+    Todas las lecturas y escrituras de disco se serializan entre procesos con file_lock(index.json).
+    """
+    
+    def __init__(self, seed_path: Path, root: Path, cache_size: int = 256, compact_every: int = 500):
+        """
+        Args:
+            seed_path: Ruta a edn.json (salida del OMC)
+            root: Directorio del almacenamiento por caso
+            cache_size: Número máximo de EDNs en memoria
+            compact_every: Registros en el log que disparan una compactación (0 = nunca)
+        """
+        self.seed_path = seed_path
+        self.root = root
+        self.cases_dir = root / "cases"
+        self.index_path = root / "index.json"
+        self.cache_size = max(1, cache_size)
+        self.compact_every = compact_every
+        self.log = EDNLog(root / "edn.log.jsonl")
+        
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._patches: Dict[str, List[Dict[str, Any]]] = {}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._seed: Optional[Dict[str, int]] = None
+        # Protege el LRU y el log entre threads del proceso (el file_lock lo hace entre procesos)
+        self._lock = threading.RLock()
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def _case_path(self, case_id: str) -> Path:
+        return self.cases_dir / f"{quote(case_id, safe='')}.json"
+    
+    def _seed_fingerprint(self) -> Optional[Dict[str, int]]:
+        if not self.seed_path.exists():
+            return None
+        stat = self.seed_path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    
+    def open(self) -> 'EDNStore':
+        """Carga el índice y el log (importa edn.json si el índice no existe o quedó desactualizado)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, file_lock(self.index_path):
+            index = None
+            if self.index_path.exists():
+                try:
+                    index = load_file(self.index_path)
+                except Exception as e:
+                    logger.warning(f"Error leyendo índice de EDNs {self.index_path}: {e}")
+            
+            seed = self._seed_fingerprint()
+            if not index or (seed and index.get("seed") != seed):
+                index = self._import_seed(seed)
+            elif index.get("version") != INDEX_VERSION:
+                index = self._rebuild_index(index)
+            
+            self._summaries = index.get("cases", {})
+            self._seed = index.get("seed")
+            self._cache.clear()
+            self.log.forget()
+            self._load_log()
+        return self
+    
+    def _import_seed(self, seed: Optional[Dict[str, int]]) -> Dict[str, Any]:
+        """Parte edn.json en un archivo por caso y escribe el índice (con el lock tomado)"""
+        edns = {}
+        if self.seed_path.exists():
+            edns = load_file(self.seed_path) or {}
+        logger.info(f"Importando {len(edns)} EDNs desde {self.seed_path.name} a {self.cases_dir}")
+        
+        self.cases_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.cases_dir.glob("*.json"):
+            stale.unlink()
+        for case_id, edn in edns.items():
+            atomic_write_json(self._case_path(case_id), edn)
+        
+        self._seed = seed
+        index = {
+            "version": INDEX_VERSION,
+            "seed": seed,
+            "cases": {case_id: edn_summary(edn) for case_id, edn in edns.items()}
+        }
+        atomic_write_json(self.index_path, index)
+        self.log.discard()
+        return index
+    
+    def _rebuild_index(self, index: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Recalcula los resúmenes de un índice de otra versión desde los archivos por caso (con el lock tomado)
+        
+        A diferencia de _import_seed conserva las modificaciones hechas desde la API (archivos y log).
+        """
+        logger.info(f"Actualizando índice de EDNs a la versión {INDEX_VERSION} ({len(index.get('cases', {}))} casos)")
+        self._patches = {}
+        for record in self.log.read():
+            self._patches.setdefault(record["case_id"], []).append(record)
+        
+        case_ids = list(index.get("cases", {}))
+        case_ids.extend(case_id for case_id in self._patches if case_id not in index.get("cases", {}))
+        index = {
+            "version": INDEX_VERSION,
+            "seed": index.get("seed"),
+            "cases": {case_id: edn_summary(self._read_case(case_id)) for case_id in case_ids}
+        }
+        atomic_write_json(self.index_path, index)
+        self._patches = {}
+        return index
+    
+    def _load_log(self):
+        """Agrupa por caso los registros pendientes del log y actualiza sus resúmenes"""
+        self._patches = {}
+        records = self.log.read()
+        for record in records:
+            self._patches.setdefault(record["case_id"], []).append(record)
+        self.pending = len(records)
+        for case_id in self._patches:
+            self._summaries[case_id] = edn_summary(self._read_case(case_id))
+    
+    def _read_case(self, case_id: str) -> Dict[str, Any]:
+        """EDN de disco con los registros pendientes del log aplicados"""
+        edn = {}
+        case_path = self._case_path(case_id)
+        if case_path.exists():
+            edn = load_file(case_path)
+        for record in self._patches.get(case_id, []):
+            EDNLog.apply(edn, record)
+        return edn
+    
+    def _remember(self, case_id: str, edn: Dict[str, Any]):
+        """Agrega un EDN al LRU, desalojando el menos usado si se supera el tamaño"""
+        self._cache[case_id] = edn
+        self._cache.move_to_end(case_id)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self.log.track_case(evicted, None)
+    
+    def __contains__(self, case_id: str) -> bool:
+        return case_id in self._summaries
+    
+    def __len__(self) -> int:
+        return len(self._summaries)
+    
+    def case_ids(self) -> Iterator[str]:
+        """IDs de los casos con EDN"""
+        return iter(list(self._summaries))
+    
+    @property
+    def seed(self) -> Optional[Dict[str, int]]:
+        """Huella (tamaño, mtime) del edn.json importado"""
+        return self._seed
+    
+    def summary(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Resumen del EDN de un caso (sin leerlo de disco), o None si no existe"""
+        return self._summaries.get(case_id)
+    
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """
+        EDN de un caso (desde el LRU o, si no está, desde disco)
+        
+        Args:
+            case_id: ID del caso
+        
+        Returns:
+            EDN del caso o None si no existe
+        """
+        with self._lock:
+            edn = self._cache.get(case_id)
+            if edn is not None:
+                self._cache.move_to_end(case_id)
+                self.hits += 1
+                return edn
+            if case_id not in self._summaries:
+                return None
+            
+            self.misses += 1
+            with file_lock(self.index_path):
+                edn = self._read_case(case_id)
+            self.log.track_case(case_id, edn)
+            self._remember(case_id, edn)
+            return edn
+    
+    def put(self, case_id: str, edn: Dict[str, Any]):
+        """
+        Guarda el EDN de un caso (agrega sus cambios al log)
+        
+        Args:
+            case_id: ID del caso
+            edn: EDN completo
+        """
+        with self._lock:
+            with file_lock(self.index_path):
+                record = self.log.append(case_id, edn)
+            if record is not None:
+                self._patches.setdefault(case_id, []).append(record)
+                self.pending += 1
+            self._summaries[case_id] = edn_summary(edn)
+            self._remember(case_id, edn)
+            if self.compact_every and self.pending >= self.compact_every:
+                self.compact()
+    
+    def reload_case(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Descarta la copia en memoria de un caso y lo vuelve a leer de disco (log incluido)"""
+        with self._lock:
+            self._cache.pop(case_id, None)
+            self.log.track_case(case_id, None)
+            with file_lock(self.index_path):
+                self._patches[case_id] = [r for r in self.log.read() if r["case_id"] == case_id]
+                if case_id not in self._summaries and not self._case_path(case_id).exists() \
+                        and not self._patches[case_id]:
+                    return None
+                edn = self._read_case(case_id)
+            self._summaries[case_id] = edn_summary(edn)
+            self.log.track_case(case_id, edn)
+            self._remember(case_id, edn)
+            return edn
+    
+    def compact(self):
+        """Aplica el log a los archivos de los casos modificados, reescribe el índice y vacía el log"""
+        with self._lock, file_lock(self.index_path):
+            # Releer el log de disco: incluye los registros de otros procesos
+            self._patches = {}
+            for record in self.log.read():
+                self._patches.setdefault(record["case_id"], []).append(record)
+            
+            self.cases_dir.mkdir(parents=True, exist_ok=True)
+            for case_id in self._patches:
+                edn = self._read_case(case_id)
+                atomic_write_json(self._case_path(case_id), edn)
+                self._summaries[case_id] = edn_summary(edn)
+            
+            atomic_write_json(self.index_path, {
+                "version": INDEX_VERSION,
+                "seed": self._seed,
+                "cases": self._summaries
+            })
+            self.log.discard()
+            logger.info(f"Log de EDN compactado ({len(self._patches)} casos modificados)")
+            self._patches = {}
+            self.pending = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del LRU y del log"""
+        lookups = self.hits + self.misses
+        return {
+            "cases": len(self._summaries),
+            "cached": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "pending_log_records": self.pending
+        }
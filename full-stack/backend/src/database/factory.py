@@ -0,0 +1,34 @@
+"""
+Selección del backend de almacenamiento de la API según la configuración
+"""
+
+import logging
+
+from src.config import DATABASE_DIR, STORAGE_BACKEND, SQLITE_DB_PATH
+from .db_manager import DBManager
+from .json_db_manager import JSONDBManager
+
+logger = logging.getLogger(__name__)
+
+
+def get_db_manager():
+    """
+    Crea el gestor de base de datos configurado en STORAGE_BACKEND
+    
+    Con el backend "sqlite", si la base SQLite está vacía se importa la base JSON
+    de DATABASE_DIR (la generada por create_json_database.py).
+    
+    Returns:
+        JSONDBManager o DBManager (misma interfaz de lectura/escritura)
+    """
+    if STORAGE_BACKEND == "sqlite":
+        db_manager = DBManager(SQLITE_DB_PATH)
+        if not db_manager.count_casos() and (DATABASE_DIR / "casos.json").exists():
+            logger.info(f"Base SQLite vacía, importando base JSON desde {DATABASE_DIR}")
+            db_manager.import_from_json(JSONDBManager(base_path=DATABASE_DIR))
+        logger.info(f"Backend de almacenamiento: SQLite ({SQLITE_DB_PATH})")
+        return db_manager
+    
+    if STORAGE_BACKEND != "json":
+        logger.warning(f"Backend de almacenamiento desconocido '{STORAGE_BACKEND}', usando JSON")
+    return JSONDBManager(base_path=DATABASE_DIR)
@@ -0,0 +1,215 @@
+"""
+Catálogo de los archivos de cada caso en FILES_DIR
+Resuelve la ruta física de un documento sin recorrer la carpeta del caso (rglob) en cada request
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+from src.database.search_index import normalize_text
+from src.database.write_coordinator import atomic_write_json
+from src.utils.serialization import load_file
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cuando cambie el formato de file_catalog.json (un catálogo de otra versión se ignora)
+FILE_CATALOG_VERSION = 1
+
+
+def normalize_name(name: str) -> str:
+    """Nombre de archivo comparable: sin tildes, en minúsculas y con los espacios colapsados"""
+    return " ".join(normalize_text(name).split())
+
+
+def scan_case_folder(case_dir: Path) -> Dict[str, Any]:
+    """
+    Recorre la carpeta de un caso una vez (sin las carpetas ocultas, como .previews)
+    
+    Returns:
+        {"dirs": {ruta relativa del directorio: mtime_ns}, "files": [rutas relativas de los archivos]}
+        ('.' es la carpeta del caso)
+    """
+    dirs: Dict[str, int] = {}
+    files: List[str] = []
+    for current, subdirs, names in os.walk(case_dir):
+        subdirs[:] = [name for name in subdirs if not name.startswith('.')]
+        current_path = Path(current)
+        try:
+            dirs[str(current_path.relative_to(case_dir))] = current_path.stat().st_mtime_ns
+        except OSError:
+            continue
+        for name in names:
+            file_path = current_path / name
+            if file_path.is_file():
+                files.append(str(file_path.relative_to(case_dir)))
+    # Primero los archivos menos profundos: entre dos con el mismo nombre gana el más cercano a la carpeta del caso
+    files.sort(key=lambda rel_path: (rel_path.count(os.sep), rel_path))
+    return {"dirs": dirs, "files": files}
+
+
+class CaseFiles:
+    """Archivos de la carpeta de un caso, indexados por nombre y por nombre normalizado"""
+    
+    __slots__ = ("case_dir", "dirs", "files", "by_name", "by_normalized")
+    
+    def __init__(self, case_dir: Path, entry: Dict[str, Any]):
+        self.case_dir = case_dir
+        self.dirs: Dict[str, int] = entry.get("dirs", {})
+        self.files: List[str] = entry.get("files", [])
+        self.by_name: Dict[str, str] = {}
+        self.by_normalized: Dict[str, str] = {}
+        for rel_path in self.files:
+            name = os.path.basename(rel_path)
+            self.by_name.setdefault(name, rel_path)
+            self.by_normalized.setdefault(normalize_name(name), rel_path)
+    
+    def entry(self) -> Dict[str, Any]:
+        return {"dirs": self.dirs, "files": self.files}
+    
+    def is_fresh(self) -> bool:
+        """
+        True si ningún directorio del caso cambió desde que se recorrió
+        
+        Crear, borrar o renombrar un archivo cambia el mtime de su directorio, así que basta con
+        un stat por directorio (no por archivo).
+        """
+        if not self.dirs:
+            return False
+        for rel_dir, mtime in self.dirs.items():
+            try:
+                if (self.case_dir / rel_dir).stat().st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+    
+    def find(self, original_name: Optional[str] = None, file_id: Optional[str] = None) -> Optional[Path]:
+        """
+        Archivo de un documento, con el mismo orden de preferencia que la búsqueda en disco que reemplaza:
+        
+        1. Un archivo llamado exactamente original_name, en cualquier subcarpeta.
+        2. Un archivo cuyo nombre contiene el file_id.
+        3. Un archivo con el mismo nombre normalizado (sin tildes ni mayúsculas).
+        4. Un archivo cuyo nombre normalizado contiene el original_name normalizado.
+        """
+        rel_path = self.by_name.get(original_name) if original_name else None
+        if rel_path is None and file_id:
+            rel_path = next((f for f in self.files if file_id in os.path.basename(f)), None)
+        if rel_path is None and original_name:
+            normalized = normalize_name(original_name)
+            rel_path = self.by_normalized.get(normalized)
+            if rel_path is None and normalized:
+                rel_path = next((f for name, f in self.by_normalized.items() if normalized in name), None)
+        return self.case_dir / rel_path if rel_path is not None else None
+
+
+class FileCatalog:
+    """
+    Catálogo de archivos por caso.
+    
+    create_json_database.py lo construye al compilar la base y lo guarda en file_catalog.json.
+    El backend lo carga al primer uso; el catálogo de un caso se vuelve a recorrer sólo si el
+    archivo que indica ya no existe o no tiene el documento y algún directorio del caso cambió
+    de mtime (ver CaseFiles.is_fresh). Los casos que no están en el catálogo se recorren al primer acceso.
+    """
+    
+    def __init__(self, files_dir: Path, catalog_path: Optional[Path] = None):
+        """
+        Args:
+            files_dir: Directorio con una carpeta por caso (FILES_DIR)
+            catalog_path: file_catalog.json (None = sólo en memoria)
+        """
+        self.files_dir = files_dir
+        self.catalog_path = catalog_path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._cases: Dict[str, CaseFiles] = {}
+        self._lock = threading.Lock()
+        self.scans = 0
+    
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            entries = {}
+            if self.catalog_path and self.catalog_path.exists():
+                try:
+                    data = load_file(self.catalog_path) or {}
+                    if data.get("version") == FILE_CATALOG_VERSION:
+                        entries = data.get("cases", {})
+                except Exception as e:
+                    logger.warning(f"Error leyendo catálogo de archivos {self.catalog_path}: {e}")
+            self._entries = entries
+        return self._entries
+    
+    def _scan(self, case_id: str) -> Optional[CaseFiles]:
+        case_dir = self.files_dir / case_id
+        if not case_dir.is_dir():
+            return None
+        self.scans += 1
+        case_files = CaseFiles(case_dir, scan_case_folder(case_dir))
+        self._cases[case_id] = case_files
+        self._load()[case_id] = case_files.entry()
+        return case_files
+    
+    def case(self, case_id: str) -> Optional[CaseFiles]:
+        """Catálogo de un caso (se recorre la carpeta si no estaba catalogado), o None si la carpeta no existe"""
+        with self._lock:
+            case_files = self._cases.get(case_id)
+            if case_files is None:
+                entry = self._load().get(case_id)
+                if entry is None:
+                    return self._scan(case_id)
+                case_files = self._cases[case_id] = CaseFiles(self.files_dir / case_id, entry)
+            return case_files
+    
+    def refresh(self, case_id: str) -> Optional[CaseFiles]:
+        """Vuelve a recorrer la carpeta de un caso si alguno de sus directorios cambió"""
+        with self._lock:
+            case_files = self._cases.get(case_id)
+            if case_files is not None and case_files.is_fresh():
+                return case_files
+            return self._scan(case_id)
+    
+    def find(self, case_id: str, original_name: Optional[str] = None,
+             file_id: Optional[str] = None) -> Optional[Path]:
+        """
+        Ruta física de un documento dentro de la carpeta de su caso (ver CaseFiles.find)
+        
+        Args:
+            case_id: ID del caso
+            original_name: Nombre original del documento
+            file_id: ID del documento
+        
+        Returns:
+            Ruta absoluta del archivo o None si no se encuentra
+        """
+        case_files = self.case(case_id)
+        if case_files is None:
+            return None
+        file_path = case_files.find(original_name, file_id)
+        if file_path is not None and file_path.is_file():
+            return file_path
+        
+        # El catálogo no tiene el archivo o quedó desactualizado: recorrer de nuevo sólo si la carpeta cambió
+        case_files = self.refresh(case_id)
+        file_path = case_files.find(original_name, file_id) if case_files else None
+        return file_path if file_path is not None and file_path.is_file() else None
+    
+    def build(self, case_ids: Iterable[str]):
+        """Recorre las carpetas de los casos indicados y descarta los casos que ya no están"""
+        case_ids = list(case_ids)
+        with self._lock:
+            self._entries = {}
+            self._cases = {}
+            for case_id in case_ids:
+                self._scan(case_id)
+    
+    def save(self):
+        """Guarda el catálogo en catalog_path"""
+        if not self.catalog_path:
+            return
+        with self._lock:
+            entries = dict(self._load())
+        self.catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self.catalog_path, {"version": FILE_CATALOG_VERSION, "cases": entries})
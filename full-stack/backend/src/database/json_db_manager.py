@@ -2,16 +2,26 @@
 Gestor de base de datos JSON para leer casos desde archivos JSON relacionales
 """
 
-import json
+import threading
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
-from src.config import DATABASE_DIR
+from src.config import DATABASE_DIR, EDN_CACHE_SIZE, EDN_LOG_COMPACT_RECORDS
+from src.database.case_list_index import CaseListIndex
+from src.database.document_index import DocumentIndex
+from src.database.edn_store import EDNStore
+from src.database.search_index import CaseSearchIndex
+from src.database.shared_state import get_shared_state
+from src.database.write_coordinator import write_coordinator
+from src.utils.serialization import dump_file, load_file
 
 # Configuración del logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Estados de casos.json que se muestran tal cual en el listado (cualquier otro se muestra como PENDIENTE)
+SUMMARY_STATUSES = ('CERRADO', 'RESUELTO', 'EN_REVISION')
+
 class JSONDBManager:
     _instance = None
     
@@ -34,8 +44,21 @@ class JSONDBManager:
             }
             
             self._ensure_files_exist()
+            # EDNs en un archivo por caso, cargados bajo demanda (edn.json es la salida del OMC)
+            self.edn_store = EDNStore(self.files["edn"], self.base_path / "edn",
+                                      cache_size=EDN_CACHE_SIZE, compact_every=EDN_LOG_COMPACT_RECORDS)
+            # Filas del listado de casos (se llenan en _build_indexes y se mantienen en cada escritura)
+            self.case_list = CaseListIndex()
+            # Índice de búsqueda: se construye en la primera búsqueda y luego se mantiene en cada escritura
+            self.search_index = CaseSearchIndex()
+            self._search_index_ready = False
+            self._search_index_lock = threading.Lock()
+            # Documentos por (case_id, file_id) y por file_id (documentos.json e inventarios de EDN)
+            self.document_index = DocumentIndex(inventory_cache_size=EDN_CACHE_SIZE)
+            # Registro de cambios compartido con los demás workers (ver apply_shared_changes)
+            self.shared_state = get_shared_state()
             self.data_store = self._load_data()
-            self.cases_store: Dict[str, Any] = {}
+            self._build_indexes()
             self.initialized = True
 
     def _ensure_files_exist(self):
@@ -46,53 +69,111 @@ class JSONDBManager:
         for file_path in self.files.values():
             if not file_path.exists():
                 logger.warning(f"Archivo {file_path} no encontrado. Creando un archivo vacío.")
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump({}, f, indent=2, ensure_ascii=False)
+                dump_file(file_path, {})
 
     def _load_data(self) -> Dict[str, Any]:
         """Carga todos los datos de los archivos JSON"""
         data = {}
         for file_name, file_path in self.files.items():
             if file_name == "casos":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data["casos"] = json.load(f)
+                data["casos"] = load_file(file_path)
             elif file_name == "edn":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data["edns"] = json.load(f)
+                # Sólo se carga el índice; cada EDN se lee al primer acceso
+                self.edn_store.open()
             elif file_name == "personas":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data["personas"] = {p['rut']: p for p in json.load(f)}
+                data["personas"] = {p['rut']: p for p in load_file(file_path)}
             elif file_name == "suministros":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data["suministros"] = {f"{s['nis']}-{s['comuna']}": s for s in json.load(f)}
+                data["suministros"] = {f"{s['nis']}-{s['comuna']}": s for s in load_file(file_path)}
             elif file_name == "documentos":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data["documentos"] = json.load(f)
+                data["documentos"] = load_file(file_path)
         return data
     
+    def _build_indexes(self):
+        """
+        Construye los índices secundarios sobre data_store.
+        
+        Los índices apuntan a los mismos diccionarios que data_store (no son copias):
+        - case_id -> caso
+        - id de persona -> persona
+        - id de suministro -> suministro
+        - RUT -> lista de casos de esa persona
+        - filas del listado de casos, con sus órdenes y filtros (ver CaseListIndex)
+        - (case_id, file_id) y file_id -> documento (ver DocumentIndex)
+        """
+        self._casos_by_case_id: Dict[str, Dict[str, Any]] = {}
+        for caso in self.data_store["casos"]:
+            if caso.get('case_id'):
+                self._casos_by_case_id[caso['case_id']] = caso
+        self._index_personas()
+        self._suministros_by_id: Dict[Any, Dict[str, Any]] = {
+            s.get('id'): s for s in self.data_store["suministros"].values()
+        }
+        self._build_summaries()
+        self.document_index.rebuild(self.data_store["documentos"])
+        self.document_index.invalidate()
+    
+    def _index_personas(self):
+        """Reconstruye los índices que dependen de personas (id -> persona, RUT -> casos)"""
+        self._personas_by_id: Dict[Any, Dict[str, Any]] = {
+            p.get('id'): p for p in self.data_store["personas"].values()
+        }
+        self._casos_by_rut: Dict[str, List[Dict[str, Any]]] = {}
+        for caso in self.data_store["casos"]:
+            self._index_caso_rut(caso)
+    
+    def _index_caso_rut(self, caso: Dict[str, Any]):
+        """Agrega un caso al índice RUT -> casos"""
+        persona = self._personas_by_id.get(caso.get('persona_id'))
+        if persona and persona.get('rut'):
+            self._casos_by_rut.setdefault(persona['rut'], []).append(caso)
+    
+    def get_caso_record(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Fila de casos.json de un caso (sin EDN), o None si no existe"""
+        return self._casos_by_case_id.get(case_id)
+    
+    def get_persona_by_id(self, persona_id: Any) -> Optional[Dict[str, Any]]:
+        """Persona por su id, o None si no existe"""
+        return self._personas_by_id.get(persona_id)
+    
+    def get_suministro_by_id(self, suministro_id: Any) -> Optional[Dict[str, Any]]:
+        """Suministro por su id, o None si no existe"""
+        return self._suministros_by_id.get(suministro_id)
+    
+    def get_casos_by_rut(self, rut: str) -> List[Dict[str, Any]]:
+        """Filas de casos.json de la persona con ese RUT"""
+        return list(self._casos_by_rut.get(rut, []))
+    
+    def get_persona_by_rut(self, rut: str) -> Optional[Dict[str, Any]]:
+        """Persona por su RUT, o None si no existe"""
+        return self.data_store["personas"].get(rut)
+    
+    def get_edn(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """EDN de un caso tal como está guardado (sin metadatos de casos.json), o None si no existe"""
+        return self.edn_store.get(case_id)
+    
+    def count_casos(self) -> int:
+        """Número de casos en la base"""
+        return len(self.data_store["casos"])
+    
     def get_caso_by_case_id(self, case_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un caso por su case_id, fusionando metadatos del caso con el EDN
         
         Args:
             case_id: ID del caso
-            
+        
         Returns:
             Diccionario con el EDN fusionado con metadatos del caso, o None si no existe
         """
         # Buscar caso en casos.json
-        caso = None
-        for c in self.data_store["casos"]:
-            if c.get('case_id') == case_id:
-                caso = c
-                break
+        caso = self._casos_by_case_id.get(case_id)
         
         if not caso:
             return None
         
-        # Obtener EDN desde edn.json (nueva estructura)
-        # Si no existe en edn.json, intentar desde caso.edn (compatibilidad con estructura antigua)
-        edn = self.data_store["edns"].get(case_id)
+        # Obtener EDN desde el almacenamiento por caso (nueva estructura)
+        # Si no existe, intentar desde caso.edn (compatibilidad con estructura antigua)
+        edn = self.edn_store.get(case_id)
         if not edn:
             # Fallback: estructura antigua con EDN anidado
             edn = caso.get('edn', {})
@@ -107,142 +188,303 @@ class JSONDBManager:
         
         return merged
     
+    def _build_summary_row(self, caso: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fila del listado de casos para un caso de casos.json
+        Usa el EDN como fuente de verdad para unified_context (cliente, RUT, etc.)
+        
+        Args:
+            caso: Fila de casos.json
+        
+        Returns:
+            Diccionario con los campos de CaseSummary más 'estado' y 'tipo_caso'
+        """
+        case_id = caso['case_id']
+        
+        # Resumen del EDN desde el índice (fuente de verdad, sin leer el EDN completo)
+        edn = self.edn_store.summary(case_id) or {}
+        
+        # Usar datos del EDN como fuente principal
+        # Si no están en el EDN, intentar desde personas.json como fallback
+        client_name = edn.get('client_name')
+        rut_client = edn.get('rut_client')
+        
+        # Fallback a personas.json solo si no hay datos en EDN
+        if not client_name or client_name == '—' or client_name == 'N/A':
+            persona_id = caso.get('persona_id')
+            persona = self._personas_by_id.get(persona_id)
+            if persona:
+                client_name = persona.get('nombre', 'N/A')
+                if not rut_client or rut_client == '—' or rut_client == 'N/A':
+                    rut_client = persona.get('rut', 'N/A')
+        
+        # Si aún no hay nombre, usar un placeholder
+        if not client_name or client_name == '—':
+            client_name = f"Cliente {case_id}"
+        if not rut_client or rut_client == '—':
+            rut_client = f"RUT-{case_id}"
+        
+        # Usar tipo_caso del EDN como materia si no hay materia específica
+        tipo_caso = edn.get('tipo_caso')
+        materia = caso.get('materia') or edn.get('materia') or tipo_caso or 'N/A'
+        if materia == 'Reclamo SEC' and tipo_caso:
+            materia = tipo_caso
+        
+        try:
+            monto_disputa = float(caso.get('monto_disputa') or edn.get('monto_disputa') or 0)
+        except (TypeError, ValueError):
+            monto_disputa = 0.0
+        
+        estado = caso.get('estado') or 'PENDIENTE'
+        return {
+            'case_id': case_id,
+            'empresa': caso.get('empresa') or 'N/A',
+            'materia': materia,
+            'monto_disputa': monto_disputa,
+            'fecha_ingreso': caso.get('fecha_ingreso') or 'N/A',
+            'estado': estado,
+            'status': estado if estado in SUMMARY_STATUSES else 'PENDIENTE',
+            'client_name': client_name,
+            'rut_client': rut_client,
+            'tipo_caso': tipo_caso
+        }
+    
+    def _search_terms(self, row: Dict[str, Any]) -> set:
+        """Términos del índice de búsqueda para la fila de un caso (NIS y documentos desde el índice de EDNs)"""
+        edn = self.edn_store.summary(row['case_id']) or {}
+        return CaseSearchIndex.case_terms(row, edn.get('service_nis'), edn.get('document_names') or [])
+    
+    def _build_summaries(self):
+        """Materializa las filas del listado de todos los casos (orden de casos.json)"""
+        self.case_list.rebuild(
+            self._build_summary_row(caso) for caso in self.data_store["casos"] if caso.get('case_id')
+        )
+        with self._search_index_lock:
+            self.search_index.clear()
+            self._search_index_ready = False
+    
+    def _refresh_summary(self, case_id: str):
+        """Recalcula la fila del listado (y los términos de búsqueda, si el índice ya se construyó) de un caso tras una escritura"""
+        caso = self._casos_by_case_id.get(case_id)
+        with self._search_index_lock:
+            if caso is None:
+                self.case_list.remove(case_id)
+                self.search_index.remove(case_id)
+                return
+            # Se reemplaza la fila (no se modifica en el lugar): quien ya tenga la lista anterior no la ve cambiar
+            row = self._build_summary_row(caso)
+            self.case_list.put(row)
+            if self._search_index_ready:
+                self.search_index.put(case_id, self._search_terms(row))
+    
+    def _refresh_summaries_for_rut(self, rut: str):
+        """Recalcula las filas de los casos de una persona (su nombre es el fallback del cliente)"""
+        for caso in self._casos_by_rut.get(rut, []):
+            self._refresh_summary(caso['case_id'])
+    
     def get_all_casos(self) -> List[Dict[str, Any]]:
         """
         Obtiene todos los casos con información resumida
-        Usa el EDN como fuente de verdad para unified_context (cliente, RUT, etc.)
+        
+        Las filas se materializan al cargar la base y se recalculan en cada escritura que
+        afecta al caso (update_edn, update_caso, personas), así que el listado no recorre
+        casos.json ni los EDNs en cada request. Las filas son compartidas: no modificarlas.
         
         Returns:
             Lista de diccionarios con información resumida de casos
         """
-        summaries = []
-        for caso in self.data_store["casos"]:
-            case_id = caso.get('case_id')
-            if not case_id:
-                continue
-            
-            # Obtener EDN para usar como fuente de verdad
-            edn = self.data_store["edns"].get(case_id)
-            if not edn:
-                # Si no hay EDN, crear uno básico
-                edn = {
-                    "unified_context": {},
-                    "compilation_metadata": {"case_id": case_id}
-                }
-            
-            unified_context = edn.get('unified_context', {})
-            
-            # Usar datos del EDN como fuente principal
-            # Si no están en el EDN, intentar desde personas.json como fallback
-            client_name = unified_context.get('client_name')
-            rut_client = unified_context.get('rut_client')
-            
-            # Fallback a personas.json solo si no hay datos en EDN
-            if not client_name or client_name == '—' or client_name == 'N/A':
-                persona_id = caso.get('persona_id')
-                persona = next((p for p in self.data_store["personas"].values() if p.get('id') == persona_id), None)
-                if persona:
-                    client_name = persona.get('nombre', 'N/A')
-                    if not rut_client or rut_client == '—' or rut_client == 'N/A':
-                        rut_client = persona.get('rut', 'N/A')
-            
-            # Si aún no hay nombre, usar un placeholder
-            if not client_name or client_name == '—':
-                client_name = f"Cliente {case_id}"
-            if not rut_client or rut_client == '—':
-                rut_client = f"RUT-{case_id}"
-            
-            # Usar tipo_caso del EDN como materia si no hay materia específica
-            compilation_metadata = edn.get('compilation_metadata', {})
-            tipo_caso = compilation_metadata.get('tipo_caso')
-            materia = caso.get('materia') or edn.get('materia') or tipo_caso or 'N/A'
-            
-            summaries.append({
-                'case_id': case_id,
-                'empresa': caso.get('empresa') or 'N/A',
-                'materia': materia,
-                'monto_disputa': caso.get('monto_disputa') or edn.get('monto_disputa') or 0,
-                'fecha_ingreso': caso.get('fecha_ingreso') or 'N/A',
-                'estado': caso.get('estado') or 'PENDIENTE',
-                'client_name': client_name,
-                'rut_client': rut_client
-            })
-        
-        return summaries
+        return self.case_list.rows()
+    
+    def _search_case_ids(self, query: str) -> Optional[set]:
+        """case_ids que coinciden con la consulta (None si no tiene términos); construye el índice al primer uso"""
+        with self._search_index_lock:
+            if not self._search_index_ready:
+                self.search_index.rebuild({
+                    row['case_id']: self._search_terms(row) for row in self.case_list.rows()
+                })
+                self._search_index_ready = True
+        return self.search_index.search(query)
+    
+    def search_casos(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Busca casos con el índice invertido (ver CaseSearchIndex)
+        
+        Args:
+            query: Texto buscado (sin distinguir tildes ni mayúsculas; cada término por prefijo)
+        
+        Returns:
+            Filas de get_all_casos que coinciden, en el orden de casos.json
+        """
+        case_ids = self._search_case_ids(query)
+        if case_ids is None:
+            return self.get_all_casos()
+        return self.case_list.rows_for(case_ids)
+    
+    def list_casos(self, q: Optional[str] = None, estado: Optional[str] = None,
+                   tipo_caso: Optional[str] = None, empresa: Optional[str] = None,
+                   fecha_desde: Optional[str] = None, fecha_hasta: Optional[str] = None,
+                   sort_by: Optional[str] = None, descending: bool = False,
+                   cursor: Optional[str] = None, offset: int = 0,
+                   limit: int = 100) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        Página del listado de casos con búsqueda, filtros y orden (ver CaseListIndex.page)
+        
+        Args:
+            q: Texto buscado (índice invertido)
+            estado: Estado mostrado en el listado (status)
+            tipo_caso: Tipo de caso del EDN
+            empresa: Empresa distribuidora
+            fecha_desde: Fecha de ingreso mínima (YYYY-MM-DD)
+            fecha_hasta: Fecha de ingreso máxima (YYYY-MM-DD)
+            sort_by: Columna de ordenamiento
+            descending: Orden descendente
+            cursor: Cursor de la página anterior
+            offset: Filas a saltar (paginación por número de página)
+            limit: Tamaño de página
+        
+        Returns:
+            (filas de la página, total que cumple los filtros, cursor de la página siguiente o None)
+        """
+        candidates = self._search_case_ids(q) if q else None
+        return self.case_list.page(
+            sort_by=sort_by, descending=descending, candidates=candidates,
+            filters={'status': estado, 'tipo_caso': tipo_caso, 'empresa': empresa},
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+            cursor=cursor, offset=offset, limit=limit
+        )
+    
+    def _base_revision(self) -> str:
+        """Versión de los datos de partida: edn.json importado y archivo de estado compartido"""
+        seed = self.edn_store.seed or {}
+        return f"{seed.get('size', 0)}-{seed.get('mtime', 0)}-{self.shared_state.epoch}"
+    
+    def case_revision(self, case_id: str) -> Optional[str]:
+        """
+        Revisión de un caso para su ETag: cambia con cada escritura del caso (update_edn, update_caso)
+        hecha por cualquier worker
+        
+        Returns:
+            Texto opaco, o None si el caso no existe
+        """
+        if case_id not in self._casos_by_case_id:
+            return None
+        return f"{self._base_revision()}:{self.shared_state.revision('case', case_id)}"
+    
+    def list_revision(self) -> str:
+        """Revisión del listado de casos para su ETag (versión global del estado compartido)"""
+        return f"{self._base_revision()}:{self.shared_state.version}"
     
     def reload(self):
         """Recarga todos los datos desde los archivos JSON"""
         self.data_store = self._load_data()
+        self._build_indexes()
     
     def reload_case(self, case_id: str) -> Optional[Dict[str, Any]]:
         """
         Recarga un caso específico desde los archivos JSON
         
+        update_edn y update_caso ya actualizan la memoria: sólo hace falta tras cambios hechos
+        fuera de este gestor (lee casos.json, personas.json y suministros.json completos).
+        
         Args:
             case_id: ID del caso a recargar
-            
+        
         Returns:
             Diccionario con el EDN actualizado o None si no existe
         """
+        return self._reload_cases([case_id]).get(case_id)
+    
+    def _reload_cases(self, case_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Recarga varios casos leyendo casos.json, personas.json y suministros.json una sola vez"""
         # Recargar casos
         casos_path = self.files["casos"]
         if casos_path.exists():
-            with open(casos_path, "r", encoding="utf-8") as f:
-                casos = json.load(f)
-                # Actualizar el caso en memoria
-                for caso in casos:
-                    if caso.get('case_id') == case_id:
-                        # Actualizar en la lista de casos
-                        for idx, c in enumerate(self.data_store["casos"]):
-                            if c.get('case_id') == case_id:
-                                self.data_store["casos"][idx] = caso
-                                break
-                        else:
-                            # Si no existe, agregarlo
-                            self.data_store["casos"].append(caso)
+            wanted = set(case_ids)
+            leidos: Dict[str, Dict[str, Any]] = {}
+            for caso in load_file(casos_path):
+                if caso.get('case_id') in wanted:
+                    leidos.setdefault(caso['case_id'], caso)
+            for case_id, caso in leidos.items():
+                actual = self._casos_by_case_id.get(case_id)
+                if actual is not None:
+                    # Actualizar en el lugar para que los índices sigan apuntando al caso
+                    actual.clear()
+                    actual.update(caso)
+                else:
+                    # Si no existe, agregarlo
+                    self.data_store["casos"].append(caso)
+                    self._casos_by_case_id[case_id] = caso
+        
+        # Recargar personas y suministros también
+        self._reload_personas_suministros()
         
         # Recargar EDN
-        edn_path = self.files["edn"]
-        if edn_path.exists():
-            with open(edn_path, "r", encoding="utf-8") as f:
-                edns = json.load(f)
-                if case_id in edns:
-                    self.data_store["edns"][case_id] = edns[case_id]
-                    return edns[case_id]
+        edns = {}
+        for case_id in case_ids:
+            edns[case_id] = self.edn_store.reload_case(case_id)
+            self._refresh_summary(case_id)
+            self.document_index.invalidate(case_id)
+        return edns
+    
+    def _reload_personas_suministros(self):
+        """Recarga personas.json y suministros.json y sus índices"""
+        self.data_store["personas"] = {p['rut']: p for p in load_file(self.files["personas"])}
+        self.data_store["suministros"] = {f"{s['nis']}-{s['comuna']}": s for s in load_file(self.files["suministros"])}
+        self._index_personas()
+        self._suministros_by_id = {s.get('id'): s for s in self.data_store["suministros"].values()}
+    
+    def _publish(self, kind: str, key: Optional[str] = None):
+        """Avisa a los demás workers de una escritura (si falla, sólo ellos quedan desactualizados)"""
+        try:
+            self.shared_state.publish(kind, key)
+        except Exception as e:
+            logger.warning(f"No se pudo publicar el cambio {kind}:{key} en el estado compartido: {e}")
+    
+    def apply_shared_changes(self, changes: List[Tuple[str, Optional[str]]]):
+        """
+        Aplica los cambios que publicaron otros workers (ver SharedState.sync)
         
-        # Recargar personas y suministros también
-        self._load_data()
-        return None
+        Sólo se recarga lo que cambió: los casos modificados, personas/suministros o documentos.
+        
+        Args:
+            changes: Lista de (tipo, clave) en orden de publicación
+        """
+        if not changes:
+            return
+        if any(kind == 'reload' for kind, _ in changes):
+            self.reload()
+            return
+        
+        case_ids = list(dict.fromkeys(key for kind, key in changes if kind == 'case' and key))
+        ruts = {key for kind, key in changes if kind == 'personas' and key}
+        if case_ids:
+            self._reload_cases(case_ids)
+        elif any(kind in ('personas', 'suministros') for kind, _ in changes):
+            self._reload_personas_suministros()
+        for rut in ruts:
+            self._refresh_summaries_for_rut(rut)
+        if any(kind == 'documentos' for kind, _ in changes):
+            self._set_documentos(load_file(self.files["documentos"]))
     
     def update_edn(self, case_id: str, edn: Dict[str, Any]) -> bool:
         """
-        Actualiza un EDN en edn.json y sincroniza con personas.json y suministros.json
+        Actualiza un EDN y sincroniza con personas.json y suministros.json
+        
+        El cambio se agrega al log del almacenamiento por caso (ver EDNStore); edn.json no se modifica.
         
         Args:
             case_id: ID del caso
             edn: Diccionario con el EDN a guardar
-            
+        
         Returns:
             True si se actualizó correctamente, False en caso contrario
         """
         try:
-            # Cargar EDNs existentes
-            edn_path = self.files["edn"]
-            if edn_path.exists():
-                with open(edn_path, "r", encoding="utf-8") as f:
-                    edns = json.load(f)
-            else:
-                edns = {}
-            
-            # Actualizar EDN
-            edns[case_id] = edn
-            
-            # Guardar
-            with open(edn_path, "w", encoding="utf-8") as f:
-                json.dump(edns, f, indent=2, ensure_ascii=False)
-            
-            # Actualizar en memoria
-            self.data_store["edns"][case_id] = edn
+            # Registrar las secciones modificadas en el log y actualizar en memoria
+            self.edn_store.put(case_id, edn)
+            self._refresh_summary(case_id)
+            self.document_index.invalidate(case_id)
+            self._publish('case', case_id)
             
             # Sincronizar unified_context con personas.json y suministros.json
             unified_context = edn.get('unified_context', {})
@@ -266,7 +508,7 @@ class JSONDBManager:
             
             return True
         except Exception as e:
-            print(f"Error actualizando EDN en edn.json: {e}")
+            print(f"Error actualizando EDN: {e}")
             import traceback
             traceback.print_exc()
             return False
@@ -277,45 +519,47 @@ class JSONDBManager:
         if not personas_path.exists():
             return
         
-        try:
-            with open(personas_path, "r", encoding="utf-8") as f:
-                personas = json.load(f)
-            
+        nombre_valido = nombre if nombre and nombre not in ['—', 'N/A', ''] else None
+        
+        # Evitar reescribir personas.json si la persona ya tiene estos datos (caso típico al editar el checklist)
+        actual = self.data_store["personas"].get(rut)
+        if actual is not None and (nombre_valido is None or actual.get("nombre") == nombre_valido) \
+                and (not email or actual.get("email") == email) \
+                and (not telefono or actual.get("telefono") == telefono):
+            return
+        
+        def mutate(personas):
             # Buscar persona por RUT
-            persona_encontrada = None
-            for idx, persona in enumerate(personas):
+            for persona in personas:
                 if persona.get("rut") == rut:
-                    persona_encontrada = idx
-                    break
+                    # Actualizar persona existente
+                    if nombre_valido:
+                        persona["nombre"] = nombre_valido
+                    if email:
+                        persona["email"] = email
+                    if telefono:
+                        persona["telefono"] = telefono
+                    return persona
             
-            if persona_encontrada is not None:
-                # Actualizar persona existente
-                if nombre and nombre not in ['—', 'N/A', '']:
-                    personas[persona_encontrada]["nombre"] = nombre
-                if email:
-                    personas[persona_encontrada]["email"] = email
-                if telefono:
-                    personas[persona_encontrada]["telefono"] = telefono
-            else:
-                # Crear nueva persona si no existe
-                nueva_persona = {
-                    "id": len(personas) + 1,
-                    "rut": rut,
-                    "nombre": nombre if nombre and nombre not in ['—', 'N/A', ''] else f"Cliente {rut}",
-                    "email": email,
-                    "telefono": telefono
-                }
-                personas.append(nueva_persona)
-            
-            # Guardar
-            with open(personas_path, "w", encoding="utf-8") as f:
-                json.dump(personas, f, indent=2, ensure_ascii=False)
+            # Crear nueva persona si no existe
+            nueva_persona = {
+                "id": len(personas) + 1,
+                "rut": rut,
+                "nombre": nombre_valido or f"Cliente {rut}",
+                "email": email,
+                "telefono": telefono
+            }
+            personas.append(nueva_persona)
+            return nueva_persona
+        
+        try:
+            persona = write_coordinator.update(personas_path, mutate)
             
             # Actualizar en memoria (self.personas es un dict indexado por RUT)
-            if persona_encontrada is not None:
-                self.data_store["personas"][rut] = personas[persona_encontrada]
-            else:
-                self.data_store["personas"][rut] = nueva_persona
+            self.data_store["personas"][rut] = persona
+            self._personas_by_id[persona.get("id")] = persona
+            self._refresh_summaries_for_rut(rut)
+            self._publish('personas', rut)
         except Exception as e:
             print(f"Error sincronizando persona: {e}")
     
@@ -325,48 +569,187 @@ class JSONDBManager:
         if not suministros_path.exists():
             return
         
-        try:
-            with open(suministros_path, "r", encoding="utf-8") as f:
-                suministros = json.load(f)
-            
+        comuna_valida = comuna if comuna and comuna not in ['—', 'N/A', ''] else None
+        direccion_valida = direccion if direccion and direccion not in ['—', 'N/A', ''] else None
+        
+        # Evitar reescribir suministros.json si el suministro ya tiene estos datos
+        actual = self.data_store["suministros"].get(f"{nis}-{comuna_valida or 'Desconocida'}")
+        if actual is not None and (direccion_valida is None or actual.get("direccion") == direccion_valida):
+            return
+        
+        def mutate(suministros):
             # Buscar suministro por NIS
-            suministro_encontrado = None
-            for idx, suministro in enumerate(suministros):
+            for suministro in suministros:
                 if suministro.get("nis") == nis:
-                    suministro_encontrado = idx
-                    break
-            
-            if suministro_encontrado is not None:
-                # Actualizar suministro existente
-                if comuna and comuna not in ['—', 'N/A', '']:
-                    suministros[suministro_encontrado]["comuna"] = comuna
-                if direccion and direccion not in ['—', 'N/A', '']:
-                    suministros[suministro_encontrado]["direccion"] = direccion
-            else:
-                # Crear nuevo suministro si no existe
-                nuevo_suministro = {
-                    "id": len(suministros) + 1,
-                    "nis": nis,
-                    "comuna": comuna if comuna and comuna not in ['—', 'N/A', ''] else "Desconocida",
-                    "direccion": direccion,
-                    "numero_cliente": None
-                }
-                suministros.append(nuevo_suministro)
+                    # Actualizar suministro existente
+                    if comuna_valida:
+                        suministro["comuna"] = comuna_valida
+                    if direccion_valida:
+                        suministro["direccion"] = direccion_valida
+                    return suministro
             
-            # Guardar
-            with open(suministros_path, "w", encoding="utf-8") as f:
-                json.dump(suministros, f, indent=2, ensure_ascii=False)
+            # Crear nuevo suministro si no existe
+            nuevo_suministro = {
+                "id": len(suministros) + 1,
+                "nis": nis,
+                "comuna": comuna_valida or "Desconocida",
+                "direccion": direccion,
+                "numero_cliente": None
+            }
+            suministros.append(nuevo_suministro)
+            return nuevo_suministro
+        
+        try:
+            suministro = write_coordinator.update(suministros_path, mutate)
             
             # Actualizar en memoria
-            comuna_key = comuna if comuna and comuna not in ['—', 'N/A', ''] else "Desconocida"
-            key = f"{nis}-{comuna_key}"
-            if suministro_encontrado is not None:
-                self.data_store["suministros"][key] = suministros[suministro_encontrado]
-            else:
-                self.data_store["suministros"][key] = nuevo_suministro
+            key = f"{nis}-{comuna_valida or 'Desconocida'}"
+            self.data_store["suministros"][key] = suministro
+            self._suministros_by_id[suministro.get("id")] = suministro
+            self._publish('suministros', nis)
         except Exception as e:
             print(f"Error sincronizando suministro: {e}")
     
+    def update_caso(self, case_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza metadatos de un caso en casos.json (estado, materia, empresa, etc.)
+        
+        Args:
+            case_id: ID del caso
+            fields: Campos a actualizar
+        
+        Returns:
+            Fila actualizada del caso o None si no existe
+        """
+        def mutate(casos):
+            for caso in casos:
+                if caso.get("case_id") == case_id:
+                    caso.update(fields)
+                    return caso
+            return None
+        
+        caso_encontrado = write_coordinator.update(self.files["casos"], mutate)
+        if caso_encontrado is None:
+            return None
+        
+        # Actualizar en memoria (en el lugar, para que los índices sigan apuntando al caso)
+        actual = self._casos_by_case_id.get(case_id)
+        if actual is not None:
+            actual.update(fields)
+            self._refresh_summary(case_id)
+        self._publish('case', case_id)
+        return caso_encontrado
+    
+    def update_persona(self, rut: str, nombre: str = None, email: str = None, telefono: str = None):
+        """Actualiza una persona existente en personas.json (no crea personas nuevas)"""
+        def mutate(personas):
+            # Buscar y actualizar
+            for persona in personas:
+                if persona.get("rut") == rut:
+                    if nombre:
+                        persona["nombre"] = nombre
+                    if email:
+                        persona["email"] = email
+                    if telefono:
+                        persona["telefono"] = telefono
+                    return persona
+            return None
+        
+        persona = write_coordinator.update(self.files["personas"], mutate)
+        if persona is not None:
+            # Actualizar en memoria
+            self.data_store["personas"][rut] = persona
+            self._personas_by_id[persona.get("id")] = persona
+            self._refresh_summaries_for_rut(rut)
+            self._publish('personas', rut)
+    
+    def update_suministro(self, nis: str, comuna: str = None, direccion: str = None):
+        """Actualiza un suministro existente en suministros.json (no crea suministros nuevos)"""
+        def mutate(suministros):
+            # Buscar y actualizar
+            for suministro in suministros:
+                if suministro.get("nis") == nis:
+                    if comuna:
+                        suministro["comuna"] = comuna
+                    if direccion:
+                        suministro["direccion"] = direccion
+                    return suministro
+            return None
+        
+        suministro = write_coordinator.update(self.files["suministros"], mutate)
+        if suministro is not None:
+            # Actualizar en memoria (la clave depende de la comuna)
+            self.data_store["suministros"] = {
+                key: s for key, s in self.data_store["suministros"].items() if s.get("id") != suministro.get("id")
+            }
+            self.data_store["suministros"][f"{suministro['nis']}-{suministro['comuna']}"] = suministro
+            self._suministros_by_id[suministro.get("id")] = suministro
+            self._publish('suministros', nis)
+    
+    def get_documento(self, case_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """Documento de documentos.json por (case_id, file_id), o None si no existe"""
+        return self.document_index.get(case_id, file_id)
+    
+    def get_documentos_by_file_id(self, file_id: str) -> List[Dict[str, Any]]:
+        """Documentos de documentos.json con ese file_id (de cualquier caso)"""
+        return self.document_index.by_file_id(file_id)
+    
+    def find_documento(self, case_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca un documento en documentos.json y, si no está, en el document_inventory del EDN del caso
+        
+        Args:
+            case_id: ID del caso
+            file_id: ID del documento
+        
+        Returns:
+            Documento encontrado o None
+        """
+        documento = self.document_index.get(case_id, file_id)
+        if documento is None:
+            documento = self.document_index.inventory(case_id, self._edn_inventory).get(file_id)
+        return documento
+    
+    def _edn_inventory(self, case_id: str) -> Optional[Dict[str, Any]]:
+        edn = self.edn_store.get(case_id)
+        return edn.get('document_inventory') if edn else None
+    
+    def _set_documentos(self, documentos: List[Dict[str, Any]]):
+        """Reemplaza los documentos en memoria por los leídos de disco al escribir y reindexa"""
+        self.data_store["documentos"] = documentos
+        self.document_index.rebuild(documentos)
+    
+    def add_documento(self, documento: Dict[str, Any]):
+        """Agrega un documento a documentos.json"""
+        def mutate(documentos):
+            documentos.append(documento)
+            return documentos
+        
+        self._set_documentos(write_coordinator.update(self.files["documentos"], mutate))
+        self._publish('documentos')
+    
+    def update_documento(self, case_id: str, file_id: str, fields: Dict[str, Any]) -> bool:
+        """
+        Actualiza campos de un documento en documentos.json
+        
+        Returns:
+            True si el documento existía y se actualizó
+        """
+        def mutate(documentos):
+            # Buscar y actualizar documento
+            for doc in documentos:
+                if doc.get("file_id") == file_id and doc.get("case_id") == case_id:
+                    doc.update(fields)
+                    return documentos
+            return None
+        
+        documentos = write_coordinator.update(self.files["documentos"], mutate)
+        if documentos is None:
+            return False
+        self._set_documentos(documentos)
+        self._publish('documentos')
+        return True
+    
     @property
     def casos(self):
         """Propiedad para acceder a casos de manera compatible"""
@@ -0,0 +1,204 @@
+"""
+Índice invertido en memoria para la búsqueda de casos (/casos/search y el filtro q de /casos)
+Los textos se normalizan (sin tildes, en minúsculas) y cada término de la consulta se busca por prefijo
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SEPARATORS_RE = re.compile(r"[.\-\s]")
+
+# Secciones de document_inventory que no son documentos presentes en el expediente
+_SKIPPED_INVENTORY_LEVELS = ["level_0_missing"]
+
+
+def normalize_text(text: Any) -> str:
+    """Texto en minúsculas y sin tildes ('Pérez Núñez' -> 'perez nunez'); se descarta lo que no es ASCII"""
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return text.lower()
+
+
+@lru_cache(maxsize=65536)
+def _cached_tokens(text: str) -> Tuple[str, ...]:
+    # Nombres de documentos, empresas y materias se repiten mucho entre casos
+    return tuple(_TOKEN_RE.findall(normalize_text(text)))
+
+
+def tokenize(text: Any) -> List[str]:
+    """Términos alfanuméricos normalizados de un texto"""
+    return list(_cached_tokens(str(text)))
+
+
+def query_terms(query: Any) -> List[str]:
+    """Términos de una consulta, del más largo (más selectivo) al más corto"""
+    return sorted(set(tokenize(query)), key=len, reverse=True)
+
+
+def matches_terms(terms_of_query: List[str], terms: Set[str]) -> bool:
+    """Misma regla que CaseSearchIndex.search sobre los términos de un solo caso (sin índice)"""
+    return all(any(term.startswith(prefix) for term in terms) for prefix in terms_of_query)
+
+
+def document_names(document_inventory: Optional[Dict[str, Any]]) -> List[str]:
+    """Nombres (original y estandarizado) de los documentos de un inventario, sin repetir"""
+    names = []
+    for level, docs in (document_inventory or {}).items():
+        if level in _SKIPPED_INVENTORY_LEVELS or not isinstance(docs, list):
+            continue
+        for doc in docs:
+            if not isinstance(doc, dict):
+                continue
+            for key in ("original_name", "standardized_name"):
+                name = doc.get(key)
+                if name and name not in names:
+                    names.append(name)
+    return names
+
+
+class CaseSearchIndex:
+    """
+    Índice invertido término -> case_ids.
+    
+    - Textos (cliente, empresa, materia, tipo de caso, nombres de documentos, monto): se indexa
+      cada término normalizado.
+    - Identificadores (case_id, RUT, NIS): además de sus términos se indexa la forma compacta
+      sin puntos ni guiones, para que '12345678-9', '12.345.678-9' y '123456789' encuentren el mismo RUT.
+    
+    Una consulta encuentra los casos que tienen, para cada uno de sus términos, algún término
+    que empiece con él. El vocabulario se mantiene ordenado, así que cada prefijo se resuelve con
+    una búsqueda binaria. put() reemplaza los términos de un caso, por lo que el índice se
+    actualiza caso a caso en cada escritura.
+    """
+    
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        # Términos por caso como tuplas (un set por caso ocupa varias veces más memoria)
+        self._terms_by_case: Dict[str, Tuple[str, ...]] = {}
+        self._vocabulary: List[str] = []
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._terms_by_case)
+    
+    @staticmethod
+    def case_terms(row: Dict[str, Any], service_nis: Any = None, names: Iterable[str] = ()) -> Set[str]:
+        """
+        Términos indexados de un caso
+        
+        Args:
+            row: Fila del listado de casos (ver JSONDBManager.get_all_casos)
+            service_nis: NIS del suministro (unified_context del EDN)
+            names: Nombres de los documentos del caso (ver document_names)
+        
+        Returns:
+            Conjunto de términos normalizados
+        """
+        monto = row.get('monto_disputa')
+        if isinstance(monto, float) and monto.is_integer():
+            monto = int(monto)
+        texts = [row.get('client_name'), row.get('empresa'), row.get('materia'),
+                 row.get('tipo_caso'), monto, *names]
+        identifiers = [row.get('case_id'), row.get('rut_client'), service_nis]
+        
+        terms: Set[str] = set()
+        for text in texts:
+            if text:
+                terms.update(_cached_tokens(str(text)))
+        for identifier in identifiers:
+            if identifier:
+                terms.update(_cached_tokens(str(identifier)))
+                compact = _SEPARATORS_RE.sub("", normalize_text(identifier))
+                if _TOKEN_RE.fullmatch(compact):
+                    terms.add(compact)
+        return terms
+    
+    def put(self, case_id: str, terms: Set[str]):
+        """Reemplaza los términos indexados de un caso"""
+        with self._lock:
+            previous = set(self._terms_by_case.get(case_id, ()))
+            for term in previous - terms:
+                self._unlink(term, case_id)
+            for term in terms - previous:
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = set()
+                    bisect.insort(self._vocabulary, term)
+                postings.add(case_id)
+            self._terms_by_case[case_id] = tuple(terms)
+    
+    def remove(self, case_id: str):
+        """Quita un caso del índice"""
+        with self._lock:
+            for term in self._terms_by_case.pop(case_id, ()):
+                self._unlink(term, case_id)
+    
+    def clear(self):
+        """Vacía el índice"""
+        with self._lock:
+            self._postings = {}
+            self._terms_by_case = {}
+            self._vocabulary = []
+    
+    def rebuild(self, terms_by_case: Dict[str, Set[str]]):
+        """Reconstruye el índice completo (ordena el vocabulario una sola vez, no término a término)"""
+        postings: Dict[str, Set[str]] = {}
+        for case_id, terms in terms_by_case.items():
+            for term in terms:
+                postings.setdefault(term, set()).add(case_id)
+        with self._lock:
+            self._postings = postings
+            self._terms_by_case = {case_id: tuple(terms) for case_id, terms in terms_by_case.items()}
+            self._vocabulary = sorted(postings)
+    
+    def _unlink(self, term: str, case_id: str):
+        postings = self._postings.get(term)
+        if postings is None:
+            return
+        postings.discard(case_id)
+        if not postings:
+            del self._postings[term]
+            position = bisect.bisect_left(self._vocabulary, term)
+            if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                del self._vocabulary[position]
+    
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        """Casos con algún término que empieza con prefix"""
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff", lo=position)
+        if end - position == 1:
+            return self._postings[self._vocabulary[position]]
+        matches: Set[str] = set()
+        for term in self._vocabulary[position:end]:
+            matches |= self._postings[term]
+        return matches
+    
+    def search(self, query: str) -> Optional[Set[str]]:
+        """
+        Casos que coinciden con todos los términos de la consulta
+        
+        Args:
+            query: Texto buscado
+        
+        Returns:
+            case_ids encontrados, o None si la consulta no tiene términos (no filtra)
+        """
+        terms_of_query = query_terms(query)
+        if not terms_of_query:
+            return None
+        
+        with self._lock:
+            result: Optional[Set[str]] = None
+            # Los términos más largos suelen ser los más selectivos: se intersecta desde ellos
+            for term in terms_of_query:
+                matches = self._prefix_matches(term)
+                result = set(matches) if result is None else result & matches
+                if not result:
+                    break
+            return result
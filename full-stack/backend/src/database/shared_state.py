@@ -0,0 +1,368 @@
+"""
+Estado compartido entre los workers de uvicorn, en un archivo SQLite en modo WAL
+Guarda los cambios en memoria de los casos (cases_store) y un registro de cambios numerado
+con el que cada worker invalida sus caches cuando otro escribe
+"""
+
+import os
+import sqlite3
+import threading
+import uuid
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import logging
+
+from src.config import SHARED_STATE_PATH
+from src.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Registros de cambios que se conservan; un worker más atrasado que esto recarga todo
+_CHANGES_KEPT = 10000
+# Casos por consulta al recargar estados (límite de parámetros de SQLite)
+_CASE_STATE_BATCH = 500
+
+
+class SharedState:
+    """
+    Estado compartido por todos los procesos que abren el mismo archivo.
+    
+    - case_state: por caso, los cambios en memoria que antes vivían en el dict cases_store de
+      cada worker (checklist, document_inventory), con un contador de versión por caso.
+    - changes: registro de cambios numerado (seq); el último seq es la versión global del estado.
+      Cada escritura de la base JSON publica ('case', case_id), ('personas', rut), etc. y los
+      demás workers lo leen con sync() para recargar sólo lo que cambió. Los cambios de
+      case_state se registran como ('case_state', case_id).
+    - revisions: último seq de cada (tipo, clave); a diferencia de changes no se poda, así que
+      sirve para las ETags (ver revision()).
+    
+    Para saber si otro proceso escribió basta con PRAGMA data_version, que no lee ninguna tabla;
+    por eso sync() se puede llamar en cada request.
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Archivo SQLite (se crea si no existe)
+        """
+        self.path = path
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._last_seq = 0
+        self._case_state: Dict[str, Tuple[int, bytes]] = {}
+        self._revisions: Dict[Tuple[str, str], int] = {}
+        self._epoch = ""
+    
+    def _ensure_open(self):
+        if self._conn is None or self._pid != os.getpid():
+            with self._lock:
+                self._connection()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Conexión del proceso (se abre de nuevo tras un fork)"""
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS case_state (
+                    case_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    version INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    key TEXT,
+                    origin TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS revisions (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # Identifica este archivo: si se borra y se vuelve a crear, los seq empiezan de nuevo
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+            self._epoch = conn.execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()[0]
+            self._conn = conn
+            self._pid = os.getpid()
+            self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._data_version = None
+            row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()
+            self._last_seq = row[0]
+            self._load_case_state(conn)
+            self._load_revisions(conn)
+        return self._conn
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transacción de escritura (BEGIN IMMEDIATE: toma el lock de escritura al empezar)"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def _load_case_state(self, conn: sqlite3.Connection):
+        self._case_state = {
+            case_id: (version, data) for case_id, data, version in
+            conn.execute("SELECT case_id, data, version FROM case_state")
+        }
+    
+    def _reload_case_states(self, conn: sqlite3.Connection, case_ids: Set[str]):
+        """Vuelve a leer el estado de los casos indicados (los que ya no tienen estado se quitan)"""
+        case_ids = list(case_ids)
+        for start in range(0, len(case_ids), _CASE_STATE_BATCH):
+            batch = case_ids[start:start + _CASE_STATE_BATCH]
+            rows = conn.execute(
+                f"SELECT case_id, data, version FROM case_state WHERE case_id IN ({', '.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            found = {case_id: (version, data) for case_id, data, version in rows}
+            for case_id in batch:
+                if case_id in found:
+                    self._case_state[case_id] = found[case_id]
+                else:
+                    self._case_state.pop(case_id, None)
+    
+    def _load_revisions(self, conn: sqlite3.Connection):
+        self._revisions = {
+            (kind, key): seq for kind, key, seq in conn.execute("SELECT kind, key, seq FROM revisions")
+        }
+    
+    def _record(self, conn: sqlite3.Connection, kind: str, key: Optional[str]) -> int:
+        """Agrega un cambio a changes y revisions dentro de una transacción; retorna su seq"""
+        seq = conn.execute(
+            "INSERT INTO changes (kind, key, origin) VALUES (?, ?, ?)", (kind, key, self.origin)
+        ).lastrowid
+        conn.execute(
+            "INSERT OR REPLACE INTO revisions (kind, key, seq) VALUES (?, ?, ?)", (kind, key or "", seq)
+        )
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - _CHANGES_KEPT,))
+        return seq
+    
+    def _recorded(self, kind: str, key: Optional[str], seq: int):
+        """Refleja en memoria un cambio propio ya confirmado (con self._lock tomado)"""
+        self._revisions[(kind, key or "")] = seq
+        if seq == self._last_seq + 1:
+            self._last_seq = seq
+        else:
+            # Hay cambios de otros procesos entre medio: que el próximo sync() los lea
+            self._data_version = None
+    
+    def sync(self) -> List[Tuple[str, Optional[str]]]:
+        """
+        Trae los cambios de otros procesos desde la última llamada
+        
+        Returns:
+            Cambios publicados por otros procesos como (tipo, clave), en orden. Un solo
+            ('reload', None) si el registro ya no tiene todos los cambios pendientes.
+        """
+        with self._lock:
+            conn = self._connection()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+            
+            first = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            rows = conn.execute(
+                "SELECT seq, kind, key, origin FROM changes WHERE seq > ? ORDER BY seq", (self._last_seq,)
+            ).fetchall()
+            behind = first is not None and first > self._last_seq + 1
+            if rows:
+                self._last_seq = rows[-1][0]
+            if behind:
+                self._load_case_state(conn)
+                self._load_revisions(conn)
+                return [("reload", None)]
+            # Sólo los casos cuyo estado cambió otro proceso (los de este proceso ya están en memoria)
+            self._reload_case_states(conn, {
+                key for _, kind, key, origin in rows if kind == "case_state" and key and origin != self.origin
+            })
+            for seq, kind, key, _ in rows:
+                self._revisions[(kind, key or "")] = seq
+            return [(kind, key) for _, kind, key, origin in rows if origin != self.origin]
+    
+    def publish(self, kind: str, key: Optional[str] = None) -> int:
+        """
+        Registra un cambio para los demás procesos
+        
+        Args:
+            kind: Tipo de cambio ('case', 'personas', 'suministros', 'documentos', ...)
+            key: Qué cambió dentro del tipo (p. ej. el case_id)
+        
+        Returns:
+            Versión global (seq) del cambio
+        """
+        with self._transaction() as conn:
+            seq = self._record(conn, kind, key)
+            self._recorded(kind, key, seq)
+        return seq
+    
+    @property
+    def version(self) -> int:
+        """Última versión global vista por este proceso"""
+        return self._last_seq
+    
+    @property
+    def epoch(self) -> str:
+        """Identificador del archivo de estado (cambia si se borra y se vuelve a crear)"""
+        self._ensure_open()
+        return self._epoch
+    
+    def revision(self, kind: str, key: Optional[str] = None) -> int:
+        """
+        seq del último cambio (tipo, clave) visto por este proceso (0 si nunca cambió)
+        
+        Se actualiza en sync() y en las escrituras propias, al mismo tiempo que los datos que
+        recarga el gestor, así que una ETag armada con este valor no adelanta a la respuesta.
+        """
+        self._ensure_open()
+        return self._revisions.get((kind, key or ""), 0)
+    
+    def case_state_version(self, case_id: str) -> int:
+        """Versión del estado en memoria de un caso (0 si no tiene)"""
+        self._ensure_open()
+        entry = self._case_state.get(case_id)
+        return entry[0] if entry else 0
+    
+    def get_case_state(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Copia del estado en memoria de un caso, o None si no tiene"""
+        self._ensure_open()
+        entry = self._case_state.get(case_id)
+        return loads(entry[1]) if entry else None
+    
+    def has_case_state(self, case_id: str) -> bool:
+        self._ensure_open()
+        return case_id in self._case_state
+    
+    def case_state_ids(self) -> List[str]:
+        self._ensure_open()
+        return list(self._case_state)
+    
+    def set_case_state(self, case_id: str, state: Dict[str, Any]):
+        """Reemplaza el estado en memoria de un caso (visible de inmediato para los demás procesos)"""
+        data = dumps(state)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT version FROM case_state WHERE case_id = ?", (case_id,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO case_state (case_id, data, version) VALUES (?, ?, ?)",
+                (case_id, data, version)
+            )
+            seq = self._record(conn, "case_state", case_id)
+            self._case_state[case_id] = (version, data)
+            self._recorded("case_state", case_id, seq)
+    
+    def update_case_state(self, case_id: str,
+                          update: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Modifica el estado en memoria de un caso en una sola transacción
+        
+        El estado se lee del archivo (no de la copia local) con el lock de escritura tomado, así
+        que dos workers que modifican el mismo caso a la vez no se pisan los cambios.
+        
+        Args:
+            case_id: ID del caso
+            update: Recibe el estado actual (None si no tiene) y retorna el nuevo
+        
+        Returns:
+            (versión del estado guardado, estado guardado)
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data, version FROM case_state WHERE case_id = ?", (case_id,)).fetchone()
+            state = update(loads(row[0]) if row else None)
+            data = dumps(state)
+            version = (row[1] if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO case_state (case_id, data, version) VALUES (?, ?, ?)",
+                (case_id, data, version)
+            )
+            seq = self._record(conn, "case_state", case_id)
+            self._case_state[case_id] = (version, data)
+            self._recorded("case_state", case_id, seq)
+        return version, state
+    
+    def read_case_state(self, case_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(versión, estado) de un caso leídos del archivo, con lo último escrito por cualquier proceso"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, version FROM case_state WHERE case_id = ?", (case_id,)
+            ).fetchone()
+        return (row[1], loads(row[0])) if row else (0, None)
+    
+    def delete_case_state(self, case_id: str):
+        """Elimina el estado en memoria de un caso"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM case_state WHERE case_id = ?", (case_id,))
+            seq = self._record(conn, "case_state", case_id)
+            self._case_state.pop(case_id, None)
+            self._recorded("case_state", case_id, seq)
+
+
+class SharedCaseStore(MutableMapping):
+    """
+    Vista tipo dict de case_state (reemplaza el dict cases_store de routes/casos.py).
+    
+    Las lecturas usan la copia local, que SharedState.sync() actualiza al inicio de cada request;
+    las escrituras van directo a SQLite. Cada lectura retorna una copia: modificar el valor
+    leído no cambia el estado, hay que volver a asignarlo (cases_store[case_id] = estado).
+    """
+    
+    def __init__(self, state: SharedState):
+        self.state = state
+    
+    def __getitem__(self, case_id: str) -> Dict[str, Any]:
+        value = self.state.get_case_state(case_id)
+        if value is None:
+            raise KeyError(case_id)
+        return value
+    
+    def __setitem__(self, case_id: str, value: Dict[str, Any]):
+        self.state.set_case_state(case_id, value)
+    
+    def __delitem__(self, case_id: str):
+        if not self.state.has_case_state(case_id):
+            raise KeyError(case_id)
+        self.state.delete_case_state(case_id)
+    
+    def __contains__(self, case_id: object) -> bool:
+        return self.state.has_case_state(case_id)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.state.case_state_ids())
+    
+    def __len__(self) -> int:
+        return len(self.state.case_state_ids())
+
+
+_shared_state: Optional[SharedState] = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """Estado compartido del proceso (SHARED_STATE_PATH)"""
+    global _shared_state
+    with _shared_state_lock:
+        if _shared_state is None:
+            _shared_state = SharedState(SHARED_STATE_PATH)
+        return _shared_state
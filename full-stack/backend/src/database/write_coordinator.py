@@ -0,0 +1,188 @@
+"""
+Coordinador de escrituras para los archivos de la base de datos JSON
+Serializa read-modify-write entre threads y procesos (lock de archivo) y escribe con archivo temporal + rename
+"""
+
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from src.config import JSON_DB_PRETTY
+from src.utils.serialization import dumps, load_file
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo se coordinan los threads del proceso
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _lock_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.lock")
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Lock exclusivo entre procesos asociado a un archivo (flock sobre .{nombre}.lock)
+    
+    Args:
+        path: Archivo a proteger (el lock vive en un archivo hermano, no en el archivo mismo,
+              para que sobreviva a los reemplazos por rename)
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(_lock_path(path), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def fsync_dir(directory: Path):
+    """Persiste la entrada de directorio tras un rename (no disponible en todas las plataformas)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path: Path, data: Any, pretty: bool = JSON_DB_PRETTY):
+    """
+    Escribe JSON en un archivo temporal, hace fsync y lo renombra sobre path
+    
+    Un lector concurrente ve el archivo anterior o el nuevo completo, nunca uno a medio escribir.
+    
+    Args:
+        path: Archivo de destino
+        data: Datos a serializar
+        pretty: Indentar el JSON (por defecto según SEC_JSON_DB_PRETTY; compacto si no)
+    """
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(dumps(data, pretty=pretty))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    fsync_dir(path.parent)
+
+
+class _PendingWrite:
+    __slots__ = ("mutate", "result", "error", "done")
+    
+    def __init__(self, mutate: Callable[[Any], Any]):
+        self.mutate = mutate
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = False
+
+
+class _FileQueue:
+    __slots__ = ("queue_lock", "flush_lock", "pending")
+    
+    def __init__(self):
+        self.queue_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending: List[_PendingWrite] = []
+
+
+class JSONWriteCoordinator:
+    """
+    Read-modify-write coordinado de archivos JSON.
+    
+    update(path, mutate) lee el archivo desde disco bajo el lock entre procesos, aplica la mutación
+    y lo reescribe de forma atómica, de modo que dos workers de uvicorn (o dos threads del
+    threadpool) no se pisen los cambios.
+    
+    Las mutaciones concurrentes sobre un mismo archivo se agrupan (group commit): el thread que
+    toma el turno aplica todas las mutaciones encoladas sobre una sola lectura y hace una sola
+    escritura, en lugar de reescribir el archivo una vez por cada request.
+    """
+    
+    def __init__(self):
+        self._files: Dict[Path, _FileQueue] = {}
+        self._files_lock = threading.Lock()
+        self.flushes = 0
+        self.writes = 0
+    
+    def _file_queue(self, path: Path) -> _FileQueue:
+        with self._files_lock:
+            file_queue = self._files.get(path)
+            if file_queue is None:
+                file_queue = self._files[path] = _FileQueue()
+            return file_queue
+    
+    def update(self, path: Path, mutate: Callable[[Any], Any], default: Callable[[], Any] = list) -> Any:
+        """
+        Aplica una mutación al contenido actual del archivo y lo guarda
+        
+        Args:
+            path: Archivo JSON
+            mutate: Función que recibe los datos leídos de disco, los modifica en el lugar y
+                    retorna un resultado para el llamador. Debe validar antes de modificar:
+                    si lanza una excepción, los cambios que alcanzó a hacer se guardan igual
+            default: Fábrica del contenido inicial si el archivo no existe o está vacío
+        
+        Returns:
+            Lo que retorne mutate
+        """
+        file_queue = self._file_queue(path)
+        pending = _PendingWrite(mutate)
+        with file_queue.queue_lock:
+            file_queue.pending.append(pending)
+        
+        with file_queue.flush_lock:
+            # Otro thread pudo haber escrito esta mutación en su lote mientras esperábamos
+            if not pending.done:
+                with file_queue.queue_lock:
+                    batch, file_queue.pending = file_queue.pending, []
+                self._flush(path, batch, default)
+        
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+    
+    def _flush(self, path: Path, batch: List[_PendingWrite], default: Callable[[], Any]):
+        """Aplica un lote de mutaciones con una sola lectura y una sola escritura"""
+        try:
+            with file_lock(path):
+                data = load_file(path) if path.exists() else None
+                if not data:
+                    data = default()
+                
+                for pending in batch:
+                    try:
+                        pending.result = pending.mutate(data)
+                    except Exception as e:
+                        pending.error = e
+                
+                atomic_write_json(path, data)
+            self.flushes += 1
+            self.writes += len(batch)
+        except Exception as e:
+            logger.error(f"Error escribiendo {path}: {e}")
+            for pending in batch:
+                pending.error = pending.error or e
+        finally:
+            for pending in batch:
+                pending.done = True
+
+
+# Instancia compartida por todos los gestores del proceso
+write_coordinator = JSONWriteCoordinator()
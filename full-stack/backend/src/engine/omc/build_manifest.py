@@ -0,0 +1,120 @@
+"""
+Manifiesto de compilación incremental del OMC
+Registra hash de contenido y mtime de cada archivo de cada caso para detectar cambios
+"""
+
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+from src.database.write_coordinator import atomic_write_json
+from src.utils.serialization import load_file
+from .extraction_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cuando cambie el formato del EDN o de los registros por archivo:
+# un manifiesto con otra versión se descarta y se recompila todo
+MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    """
+    Manifiesto de la base compilada.
+    
+    manifest.json guarda, por caso, la huella (sha256, size, mtime) de cada archivo.
+    Los registros de extracción por archivo y el EDN compilado de cada caso se guardan
+    aparte (un archivo por caso) para que sólo se lean cuando se necesitan.
+    """
+    
+    def __init__(self, manifest_path: Path, records_dir: Path):
+        """
+        Args:
+            manifest_path: Ruta al archivo de manifiesto
+            records_dir: Directorio con los registros por caso
+        """
+        self.manifest_path = manifest_path
+        self.records_dir = records_dir
+        self.cases: Dict[str, Dict[str, Any]] = {}
+    
+    def load(self) -> 'BuildManifest':
+        """Carga el manifiesto desde disco (vacío si no existe o es de otra versión)"""
+        self.cases = {}
+        if not self.manifest_path.exists():
+            return self
+        try:
+            data = load_file(self.manifest_path) or {}
+            if data.get("version") == MANIFEST_VERSION:
+                self.cases = data.get("cases", {})
+            else:
+                logger.info("Manifiesto de otra versión, se recompilarán todos los casos")
+        except Exception as e:
+            logger.warning(f"Error leyendo manifiesto {self.manifest_path}: {e}")
+        return self
+    
+    def save(self):
+        """Guarda el manifiesto en disco (escritura atómica: un corte no deja un manifiesto a medias)"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self.manifest_path, {"version": MANIFEST_VERSION, "cases": self.cases}, pretty=False)
+    
+    @staticmethod
+    def fingerprint_files(case_folder: Path, files: List[Path],
+                          previous: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Calcula la huella de los archivos de un caso
+        
+        El hash sólo se recalcula si cambió el tamaño o el mtime respecto del manifiesto anterior.
+        
+        Args:
+            case_folder: Carpeta del caso
+            files: Archivos del caso
+            previous: Huellas anteriores por ruta relativa
+        
+        Returns:
+            Tupla (huellas actuales por ruta relativa, rutas nuevas o con contenido distinto)
+        """
+        previous = previous or {}
+        fingerprints = {}
+        changed = []
+        for file_path in files:
+            rel_path = str(file_path.relative_to(case_folder))
+            stat = file_path.stat()
+            prev = previous.get(rel_path)
+            if prev and prev.get("size") == stat.st_size and prev.get("mtime") == stat.st_mtime_ns:
+                sha256 = prev["sha256"]
+            else:
+                sha256 = file_sha256(file_path)
+            fingerprints[rel_path] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+            if not prev or prev.get("sha256") != sha256:
+                changed.append(rel_path)
+        return fingerprints, changed
+    
+    def _records_path(self, case_id: str) -> Path:
+        return self.records_dir / f"{case_id}.json"
+    
+    def load_records(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Carga los registros de un caso
+        
+        Returns:
+            {"edn": EDN compilado, "files": {ruta relativa: {"result", "text"}}} o None
+        """
+        records_path = self._records_path(case_id)
+        if not records_path.exists():
+            return None
+        try:
+            return load_file(records_path)
+        except Exception as e:
+            logger.warning(f"Error leyendo registros de {case_id}: {e}")
+            return None
+    
+    def save_records(self, case_id: str, edn: Dict[str, Any], file_records: Dict[str, Dict[str, Any]]):
+        """Guarda el EDN compilado y los registros por archivo de un caso"""
+        self.records_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self._records_path(case_id), {"edn": edn, "files": file_records}, pretty=False)
+    
+    def prune(self, case_ids: List[str]):
+        """Elimina del manifiesto (y sus registros) los casos que ya no existen"""
+        for case_id in set(self.cases) - set(case_ids):
+            del self.cases[case_id]
+            self._records_path(case_id).unlink(missing_ok=True)
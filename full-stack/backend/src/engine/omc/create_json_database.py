@@ -3,9 +3,12 @@ Script para crear base de datos JSON relacional usando el motor OMC
 Procesa casos desde data/Files/ y genera la estructura completa de base de datos
 """
 
-import json
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 import sys
 import os
 import logging
@@ -30,8 +33,13 @@ if backend_dir_str not in sys.path:
 os.chdir(backend_dir_str)
 
 try:
-    from src.config import EXAMPLE_CASES_DIR, DATABASE_DIR, FILES_DIR
+    from src.config import (EXAMPLE_CASES_DIR, DATABASE_DIR, FILES_DIR, FILE_CATALOG_PATH, OMC_MANIFEST_PATH,
+                            OMC_RECORDS_DIR, JSON_DB_PRETTY)
     from src.engine.omc.document_processor import DocumentProcessor
+    from src.engine.omc.build_manifest import BuildManifest
+    from src.database.file_catalog import FileCatalog
+    from src.database.write_coordinator import atomic_write_json, file_lock
+    from src.utils.preview_store import remove_legacy_pdf_previews, wait_previews
 except ImportError as e:
     print(f"Error de importación: {e}")
     print(f"Por favor, asegúrate de que:")
@@ -56,8 +64,214 @@ def extract_fecha_ingreso(case_id: str) -> str:
     return None
 
 
-def create_json_database():
-    """Crea la estructura JSON de base de datos usando el motor OMC"""
+# Procesador y manifiesto propios de cada proceso del modo batch (se crean en _init_batch_worker)
+_batch_processor = None
+_batch_manifest = None
+
+
+def _init_batch_worker(manifest_path: Path, records_dir: Path):
+    """Inicializa el DocumentProcessor de un proceso del modo batch"""
+    global _batch_processor, _batch_manifest
+    # Dentro del modo batch cada caso se procesa en serie (el paralelismo es entre casos)
+    _batch_processor = DocumentProcessor(max_workers=1)
+    _batch_manifest = BuildManifest(manifest_path, records_dir)
+
+
+def _compile_case_in_worker(case_folder: Path, previous_entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compila un caso dentro de un proceso del modo batch"""
+    return compile_case(_batch_processor, case_folder, _batch_manifest, previous_entry)
+
+
+def compile_case(processor: DocumentProcessor, case_folder: Path, manifest: BuildManifest,
+                 previous_entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compila un caso con el OMC (sin tocar personas, suministros ni ids)
+    
+    Si el caso no cambió desde la compilación anterior, reutiliza su EDN; si cambió,
+    sólo re-extrae los archivos nuevos o modificados antes de reconstruir features y timeline.
+    
+    Args:
+        processor: DocumentProcessor a usar
+        case_folder: Carpeta del caso dentro de FILES_DIR
+        manifest: Manifiesto donde se guardan los registros del caso
+        previous_entry: Entrada del caso en el manifiesto anterior (None = compilar desde cero)
+    
+    Returns:
+        Diccionario con case_id, edn (None si falló), fingerprints, num_files,
+        extracted_files, reused, cache_hits, cache_misses y error
+    """
+    case_id = case_folder.name
+    files = DocumentProcessor.list_case_files(case_folder)
+    compiled = {"case_id": case_id, "edn": None, "fingerprints": None, "num_files": len(files),
+                "extracted_files": 0, "reused": False, "cache_hits": 0, "cache_misses": 0, "error": None}
+    cache = processor.extraction_cache
+    cache_before = (cache.hits, cache.misses) if cache else (0, 0)
+    
+    try:
+        previous_files = (previous_entry or {}).get('files', {})
+        fingerprints, changed = manifest.fingerprint_files(case_folder, files, previous_files)
+        compiled["fingerprints"] = fingerprints
+        records = manifest.load_records(case_id) if previous_entry else None
+        
+        # Caso sin cambios: reutilizar el EDN compilado
+        if records and not changed and set(fingerprints) == set(previous_files):
+            logger.info(f"Caso {case_id} sin cambios, reutilizando EDN")
+            # Sólo encola las vistas previas y páginas que falten (p. ej. si salieron del cache)
+            processor.schedule_previews(case_folder, files)
+            processor.schedule_pages(case_folder, records["edn"].get("document_inventory", {}))
+            compiled.update(edn=records["edn"], reused=True)
+            return compiled
+        
+        # Caso modificado: reutilizar la extracción de los archivos sin cambios
+        reuse_records = None
+        if records:
+            reuse_records = {
+                rel_path: record for rel_path, record in records.get("files", {}).items()
+                if rel_path in fingerprints and rel_path not in changed
+            }
+        compiled["extracted_files"] = len(files) - len(reuse_records or {})
+        logger.info(f"Procesando caso: {case_id} ({compiled['extracted_files']} de {len(files)} archivos a extraer)")
+        
+        # Usar el OMC para procesar el caso completo
+        edn = processor.process_case(case_id, case_folder, reuse_records=reuse_records)
+        document_inventory = edn.get('document_inventory', {})
+        
+        # Extraer información adicional del EDN
+        # Usar tipo_caso del EDN como materia si no existe materia específica
+        tipo_caso = edn.get('compilation_metadata', {}).get('tipo_caso')
+        materia = edn.get('materia') or tipo_caso or "Reclamo SEC"
+        
+        # Actualizar documentos con rutas relativas correctas desde FILES_DIR
+        for level in ['level_1_critical', 'level_2_supporting']:
+            for doc in document_inventory.get(level, []):
+                # El OMC genera file_path relativo desde la carpeta del caso
+                # Necesitamos agregar relative_path desde FILES_DIR
+                file_path_relativo = doc.get('file_path', '')
+                if file_path_relativo:
+                    # Construir ruta completa y luego relativa desde FILES_DIR
+                    file_path_completo = case_folder / file_path_relativo
+                    if file_path_completo.exists():
+                        doc['relative_path'] = str(file_path_completo.relative_to(FILES_DIR))
+                    else:
+                        # Fallback: construir desde case_id y file_path
+                        doc['relative_path'] = f"{case_id}/{file_path_relativo}"
+                else:
+                    # Si no hay file_path, intentar desde original_name
+                    file_path_completo = case_folder / doc.get('original_name', '')
+                    if file_path_completo.exists():
+                        doc['relative_path'] = str(file_path_completo.relative_to(FILES_DIR))
+                        doc['file_path'] = doc.get('original_name', '')
+        
+        # Actualizar EDN con información adicional
+        edn['materia'] = materia
+        edn['fecha_ingreso'] = edn.get('fecha_ingreso') or extract_fecha_ingreso(case_id)
+        
+        manifest.save_records(case_id, edn, processor.file_records)
+        compiled["edn"] = edn
+        if cache:
+            compiled["cache_hits"] = cache.hits - cache_before[0]
+            compiled["cache_misses"] = cache.misses - cache_before[1]
+        return compiled
+    
+    except Exception as e:
+        logger.error(f"Error procesando caso {case_id}: {e}", exc_info=True)
+        compiled["error"] = str(e)
+        return compiled
+
+
+def _register_case(case_id: str, edn: Dict[str, Any], personas: Dict[str, Dict], 
+                   suministros: Dict[str, Dict], casos: List[Dict], edns: Dict[str, Dict]):
+    """Registra un caso compilado: upsert de persona y suministro, y creación del caso"""
+    # Extraer información del EDN generado por el OMC
+    unified_context = edn.get('unified_context', {})
+    document_inventory = edn.get('document_inventory', {})
+    
+    # Obtener datos del contexto unificado
+    rut = unified_context.get('rut_client')
+    client_name = unified_context.get('client_name')
+    nis = unified_context.get('service_nis')
+    comuna = unified_context.get('commune') or 'Desconocida'
+    direccion = unified_context.get('address_standard')
+    email = unified_context.get('email')
+    phone = unified_context.get('phone')
+    
+    # Valores por defecto si no se encontraron
+    if not rut:
+        logger.warning(f"Caso {case_id}: No se encontró RUT, usando placeholder")
+        rut = f"RUT-{case_id}"
+    if not nis:
+        logger.warning(f"Caso {case_id}: No se encontró NIS, usando placeholder")
+        nis = f"NIS-{case_id}"
+    if not client_name:
+        client_name = f"Cliente {case_id}"
+    
+    # Crear/actualizar persona
+    if rut not in personas:
+        personas[rut] = {
+            "id": len(personas) + 1,
+            "rut": rut,
+            "nombre": client_name,
+            "email": email,
+            "telefono": phone
+        }
+    else:
+        # Actualizar si hay más información
+        if client_name and client_name != f"Cliente {case_id}":
+            personas[rut]["nombre"] = client_name
+        if email:
+            personas[rut]["email"] = email
+        if phone:
+            personas[rut]["telefono"] = phone
+    persona_id = personas[rut]["id"]
+    
+    # Crear/actualizar suministro
+    suministro_key = f"{nis}-{comuna}"
+    if suministro_key not in suministros:
+        suministros[suministro_key] = {
+            "id": len(suministros) + 1,
+            "nis": nis,
+            "comuna": comuna,
+            "direccion": direccion,
+            "numero_cliente": nis  # Usar NIS como número de cliente por defecto
+        }
+    else:
+        # Actualizar si hay más información
+        if direccion:
+            suministros[suministro_key]["direccion"] = direccion
+    suministro_id = suministros[suministro_key]["id"]
+    
+    # Crear caso (sin EDN anidado)
+    caso = {
+        "id": len(casos) + 1,
+        "case_id": case_id,
+        "persona_id": persona_id,
+        "suministro_id": suministro_id,
+        "empresa": edn.get('empresa'),
+        "materia": edn.get('materia'),
+        "monto_disputa": edn.get('monto_disputa'),
+        "fecha_ingreso": edn.get('fecha_ingreso'),
+        "estado": "PENDIENTE"
+    }
+    casos.append(caso)
+    
+    # Guardar EDN en estructura separada
+    edns[case_id] = edn
+    
+    logger.info(f"✓ Caso {case_id} procesado exitosamente")
+    logger.info(f"  - RUT: {rut}, NIS: {nis}, Comuna: {comuna}")
+    logger.info(f"  - Documentos: {len(document_inventory.get('level_1_critical', []))} críticos, "
+               f"{len(document_inventory.get('level_2_supporting', []))} soportantes")
+
+
+def create_json_database(workers: int = 1, incremental: bool = True, pretty: bool = JSON_DB_PRETTY):
+    """
+    Crea la estructura JSON de base de datos usando el motor OMC
+    
+    Args:
+        workers: Número de procesos para compilar casos en paralelo (1 = modo serial)
+        incremental: Si True, reutiliza los casos y archivos sin cambios según el manifiesto
+        pretty: Si True, escribe los archivos indentados (por defecto compactos, según SEC_JSON_DB_PRETTY)
+    """
     
     cases_dir = EXAMPLE_CASES_DIR
     db_dir = DATABASE_DIR
@@ -71,9 +285,9 @@ def create_json_database():
     # Crear directorio DataBase
     db_dir.mkdir(parents=True, exist_ok=True)
     
-    # Inicializar el procesador OMC
-    processor = DocumentProcessor()
-    logger.info("Motor OMC inicializado")
+    removed_previews = remove_legacy_pdf_previews(cases_dir)
+    if removed_previews:
+        logger.info(f"{removed_previews} vistas previas PDF antiguas borradas de las carpetas .previews/")
     
     # Estructuras de datos
     personas = {}  # {rut: persona_dict}
@@ -81,139 +295,69 @@ def create_json_database():
     casos = []
     edns = {}  # {case_id: edn_dict}
     
-    # Procesar cada caso usando el OMC
-    case_folders = [d for d in cases_dir.iterdir() if d.is_dir()]
+    # Orden determinístico: los ids de personas, suministros y casos no dependen del modo
+    case_folders = sorted(d for d in cases_dir.iterdir() if d.is_dir())
     logger.info(f"Encontrados {len(case_folders)} casos para procesar")
     
-    for case_folder in case_folders:
-        case_id = case_folder.name
-        logger.info(f"\n{'='*60}")
-        logger.info(f"Procesando caso: {case_id}")
-        logger.info(f"{'='*60}")
-        
-        try:
-            # Usar el OMC para procesar el caso completo
-            edn = processor.process_case(case_id, case_folder)
-            
-            # Extraer información del EDN generado por el OMC
-            unified_context = edn.get('unified_context', {})
-            compilation_metadata = edn.get('compilation_metadata', {})
-            document_inventory = edn.get('document_inventory', {})
-            
-            # Obtener datos del contexto unificado
-            rut = unified_context.get('rut_client')
-            client_name = unified_context.get('client_name')
-            nis = unified_context.get('service_nis')
-            comuna = unified_context.get('commune') or 'Desconocida'
-            direccion = unified_context.get('address_standard')
-            email = unified_context.get('email')
-            phone = unified_context.get('phone')
-            
-            # Valores por defecto si no se encontraron
-            if not rut:
-                logger.warning(f"Caso {case_id}: No se encontró RUT, usando placeholder")
-                rut = f"RUT-{case_id}"
-            if not nis:
-                logger.warning(f"Caso {case_id}: No se encontró NIS, usando placeholder")
-                nis = f"NIS-{case_id}"
-            if not client_name:
-                client_name = f"Cliente {case_id}"
-            
-            # Crear/actualizar persona
-            if rut not in personas:
-                personas[rut] = {
-                    "id": len(personas) + 1,
-                    "rut": rut,
-                    "nombre": client_name,
-                    "email": email,
-                    "telefono": phone
-                }
-            else:
-                # Actualizar si hay más información
-                if client_name and client_name != f"Cliente {case_id}":
-                    personas[rut]["nombre"] = client_name
-                if email:
-                    personas[rut]["email"] = email
-                if phone:
-                    personas[rut]["telefono"] = phone
-            persona_id = personas[rut]["id"]
-            
-            # Crear/actualizar suministro
-            suministro_key = f"{nis}-{comuna}"
-            if suministro_key not in suministros:
-                suministros[suministro_key] = {
-                    "id": len(suministros) + 1,
-                    "nis": nis,
-                    "comuna": comuna,
-                    "direccion": direccion,
-                    "numero_cliente": nis  # Usar NIS como número de cliente por defecto
-                }
-            else:
-                # Actualizar si hay más información
-                if direccion:
-                    suministros[suministro_key]["direccion"] = direccion
-            suministro_id = suministros[suministro_key]["id"]
-            
-            # Extraer información adicional del EDN
-            # Usar tipo_caso del EDN como materia si no existe materia específica
-            tipo_caso = compilation_metadata.get('tipo_caso')
-            materia = edn.get('materia') or tipo_caso or "Reclamo SEC"
-            monto_disputa = edn.get('monto_disputa')
-            empresa = edn.get('empresa')
-            fecha_ingreso = edn.get('fecha_ingreso') or extract_fecha_ingreso(case_id)
-            
-            # Actualizar documentos con rutas relativas correctas desde FILES_DIR
-            for level in ['level_1_critical', 'level_2_supporting']:
-                for doc in document_inventory.get(level, []):
-                    # El OMC genera file_path relativo desde la carpeta del caso
-                    # Necesitamos agregar relative_path desde FILES_DIR
-                    file_path_relativo = doc.get('file_path', '')
-                    if file_path_relativo:
-                        # Construir ruta completa y luego relativa desde FILES_DIR
-                        file_path_completo = case_folder / file_path_relativo
-                        if file_path_completo.exists():
-                            doc['relative_path'] = str(file_path_completo.relative_to(FILES_DIR))
-                        else:
-                            # Fallback: construir desde case_id y file_path
-                            doc['relative_path'] = f"{case_id}/{file_path_relativo}"
-                    else:
-                        # Si no hay file_path, intentar desde original_name
-                        file_path_completo = case_folder / doc.get('original_name', '')
-                        if file_path_completo.exists():
-                            doc['relative_path'] = str(file_path_completo.relative_to(FILES_DIR))
-                            doc['file_path'] = doc.get('original_name', '')
-            
-            # Actualizar EDN con información adicional
-            edn['materia'] = materia
-            edn['monto_disputa'] = monto_disputa
-            edn['empresa'] = empresa
-            edn['fecha_ingreso'] = fecha_ingreso
-            
-            # Crear caso (sin EDN anidado)
-            caso = {
-                "id": len(casos) + 1,
-                "case_id": case_id,
-                "persona_id": persona_id,
-                "suministro_id": suministro_id,
-                "empresa": empresa,
-                "materia": materia,
-                "monto_disputa": monto_disputa,
-                "fecha_ingreso": fecha_ingreso,
-                "estado": "PENDIENTE"
-            }
-            casos.append(caso)
-            
-            # Guardar EDN en estructura separada
-            edns[case_id] = edn
-            
-            logger.info(f"✓ Caso {case_id} procesado exitosamente")
-            logger.info(f"  - RUT: {rut}, NIS: {nis}, Comuna: {comuna}")
-            logger.info(f"  - Documentos: {len(document_inventory.get('level_1_critical', []))} críticos, "
-                       f"{len(document_inventory.get('level_2_supporting', []))} soportantes")
-            
-        except Exception as e:
-            logger.error(f"Error procesando caso {case_id}: {e}", exc_info=True)
-            continue
+    # Manifiesto de la compilación anterior (vacío en modo completo)
+    manifest = BuildManifest(OMC_MANIFEST_PATH, OMC_RECORDS_DIR)
+    if incremental:
+        manifest.load()
+    previous_entries = [manifest.cases.get(case_folder.name) for case_folder in case_folders]
+    
+    start_time = time.perf_counter()
+    total_files = 0
+    extracted_files = 0
+    reused_cases = 0
+    cache_hits = 0
+    cache_misses = 0
+    failures = []
+    
+    if workers > 1:
+        # Modo batch: los casos se compilan en paralelo y se reducen en orden
+        logger.info(f"Motor OMC inicializado en modo batch ({workers} procesos)")
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                       initargs=(OMC_MANIFEST_PATH, OMC_RECORDS_DIR))
+        compiled_cases = executor.map(_compile_case_in_worker, case_folders, previous_entries)
+    else:
+        # Inicializar el procesador OMC
+        executor = None
+        processor = DocumentProcessor()
+        logger.info("Motor OMC inicializado")
+        compiled_cases = (
+            compile_case(processor, case_folder, manifest, previous_entry)
+            for case_folder, previous_entry in zip(case_folders, previous_entries)
+        )
+    
+    try:
+        # Reducer: único lugar donde se asignan ids y se fusionan personas/suministros
+        for compiled in compiled_cases:
+            total_files += compiled["num_files"]
+            extracted_files += compiled["extracted_files"]
+            cache_hits += compiled["cache_hits"]
+            cache_misses += compiled["cache_misses"]
+            if compiled["edn"] is None:
+                failures.append(compiled["case_id"])
+                # Forzar recompilación completa del caso en la próxima corrida
+                manifest.cases.pop(compiled["case_id"], None)
+                continue
+            if compiled["reused"]:
+                reused_cases += 1
+            manifest.cases[compiled["case_id"]] = {"files": compiled["fingerprints"]}
+            _register_case(compiled["case_id"], compiled["edn"], personas, suministros, casos, edns)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    manifest.prune([case_folder.name for case_folder in case_folders])
+    manifest.save()
+    
+    # Catálogo de archivos por caso: el backend resuelve con él las rutas de documentos sin recorrer las carpetas
+    file_catalog = FileCatalog(cases_dir, FILE_CATALOG_PATH)
+    file_catalog.build(case_folder.name for case_folder in case_folders)
+    file_catalog.save()
+    
+    elapsed = time.perf_counter() - start_time
     
     # Crear índice de documentos desde los EDNs
     documentos = []
@@ -246,20 +390,14 @@ def create_json_database():
     # Guardar archivos JSON
     logger.info(f"\nGuardando archivos JSON en {db_dir}...")
     
-    with open(db_dir / "personas.json", "w", encoding="utf-8") as f:
-        json.dump(list(personas.values()), f, indent=2, ensure_ascii=False)
-    
-    with open(db_dir / "suministros.json", "w", encoding="utf-8") as f:
-        json.dump(list(suministros.values()), f, indent=2, ensure_ascii=False)
-    
-    with open(db_dir / "casos.json", "w", encoding="utf-8") as f:
-        json.dump(casos, f, indent=2, ensure_ascii=False)
-    
-    with open(db_dir / "edn.json", "w", encoding="utf-8") as f:
-        json.dump(edns, f, indent=2, ensure_ascii=False)
-    
-    with open(db_dir / "documentos.json", "w", encoding="utf-8") as f:
-        json.dump(documentos, f, indent=2, ensure_ascii=False)
+    # Escrituras atómicas y bajo lock: el servidor puede estar leyendo o escribiendo estos archivos
+    for file_name, data in [("personas.json", list(personas.values())),
+                            ("suministros.json", list(suministros.values())),
+                            ("casos.json", casos),
+                            ("edn.json", edns),
+                            ("documentos.json", documentos)]:
+        with file_lock(db_dir / file_name):
+            atomic_write_json(db_dir / file_name, data, pretty=pretty)
     
     logger.info(f"\n{'='*60}")
     logger.info("✓ Base de datos JSON creada exitosamente")
@@ -270,11 +408,36 @@ def create_json_database():
     logger.info(f"  - {len(edns)} EDNs")
     logger.info(f"  - {len(documentos)} documentos")
     logger.info(f"\nUbicación: {db_dir}")
+    
+    # Vistas previas de DOCX encoladas por process_case (en modo batch, cada proceso espera las suyas al terminar)
+    previews = wait_previews()
+    if previews:
+        logger.info(f"  - {previews} vistas previas de DOCX y páginas de documentos críticos pre-renderizadas")
+
+    # Resumen de rendimiento
+    logger.info(f"\n{'='*60}")
+    logger.info("Resumen de rendimiento")
+    logger.info(f"{'='*60}")
+    logger.info(f"  - Tiempo total: {elapsed:.1f} s ({workers} proceso(s))")
+    logger.info(f"  - Casos/s: {len(case_folders) / elapsed if elapsed else 0:.2f}")
+    logger.info(f"  - Archivos/s: {total_files / elapsed if elapsed else 0:.2f}")
+    logger.info(f"  - Casos reutilizados sin cambios: {reused_cases}")
+    logger.info(f"  - Archivos re-extraídos: {extracted_files} de {total_files}")
+    logger.info(f"  - Cache de extracción: {cache_hits} aciertos, {cache_misses} fallos")
+    logger.info(f"  - Fallos: {len(failures)}" + (f" ({', '.join(failures)})" if failures else ""))
 
 
 if __name__ == "__main__":
     print("Iniciando creación de base de datos JSON...")
     print(f"Directorio de trabajo: {os.getcwd()}")
     print(f"Backend dir: {backend_dir_str}")
-    create_json_database()
+    parser = argparse.ArgumentParser(description="Crea la base de datos JSON usando el motor OMC")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para compilar casos en paralelo (default: 1, modo serial)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignora el manifiesto y recompila todos los casos desde cero")
+    parser.add_argument("--pretty", action="store_true", default=JSON_DB_PRETTY,
+                        help="Escribe los archivos JSON indentados en vez de compactos (para revisarlos o versionarlos)")
+    args = parser.parse_args()
+    create_json_database(workers=args.workers, incremental=not args.full, pretty=args.pretty)
     print("Proceso completado.")
@@ -4,13 +4,15 @@ Procesador principal de documentos - Orquesta el pipeline completo
 
 import uuid
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import logging
 
-from .pdf_extractor import PDFExtractor
+from .pdf_extractor import PDFExtractor, ParsedPDF
 from .docx_extractor import DOCXExtractor
+from .extraction_cache import ExtractionCache
 from .document_classifier import DocumentClassifier
 from .entity_extractor import EntityExtractor
 from .document_categorizer import add_functional_categories
@@ -19,33 +21,133 @@ from .strategy_selector import extraer_desde_fuentes
 from .scrapers.pip_manager import PIPManager
 from .timeline_builder import build_timeline
 from src.models import DocumentProvenance
+from src.config import OMC_MAX_WORKERS, OMC_PRERENDER_PAGES, OMC_PRERENDER_PREVIEWS
+from src.utils.preview_store import schedule_pages, schedule_previews
 
 logger = logging.getLogger(__name__)
 
+# Procesador propio de cada proceso del pool (se crea en _init_worker)
+_worker_processor: Optional['DocumentProcessor'] = None
+
+
+def _init_worker():
+    """Inicializa el DocumentProcessor de un proceso del pool"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(max_workers=1)
+
+
+def _process_file_in_worker(file_path: Path, base_path: Path) -> Tuple[Optional[Dict[str, Any]], Optional[ParsedPDF], Optional[str]]:
+    """
+    Procesa un archivo dentro de un proceso del pool
+    
+    Returns:
+        Tupla (resultado de process_file, PDF parseado, texto DOCX) para que el
+        proceso padre reutilice el parseo al consolidar el texto del caso
+    """
+    processor = _worker_processor
+    processor._parsed_pdfs = {}
+    processor._docx_texts = {}
+    try:
+        result = processor.process_file(file_path, base_path)
+    except Exception as e:
+        logger.error(f"Error procesando archivo {file_path}: {e}")
+        return None, None, None
+    key = file_path.resolve()
+    return result, processor._parsed_pdfs.get(key), processor._docx_texts.get(key)
+
 
 class DocumentProcessor:
     """Procesa lotes de archivos y genera Expediente Digital Normalizado (EDN)"""
     
-    def __init__(self):
-        self.pdf_extractor = PDFExtractor()
-        self.docx_extractor = DOCXExtractor()
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: Procesos para extraer archivos en paralelo (None = OMC_MAX_WORKERS, 1 = serial)
+        """
+        self.max_workers = max_workers if max_workers is not None else OMC_MAX_WORKERS
+        # Cache persistente compartido por todas las corridas (y procesos) del OMC
+        self.extraction_cache = ExtractionCache.from_config()
+        self.pdf_extractor = PDFExtractor(cache=self.extraction_cache)
+        self.docx_extractor = DOCXExtractor(cache=self.extraction_cache)
         self.classifier = DocumentClassifier()
         self.entity_extractor = EntityExtractor()
         self.pip_manager = PIPManager()
+        # Cache por corrida de process_case: cada archivo se parsea una sola vez
+        self._parsed_pdfs: Dict[Path, Optional[ParsedPDF]] = {}
+        self._docx_texts: Dict[Path, Optional[str]] = {}
+        self._reused_texts: Dict[Path, Optional[str]] = {}
+        # Registros por archivo (resultado + texto) de la última corrida, para rebuild incremental
+        self.file_records: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def list_case_files(case_folder: Path) -> List[Path]:
+        """Archivos de un caso que procesa el OMC, en orden determinístico (sin ocultos ni carpetas ocultas como .previews)"""
+        files = sorted(case_folder.rglob('*'))
+        return [
+            f for f in files
+            if f.is_file() and not any(part.startswith('.') for part in f.relative_to(case_folder).parts)
+        ]
+    
+    @staticmethod
+    def schedule_previews(case_folder: Path, files: List[Path]) -> int:
+        """
+        Encola en segundo plano la vista previa de los DOCX del caso que no la tienen (ver preview_store)
+        
+        Returns:
+            Número de vistas previas encoladas (0 si OMC_PRERENDER_PREVIEWS está deshabilitado)
+        """
+        if not OMC_PRERENDER_PREVIEWS:
+            return 0
+        try:
+            return schedule_previews(case_folder, files)
+        except Exception as e:
+            logger.warning(f"No se pudieron encolar las vistas previas de {case_folder.name}: {e}")
+            return 0
+    
+    @staticmethod
+    def schedule_pages(case_folder: Path, document_inventory: Dict[str, Any]) -> int:
+        """
+        Encola en segundo plano el renderizado de las primeras OMC_PRERENDER_PAGES páginas de los
+        documentos críticos (level_1_critical), para que la evidencia del checklist abra sin bajar el PDF
+        
+        Returns:
+            Número de documentos encolados
+        """
+        if OMC_PRERENDER_PAGES <= 0:
+            return 0
+        try:
+            files = [
+                case_folder / doc['file_path']
+                for doc in document_inventory.get('level_1_critical', []) if doc.get('file_path')
+            ]
+            return schedule_pages(case_folder, files, OMC_PRERENDER_PAGES)
+        except Exception as e:
+            logger.warning(f"No se pudieron encolar las páginas de {case_folder.name}: {e}")
+            return 0
     
-    def process_case(self, case_id: str, case_folder: Path) -> Dict[str, Any]:
+    def process_case(self, case_id: str, case_folder: Path, max_workers: Optional[int] = None,
+                     reuse_records: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Procesa un caso completo desde una carpeta
         
         Args:
             case_id: ID del caso (ej: "231220-000557")
             case_folder: Carpeta que contiene los archivos del caso
+            max_workers: Procesos para la extracción por archivo (None = self.max_workers)
+            reuse_records: Registros de una corrida anterior por ruta relativa ({"result", "text"});
+                esos archivos no se vuelven a extraer
             
         Returns:
             Expediente Digital Normalizado (EDN) como diccionario
         """
         logger.info(f"Procesando caso {case_id}")
         
+        # Reiniciar cache de parseo (vive sólo durante esta corrida)
+        self._parsed_pdfs = {}
+        self._docx_texts = {}
+        self._reused_texts = {}
+        self.file_records = {}
+        
         # Inicializar estructuras
         unified_context = {
             'rut_client': None,
@@ -64,20 +166,22 @@ class DocumentProcessor:
         }
         
         all_entities = {
-            'ruts': set(),
-            'nis': set(),
+            # dicts como conjuntos ordenados: el valor elegido no depende del hash del proceso
+            'ruts': {},
+            'nis': {},
             'addresses': [],
-            'communes': set(),
+            'communes': {},
             'amounts': []
         }
         
-        # Procesar todos los archivos
-        files = list(case_folder.rglob('*'))
-        files = [f for f in files if f.is_file() and not f.name.startswith('.')]
+        # Procesar todos los archivos (orden determinístico, igual en modo serial y paralelo)
+        files = self.list_case_files(case_folder)
+        # Las vistas previas de los DOCX se convierten en segundo plano mientras se extrae el caso
+        self.schedule_previews(case_folder, files)
         
-        for file_path in files:
+        workers = max_workers if max_workers is not None else self.max_workers
+        for file_path, result in self._collect_file_results(files, case_folder, workers, reuse_records or {}):
             try:
-                result = self.process_file(file_path, case_folder)
                 if result:
                     # Agregar a inventario
                     level = result['level']
@@ -86,6 +190,7 @@ class DocumentProcessor:
                         'file_id': result['file_id'],
                         'original_name': result['original_name'],
                         'standardized_name': result.get('standardized_name'),
+                        'file_path': result.get('file_path'),
                         'extracted_data': result.get('extracted_data'),
                         'metadata': result.get('metadata')
                     }
@@ -98,13 +203,13 @@ class DocumentProcessor:
                     # Acumular entidades
                     entities = result.get('entities', {})
                     if entities.get('rut'):
-                        all_entities['ruts'].add(entities['rut'])
+                        all_entities['ruts'].setdefault(entities['rut'])
                     if entities.get('nis'):
-                        all_entities['nis'].add(entities['nis'])
+                        all_entities['nis'].setdefault(entities['nis'])
                     if entities.get('address'):
                         all_entities['addresses'].append(entities['address'])
                     if entities.get('commune'):
-                        all_entities['communes'].add(entities['commune'])
+                        all_entities['communes'].setdefault(entities['commune'])
                     # Manejar amounts que pueden ser lista simple o lista con source
                     amounts = entities.get('amounts', [])
                     if amounts:
@@ -147,6 +252,9 @@ class DocumentProcessor:
                     'description': f'No se detectó documento de tipo {req_type}'
                 })
         
+        # Páginas de los documentos críticos (después de sus vistas previas, en el mismo thread)
+        self.schedule_pages(case_folder, document_inventory)
+        
         # Determinar tipo de caso
         tipo_caso = self.classifier.classify_tipo_caso(document_inventory, unified_context)
         
@@ -257,6 +365,7 @@ class DocumentProcessor:
                                 'file_id': result['file_id'],
                                 'original_name': result['original_name'],
                                 'standardized_name': result.get('standardized_name'),
+                                'file_path': result.get('file_path'),
                                 'extracted_data': result.get('extracted_data'),
                                 'metadata': result.get('metadata'),
                                 'provenance': DocumentProvenance.SYSTEM_RETRIEVAL.value
@@ -301,6 +410,74 @@ class DocumentProcessor:
         
         return edn
     
+    def _collect_file_results(self, files: List[Path], case_folder: Path, workers: int,
+                              reuse_records: Dict[str, Dict[str, Any]]) -> List[Tuple[Path, Optional[Dict[str, Any]]]]:
+        """
+        Obtiene el resultado de cada archivo, reutilizando registros previos cuando existen
+        
+        Deja en self.file_records el registro (resultado + texto) de cada archivo.
+        
+        Returns:
+            Lista de (archivo, resultado) en el mismo orden que files
+        """
+        pending = [f for f in files if str(f.relative_to(case_folder)) not in reuse_records]
+        extracted = dict(self._extract_files(pending, case_folder, workers))
+        
+        results = []
+        for file_path in files:
+            rel_path = str(file_path.relative_to(case_folder))
+            if rel_path in reuse_records:
+                record = reuse_records[rel_path]
+                self._reused_texts[file_path.resolve()] = record.get('text')
+            else:
+                result = extracted.get(file_path)
+                record = {
+                    'result': result,
+                    'text': self._get_file_text(file_path) if result else None
+                }
+            self.file_records[rel_path] = record
+            results.append((file_path, record.get('result')))
+        return results
+    
+    def _extract_files(self, files: List[Path], case_folder: Path, workers: int) -> List[Tuple[Path, Optional[Dict[str, Any]]]]:
+        """
+        Ejecuta process_file sobre cada archivo, en serie o en un pool de procesos
+        
+        Args:
+            files: Archivos del caso, ya ordenados
+            case_folder: Carpeta del caso
+            workers: Número de procesos (<= 1 para modo serial)
+        
+        Returns:
+            Lista de (archivo, resultado) en el mismo orden que files
+        """
+        if workers > 1 and len(files) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers, len(files)), initializer=_init_worker) as executor:
+                    outputs = list(executor.map(_process_file_in_worker, files, [case_folder] * len(files)))
+                
+                results = []
+                for file_path, (result, parsed, docx_text) in zip(files, outputs):
+                    # Reutilizar el parseo del worker al consolidar texto
+                    key = file_path.resolve()
+                    if parsed is not None:
+                        self._parsed_pdfs[key] = parsed
+                    if docx_text is not None:
+                        self._docx_texts[key] = docx_text
+                    results.append((file_path, result))
+                return results
+            except Exception as e:
+                logger.warning(f"Error en extracción paralela, continuando en modo serial: {e}")
+        
+        results = []
+        for file_path in files:
+            try:
+                results.append((file_path, self.process_file(file_path, case_folder)))
+            except Exception as e:
+                logger.error(f"Error procesando archivo {file_path}: {e}")
+                results.append((file_path, None))
+        return results
+    
     def process_file(self, file_path: Path, base_path: Path) -> Optional[Dict[str, Any]]:
         """
         Procesa un archivo individual
@@ -320,16 +497,24 @@ class DocumentProcessor:
         positions_data = None
         
         if file_ext == '.pdf':
-            # Extraer con posiciones para documentos críticos
-            content = self.pdf_extractor.extract_text(file_path, include_positions=False)
-            # Para documentos críticos, también extraer posiciones
-            # Primero clasificar para saber si es crítico
-            doc_type_preview = self.classifier.classify(file_path, content)
-            if doc_type_preview in ['CARTA_RESPUESTA', 'TABLA_CALCULO', 'ORDEN_TRABAJO']:
-                positions_data = self.pdf_extractor.extract_text(file_path, include_positions=True)
-            metadata = self.pdf_extractor.extract_metadata(file_path)
+            # Un único parseo entrega texto, posiciones y metadatos
+            parsed = self._get_parsed_pdf(file_path)
+            if parsed:
+                content = parsed.text
+                metadata = parsed.metadata
+                # Las posiciones sólo se usan para documentos críticos
+                # Primero clasificar para saber si es crítico
+                doc_type_preview = self.classifier.classify(file_path, content)
+                if doc_type_preview in ['CARTA_RESPUESTA', 'TABLA_CALCULO', 'ORDEN_TRABAJO']:
+                    positions_data = parsed.positions
+            else:
+                metadata = {
+                    'file_name': file_path.name,
+                    'file_size': file_path.stat().st_size,
+                    'num_pages': 0
+                }
         elif file_ext == '.docx':
-            content = self.docx_extractor.extract_text(file_path)
+            content = self._get_docx_text(file_path)
             metadata = self.docx_extractor.extract_metadata(file_path)
         elif file_ext in ['.jpg', '.jpeg', '.png']:
             # Por ahora, solo metadatos para imágenes
@@ -387,6 +572,33 @@ class DocumentProcessor:
         
         return result
     
+    def _get_parsed_pdf(self, file_path: Path) -> Optional[ParsedPDF]:
+        """Retorna el PDF parseado, abriéndolo sólo la primera vez en esta corrida"""
+        key = file_path.resolve()
+        if key not in self._parsed_pdfs:
+            self._parsed_pdfs[key] = self.pdf_extractor.parse(file_path)
+        return self._parsed_pdfs[key]
+    
+    def _get_file_text(self, file_path: Path) -> Optional[str]:
+        """Texto de un PDF o DOCX: reutilizado de una corrida anterior o extraído una sola vez"""
+        key = file_path.resolve()
+        if key in self._reused_texts:
+            return self._reused_texts[key]
+        suffix = file_path.suffix.lower()
+        if suffix == '.pdf':
+            parsed = self._get_parsed_pdf(file_path)
+            return parsed.text if parsed else None
+        if suffix == '.docx':
+            return self._get_docx_text(file_path)
+        return None
+    
+    def _get_docx_text(self, file_path: Path) -> Optional[str]:
+        """Retorna el texto del DOCX, extrayéndolo sólo la primera vez en esta corrida"""
+        key = file_path.resolve()
+        if key not in self._docx_texts:
+            self._docx_texts[key] = self.docx_extractor.extract_text(file_path)
+        return self._docx_texts[key]
+    
     def _generate_standardized_name(self, file_path: Path, doc_type: str) -> str:
         """Genera un nombre estandarizado para el documento"""
         type_names = {
@@ -449,16 +661,12 @@ class DocumentProcessor:
         # Procesar documentos críticos
         for doc in document_inventory.get('level_1_critical', []):
             file_id = doc.get('file_id')
-            file_path = case_folder / doc.get('file_path', '')
+            file_path = case_folder / (doc.get('file_path') or '')
             
-            if file_path.exists():
+            if file_path.is_file():
                 try:
-                    if file_path.suffix.lower() == '.pdf':
-                        content = self.pdf_extractor.extract_text(file_path, include_positions=False)
-                        if content:
-                            textos.append(content)
-                    elif file_path.suffix.lower() == '.docx':
-                        content = self.docx_extractor.extract_text(file_path)
+                    if file_path.suffix.lower() in ['.pdf', '.docx']:
+                        content = self._get_file_text(file_path)
                         if content:
                             textos.append(content)
                 except Exception as e:
@@ -468,11 +676,11 @@ class DocumentProcessor:
         tipos_soportantes_texto = ['INFORME_CNR', 'GRAFICO_CONSUMO']
         for doc in document_inventory.get('level_2_supporting', []):
             if doc.get('type') in tipos_soportantes_texto:
-                file_path = case_folder / doc.get('file_path', '')
-                if file_path.exists():
+                file_path = case_folder / (doc.get('file_path') or '')
+                if file_path.is_file():
                     try:
                         if file_path.suffix.lower() == '.pdf':
-                            content = self.pdf_extractor.extract_text(file_path, include_positions=False)
+                            content = self._get_file_text(file_path)
                             if content:
                                 textos.append(content)
                     except Exception as e:
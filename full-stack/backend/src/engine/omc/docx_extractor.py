@@ -7,16 +7,30 @@ from pathlib import Path
 from typing import Optional, Dict, Any
 import logging
 
+from .extraction_cache import ExtractionCache, file_sha256
+
 logger = logging.getLogger(__name__)
 
 
 class DOCXExtractor:
     """Extrae texto de archivos DOCX usando python-docx"""
     
+    # Incrementar cuando cambie lo que extract_text() extrae: invalida las entradas del cache
+    EXTRACTOR_VERSION = 1
+    
+    def __init__(self, cache: Optional[ExtractionCache] = None):
+        """
+        Args:
+            cache: Cache persistente de extracción (None = extraer siempre)
+        """
+        self.cache = cache
+    
     def extract_text(self, file_path: Path) -> Optional[str]:
         """
         Extrae texto de un archivo DOCX
         
+        Si hay cache y el contenido del archivo ya fue extraído, no se abre el DOCX.
+        
         Args:
             file_path: Ruta al archivo DOCX
             
@@ -24,6 +38,13 @@ class DOCXExtractor:
             Texto extraído o None si hay error
         """
         try:
+            sha256 = None
+            if self.cache:
+                sha256 = file_sha256(file_path)
+                cached = self.cache.get('docx', self.EXTRACTOR_VERSION, sha256)
+                if cached is not None:
+                    return cached['text']
+            
             doc = Document(file_path)
             text_parts = []
             
@@ -42,7 +63,10 @@ class DOCXExtractor:
                     if row_text:
                         text_parts.append(" | ".join(row_text))
             
-            return "\n\n".join(text_parts) if text_parts else None
+            text = "\n\n".join(text_parts) if text_parts else None
+            if sha256:
+                self.cache.put('docx', self.EXTRACTOR_VERSION, sha256, {'text': text})
+            return text
             
         except Exception as e:
             logger.error(f"Error extrayendo texto de DOCX {file_path}: {e}")
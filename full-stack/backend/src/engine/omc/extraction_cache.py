@@ -0,0 +1,118 @@
+"""
+Cache persistente de extracción de texto, direccionado por contenido
+Evita volver a parsear PDFs y DOCX con bytes idénticos (reprocesos, adjuntos duplicados)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+import logging
+
+from src.config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES
+from src.utils.disk_lru import DiskLRU
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula el SHA-256 del contenido de un archivo"""
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Cache en disco de resultados de extracción.
+    
+    Cada entrada se identifica por (extractor, versión del extractor, SHA-256 del archivo)
+    y se guarda como JSON comprimido con gzip en {root}/{extractor}/v{versión}/{sha[:2]}/{sha}.json.gz.
+    Cambiar la versión de un extractor invalida sus entradas sin tocar las demás.
+    
+    El tamaño total se limita con desalojo LRU sobre un índice en memoria de las entradas
+    (DiskLRU), que se arma recorriendo el directorio una sola vez. Las escrituras son atómicas (archivo temporal + rename), por lo que varios procesos
+    pueden compartir el mismo directorio.
+    """
+    
+    def __init__(self, root: Path, max_bytes: int):
+        """
+        Args:
+            root: Directorio del cache
+            max_bytes: Tamaño máximo en bytes (0 = sin límite)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lru = DiskLRU(root, "*.json.gz", max_bytes)
+    
+    @classmethod
+    def from_config(cls) -> Optional['ExtractionCache']:
+        """Cache configurado en src.config (None si está deshabilitado)"""
+        if EXTRACTION_CACHE_MAX_BYTES <= 0:
+            return None
+        return cls(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES)
+    
+    def _entry_path(self, extractor: str, version: int, sha256: str) -> Path:
+        return self.root / extractor / f"v{version}" / sha256[:2] / f"{sha256}.json.gz"
+    
+    def get(self, extractor: str, version: int, sha256: str) -> Optional[Any]:
+        """
+        Busca una entrada del cache
+        
+        Args:
+            extractor: Nombre del extractor ('pdf', 'docx')
+            version: Versión del extractor
+            sha256: Hash del contenido del archivo
+        
+        Returns:
+            Payload guardado o None si no existe
+        """
+        entry_path = self._entry_path(extractor, version, sha256)
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de cache corrupta {entry_path}: {e}")
+            self._lru.discard(entry_path)
+            self.misses += 1
+            return None
+        
+        self._lru.touch(entry_path)
+        self.hits += 1
+        return payload
+    
+    def put(self, extractor: str, version: int, sha256: str, payload: Any):
+        """Guarda una entrada en el cache (el payload debe ser serializable a JSON)"""
+        entry_path = self._entry_path(extractor, version, sha256)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry_path.with_name(f".{entry_path.name}.{uuid.uuid4().hex}.tmp")
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"No se pudo escribir entrada de cache {entry_path}: {e}")
+            return
+        self._lru.add(entry_path, entry_path.stat().st_size)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de este proceso y tamaño actual del cache (según su índice, sin recorrer el directorio)"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self._lru.evictions,
+            "size_bytes": self._lru.total_bytes,
+            "max_bytes": self.max_bytes
+        }
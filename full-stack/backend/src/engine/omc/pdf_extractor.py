@@ -3,72 +3,153 @@ Extractor de texto de archivos PDF con soporte para información de posición
 """
 
 import pdfplumber
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Union
 import logging
 
+from .extraction_cache import ExtractionCache, file_sha256
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ParsedPDF:
+    """
+    Resultado de un único parseo de un PDF.
+    
+    Contiene todo lo que el pipeline necesita de un PDF (texto, bounding boxes
+    de palabras, número de páginas y metadatos) para no volver a abrir el archivo.
+    """
+    file_name: str
+    file_size: int
+    pages: List[Dict[str, Any]] = field(default_factory=list)
+    
+    @property
+    def num_pages(self) -> int:
+        return len(self.pages)
+    
+    @property
+    def text(self) -> Optional[str]:
+        """Texto completo (equivalente a extract_text en modo simple)"""
+        text_parts = [page['text'] for page in self.pages if page.get('text')]
+        return "\n\n".join(text_parts) if text_parts else None
+    
+    @property
+    def positions(self) -> Optional[List[Dict]]:
+        """Texto con posiciones por página (equivalente a include_positions=True)"""
+        return self.pages if self.pages else None
+    
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "num_pages": self.num_pages
+        }
+
+
+def _pack_pages(pages: List[Dict[str, Any]]) -> List[list]:
+    """Formato compacto para el cache: [texto, [[palabra, x0, top, x1, bottom], ...]] por página"""
+    return [
+        [page['text'], [[word['text'], *word['bbox']] for word in page['words']]]
+        for page in pages
+    ]
+
+
+def _unpack_pages(packed: List[list]) -> List[Dict[str, Any]]:
+    """Reconstruye las páginas desde el formato compacto del cache"""
+    return [
+        {
+            'page_index': page_num,
+            'text': page_text,
+            'words': [{'text': word[0], 'bbox': word[1:]} for word in words]
+        }
+        for page_num, (page_text, words) in enumerate(packed)
+    ]
+
+
 class PDFExtractor:
     """Extrae texto de archivos PDF usando pdfplumber"""
     
+    # Incrementar cuando cambie lo que parse() extrae: invalida las entradas del cache
+    EXTRACTOR_VERSION = 1
+    
+    def __init__(self, cache: Optional[ExtractionCache] = None):
+        """
+        Args:
+            cache: Cache persistente de extracción (None = parsear siempre)
+        """
+        self.cache = cache
+    
+    def parse(self, file_path: Path) -> Optional[ParsedPDF]:
+        """
+        Abre el PDF una sola vez y extrae texto, palabras con bbox y metadatos
+        
+        Si hay cache y el contenido del archivo ya fue parseado, no se abre el PDF.
+        
+        Args:
+            file_path: Ruta al archivo PDF
+        
+        Returns:
+            ParsedPDF o None si hay error
+        """
+        try:
+            parsed = ParsedPDF(file_name=file_path.name, file_size=file_path.stat().st_size)
+            sha256 = None
+            if self.cache:
+                sha256 = file_sha256(file_path)
+                packed = self.cache.get('pdf', self.EXTRACTOR_VERSION, sha256)
+                if packed is not None:
+                    parsed.pages = _unpack_pages(packed)
+                    return parsed
+            
+            with pdfplumber.open(file_path) as pdf:
+                for page_num, page in enumerate(pdf.pages):
+                    # Construir texto completo
+                    page_text = page.extract_text() or ""
+                    
+                    # Extraer bounding boxes de palabras
+                    word_bboxes = []
+                    for word in page.extract_words():
+                        word_bboxes.append({
+                            'text': word.get('text', ''),
+                            'bbox': [word.get('x0', 0), word.get('top', 0),
+                                    word.get('x1', 0), word.get('bottom', 0)]
+                        })
+                    
+                    parsed.pages.append({
+                        'page_index': page_num,
+                        'text': page_text,
+                        'words': word_bboxes
+                    })
+            if sha256:
+                self.cache.put('pdf', self.EXTRACTOR_VERSION, sha256, _pack_pages(parsed.pages))
+            return parsed
+        
+        except Exception as e:
+            logger.error(f"Error extrayendo texto de PDF {file_path}: {e}")
+            return None
+    
     def extract_text(self, file_path: Path, include_positions: bool = False) -> Union[Optional[str], Optional[List[Dict]]]:
         """
         Extrae texto de un archivo PDF
         
+        Nota: cada llamada vuelve a parsear el archivo. Para obtener texto, posiciones
+        y metadatos del mismo PDF, usar parse() una sola vez.
+        
         Args:
             file_path: Ruta al archivo PDF
             include_positions: Si True, retorna texto con información de posición (bbox)
-            
+        
         Returns:
             Si include_positions=False: Texto extraído o None
             Si include_positions=True: Lista de dicts con texto y bbox por página
         """
-        try:
-            if not include_positions:
-                # Modo simple: solo texto
-                text_parts = []
-                with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text_parts.append(page_text)
-                
-                return "\n\n".join(text_parts) if text_parts else None
-            else:
-                # Modo avanzado: texto con posiciones
-                pages_data = []
-                with pdfplumber.open(file_path) as pdf:
-                    for page_num, page in enumerate(pdf.pages):
-                        # Extraer texto con palabras y sus posiciones
-                        words = page.extract_words()
-                        chars = page.chars
-                        
-                        # Construir texto completo
-                        page_text = page.extract_text() or ""
-                        
-                        # Extraer bounding boxes de palabras clave
-                        word_bboxes = []
-                        for word in words:
-                            word_bboxes.append({
-                                'text': word.get('text', ''),
-                                'bbox': [word.get('x0', 0), word.get('top', 0), 
-                                        word.get('x1', 0), word.get('bottom', 0)]
-                            })
-                        
-                        pages_data.append({
-                            'page_index': page_num,
-                            'text': page_text,
-                            'words': word_bboxes,
-                            'chars': chars  # Para bbox más precisos si se necesita
-                        })
-                
-                return pages_data if pages_data else None
-            
-        except Exception as e:
-            logger.error(f"Error extrayendo texto de PDF {file_path}: {e}")
+        parsed = self.parse(file_path)
+        if not parsed:
             return None
+        return parsed.positions if include_positions else parsed.text
     
     def extract_metadata(self, file_path: Path) -> Dict[str, Any]:
         """
@@ -76,7 +157,7 @@ class PDFExtractor:
         
         Args:
             file_path: Ruta al archivo PDF
-            
+        
         Returns:
             Diccionario con metadatos
         """
@@ -93,4 +174,3 @@ class PDFExtractor:
             logger.warning(f"Error obteniendo metadatos de PDF {file_path}: {e}")
         
         return metadata
-
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Request, Body, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Body, Response
 from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional, Dict, Any
-import json
+import hashlib
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 
@@ -21,7 +23,11 @@ from src.models import (
     CNRCalculationRequest,
     CNRCalculationResponse
 )
-from src.database.json_db_manager import JSONDBManager
+from src.database import get_db_manager
+from src.database.case_list_index import SORT_KEYS, InvalidCursorError
+from src.database.document_index import find_inventory_documento
+from src.database.file_catalog import FileCatalog
+from src.database.shared_state import SharedCaseStore, get_shared_state
 from src.engine.min.checklist_generator import ChecklistGenerator
 from src.engine.min.calculator import CNRSolver
 from src.engine.omc.document_categorizer import ensure_functional_categories
@@ -29,32 +35,55 @@ from src.engine.mgr.resolucion_generator import ResolucionGenerator
 from src.utils.helpers import (
     determine_case_status,
     load_mock_cases,
+    load_mock_case,
+    mock_revision,
     create_empty_edn
 )
+from src.utils.office_converter import OfficeBusyError, get_office_converter
+from src.utils.preview_cache import get_preview_cache
+from src.utils import page_renderer
+from src.utils.page_renderer import PageOutOfRangeError, PageRenderError
+from src.utils.preview_store import pdf_source, render_preview
+from src.utils.serialization import FastJSONResponse
+from src.utils.temp_cleanup import cleanup_temp_previews
 # ensure_edn_completeness está definida localmente en este archivo (versión más completa)
 from src.config import (
     DATABASE_DIR,
     DATA_DIR,
     EXAMPLE_CASES_DIR,
+    FILE_CATALOG_PATH,
     FILES_DIR,
     MOCK_CASOS_PATH,
+    PAGE_RENDER_DPI,
+    PAGE_THUMBNAIL_DPI,
     RESOLUCIONES_DIR
 )
 
-router = APIRouter()
-
 # Configuración del logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Inicialización de Singletons ---
-db_manager = JSONDBManager(base_path=DATABASE_DIR)
+# Backend de almacenamiento según config (JSON por defecto, SQLite opcional)
+db_manager = get_db_manager()
 checklist_generator = ChecklistGenerator()
 resolucion_generator = ResolucionGenerator()
 cnr_solver = CNRSolver()
 
-# --- Cache en memoria para cambios temporales ---
-cases_store: Dict[str, Any] = {}
+# --- Cambios temporales de los casos (checklist, inventario) ---
+# Compartidos entre los workers de uvicorn (SQLite en SHARED_STATE_PATH): cada lectura es una copia,
+# para modificar un valor hay que volver a asignarlo
+shared_state = get_shared_state()
+cases_store = SharedCaseStore(shared_state)
+
+def sync_shared_state():
+    """Dependencia de cada request: trae los cambios de los demás workers (un PRAGMA si no hay ninguno)"""
+    try:
+        db_manager.apply_shared_changes(shared_state.sync())
+    except Exception as e:
+        print(f"Error sincronizando estado compartido: {e}")
+
+router = APIRouter(default_response_class=FastJSONResponse, dependencies=[Depends(sync_shared_state)])
 
 # --- Definición de Rutas ---
 # Se utilizan variables del config para las rutas, aunque algunas son para lógica interna
@@ -70,6 +99,13 @@ example_cases_dir = EXAMPLE_CASES_DIR  # Ahora apunta directamente a FILES_DIR
 files_dir = FILES_DIR
 mock_casos_path = MOCK_CASOS_PATH
 
+# Catálogo de archivos por caso (reemplaza los rglob al resolver la ruta física de un documento)
+file_catalog = FileCatalog(example_cases_dir, FILE_CATALOG_PATH)
+# relative_path desactualizados que se corrigen en la base en segundo plano (uno a la vez)
+_path_repair_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="relative-path-repair")
+_path_repairs_pending: set = set()
+_path_repairs_lock = threading.Lock()
+
 # --- Funciones Auxiliares ---
 
 def get_mode(request: Request) -> str:
@@ -80,23 +116,73 @@ def get_mode(request: Request) -> str:
     return mode_value if mode_value in ['test', 'validate'] else 'validate'
 
 def _sort_summaries(summaries: List[CaseSummary], sort_by: str, reverse: bool = False) -> List[CaseSummary]:
-    """Ordena los summaries por la columna especificada"""
-    sort_key_map = {
-        'case_id': lambda s: s.case_id,
-        'client_name': lambda s: s.client_name.lower(),
-        'rut_client': lambda s: s.rut_client.lower(),
-        'materia': lambda s: s.materia.lower(),
-        'monto_disputa': lambda s: s.monto_disputa or 0,
-        'empresa': lambda s: s.empresa.lower(),
-        'status': lambda s: s.status.value if hasattr(s.status, 'value') else str(s.status),
-        'fecha_ingreso': lambda s: s.fecha_ingreso or ''
-    }
-    
-    sort_key = sort_key_map.get(sort_by.lower())
-    if sort_key:
-        return sorted(summaries, key=sort_key, reverse=reverse)
+    """Ordena los summaries por la columna especificada (misma normalización que el índice del listado)"""
+    column = sort_by.lower()
+    normalize = SORT_KEYS.get(column)
+    if normalize:
+        return sorted(summaries, key=lambda s: normalize(getattr(s, column)), reverse=reverse)
     return summaries
 
+def _matches_list_filters(summary: CaseSummary, empresa: Optional[str],
+                          fecha_desde: Optional[str], fecha_hasta: Optional[str]) -> bool:
+    """Filtros de empresa y rango de fecha de ingreso (YYYY-MM-DD) para los listados sin índice"""
+    if empresa and summary.empresa != empresa:
+        return False
+    if fecha_desde or fecha_hasta:
+        fecha = summary.fecha_ingreso or ''
+        if not fecha[:1].isdigit():
+            return False
+        if (fecha_desde and fecha < fecha_desde) or (fecha_hasta and fecha > fecha_hasta):
+            return False
+    return True
+
+def _etag(*parts: Any, weak: bool = True) -> str:
+    """ETag a partir de las versiones de las que depende una respuesta"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:24]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True si If-None-Match incluye la ETag (comparación débil: se ignora el prefijo W/)"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+def _not_modified(etag: str) -> Response:
+    """Respuesta 304 (el cliente reutiliza su copia)"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def _set_etag(response: Response, etag: str):
+    # no-cache: el navegador puede guardar la respuesta, pero la revalida con If-None-Match en cada uso
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+def _data_revision(app_mode: str, case_id: Optional[str] = None) -> Optional[str]:
+    """
+    Versión de los datos que respaldan el listado (o un caso) en el modo dado
+    
+    En modo validate es la revisión del gestor de base de datos (ver case_revision y list_revision);
+    en modo test, o con la base vacía, la de mock_casos.json.
+    
+    Returns:
+        Texto opaco, o None si el caso no existe en la base
+    """
+    if app_mode != 'test':
+        try:
+            if db_manager.count_casos():
+                return db_manager.case_revision(case_id) if case_id else db_manager.list_revision()
+        except Exception as e:
+            print(f"Error obteniendo revisión de la base: {e}")
+            return None
+    return mock_revision()
+
 # Inicializar generador de checklist
 checklist_generator = ChecklistGenerator()
 
@@ -165,31 +251,11 @@ def ensure_edn_completeness(edn: dict) -> dict:
     
     return edn
 
-def get_cases_data_with_mode(app_mode: str = 'validate'):
-    """Obtiene casos según el modo especificado"""
-    if app_mode == 'test':
-        # Modo test: usar mock
-        data = load_mock_cases()
-        casos = []
-        for caso_data in data["casos"]:
-            case_id = caso_data["compilation_metadata"]["case_id"]
-            if case_id in cases_store:
-                stored = cases_store[case_id]
-                if "document_inventory" in stored:
-                    caso_data["document_inventory"] = stored["document_inventory"]
-                if "checklist" in stored:
-                    caso_data["checklist"] = stored["checklist"]
-            casos.append(caso_data)
-        return casos
-    
-    # Modo validate: casos reales
-    return get_cases_data()
-
 def get_cases_data():
     """Obtiene casos de JSON DB, SQLite BD o fallback a mock"""
     # Prioridad 1: JSON DB (casos reales procesados)
     try:
-        casos_json = db_manager.data_store.get("casos", [])
+        casos_json = db_manager.casos
         if casos_json:
             casos = []
             for caso_json in casos_json:
@@ -265,6 +331,47 @@ def get_cases_data():
         casos.append(caso_data)
     return casos
 
+def _apply_cases_store(case_id: str, caso: dict) -> dict:
+    """Aplica al caso los cambios en memoria de cases_store, si existen"""
+    if case_id in cases_store:
+        stored = cases_store[case_id]
+        if "document_inventory" in stored:
+            caso["document_inventory"] = stored["document_inventory"]
+        if "checklist" in stored:
+            caso["checklist"] = stored["checklist"]
+    return caso
+
+def get_case_data_with_mode(case_id: str, app_mode: str = 'validate') -> Optional[dict]:
+    """
+    Obtiene un único caso según el modo, sin materializar el resto del corpus
+    
+    En modo test lo busca en el mock; en modo validate fusiona sólo el EDN del caso pedido
+    (ver get_case_data), sin recorrer el resto de los casos.
+    
+    Returns:
+        Diccionario del caso o None si no existe
+    """
+    if app_mode == 'test':
+        return _find_mock_case(case_id)
+    return get_case_data(case_id)
+
+def get_case_data(case_id: str) -> Optional[dict]:
+    """Obtiene un caso de JSON DB por su case_id, o del mock si la base está vacía"""
+    try:
+        if db_manager.count_casos():
+            edn = db_manager.get_caso_by_case_id(case_id)
+            return _apply_cases_store(case_id, edn) if edn else None
+    except Exception as e:
+        print(f"Error leyendo de JSON DB: {e}")
+    
+    # Fallback a mock
+    return _find_mock_case(case_id)
+
+def _find_mock_case(case_id: str) -> Optional[dict]:
+    """Busca un caso en los datos mock (copia modificable) y le aplica los cambios en memoria"""
+    caso_data = load_mock_case(case_id)
+    return _apply_cases_store(case_id, caso_data) if caso_data else None
+
 def recalculate_checklist(caso: dict):
     """Recalcula el checklist basado en los documentos disponibles"""
     # Regenerar checklist completo usando el generador
@@ -310,16 +417,37 @@ def get_failed_checklist_items(checklist: Dict[str, Any]) -> List[Dict[str, Any]
 
 @router.get("/casos", response_model=List[CaseSummary])
 def get_casos(request: Request,
+              response: Response,
               q: Optional[str] = None,
               tipo_caso: Optional[str] = None,
               estado: Optional[str] = None,
+              empresa: Optional[str] = None,
+              fecha_desde: Optional[str] = None,
+              fecha_hasta: Optional[str] = None,
               sort_by: Optional[str] = None,
               sort_order: Optional[str] = None,
               page: Optional[int] = None,
-              page_size: Optional[int] = None):
-    """Lista todos los casos con búsqueda, filtrado, ordenamiento y paginación"""
+              page_size: Optional[int] = None,
+              cursor: Optional[str] = None):
+    """
+    Lista todos los casos con búsqueda, filtrado, ordenamiento y paginación
+    
+    La respuesta incluye el header X-Total-Count (casos que cumplen los filtros) y, en modo validate,
+    X-Next-Cursor cuando hay más páginas: pasarlo como cursor pide la página siguiente sin
+    recorrer las anteriores (en ese caso page se ignora).
+    
+    También incluye una ETag que cambia con cualquier escritura de la base o de los cambios en
+    memoria; con If-None-Match y la misma ETag se responde 304 sin armar el listado.
+    """
     app_mode = get_mode(request)
     
+    revision = _data_revision(app_mode)
+    if revision is not None:
+        etag = _etag("casos", app_mode, revision, shared_state.version, request.url.query)
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+        _set_etag(response, etag)
+    
     # Valores por defecto
     sort_order = sort_order or 'asc'
     page = page or 1
@@ -403,6 +531,8 @@ def get_casos(request: Request,
                 fecha_ingreso=caso_data.get("fecha_ingreso") or "",
                 empresa=caso_data.get("empresa") or "N/A"
             )
+            if not _matches_list_filters(summary, empresa, fecha_desde, fecha_hasta):
+                continue
             summaries.append(summary)
         
         # Aplicar ordenamiento
@@ -411,6 +541,7 @@ def get_casos(request: Request,
             summaries = _sort_summaries(summaries, sort_by, reverse_order)
         
         # Aplicar paginación
+        response.headers["X-Total-Count"] = str(len(summaries))
         start_idx = (page - 1) * page_size
         end_idx = start_idx + page_size
         summaries = summaries[start_idx:end_idx]
@@ -420,83 +551,21 @@ def get_casos(request: Request,
     # Modo validate: usar casos reales
     # Intentar obtener de JSON DB primero
     try:
-        casos_bd = db_manager.get_all_casos()
-        if casos_bd:
-            summaries = []
-            for caso_bd in casos_bd:
-                # Filtrar por tipo_caso si se especifica
-                if tipo_caso:
-                    # Obtener EDN para verificar tipo_caso
-                    edn = db_manager.get_caso_by_case_id(caso_bd['case_id'])
-                    if edn:
-                        edn_tipo_caso = edn.get("compilation_metadata", {}).get("tipo_caso")
-                        if edn_tipo_caso != tipo_caso:
-                            continue
-                
-                # Determinar status desde la BD
-                estado_bd = caso_bd.get('estado', 'PENDIENTE')
-                if estado_bd == CaseStatus.CERRADO.value:
-                    status = CaseStatus.CERRADO
-                elif estado_bd == 'RESUELTO':
-                    status = CaseStatus.RESUELTO
-                elif estado_bd == 'EN_REVISION':
-                    status = CaseStatus.EN_REVISION
-                else:
-                    status = CaseStatus.PENDIENTE
-                
-                # Filtrar por estado si se especifica
-                if estado and status.value != estado:
-                    continue
-                
-                # Aplicar búsqueda si se especifica
-                if q:
-                    query_lower = q.lower()
-                    # Buscar en campos visibles en el dashboard
-                    searchable_fields = [
-                        caso_bd.get('case_id', ''),
-                        caso_bd.get('client_name', ''),
-                        caso_bd.get('rut_client', ''),
-                        caso_bd.get('materia', ''),
-                        caso_bd.get('empresa', ''),
-                        str(caso_bd.get('monto_disputa', 0))
-                    ]
-                    if not any(query_lower in str(field).lower() for field in searchable_fields if field):
-                        continue
-                
-                # Obtener tipo_caso del EDN si materia no está disponible o es el valor por defecto
-                materia = caso_bd.get('materia') or 'N/A'
-                if materia == 'N/A' or materia == 'Reclamo SEC':
-                    # Intentar obtener tipo_caso del EDN
-                    edn = db_manager.get_caso_by_case_id(caso_bd['case_id'])
-                    if edn:
-                        tipo_caso = edn.get('compilation_metadata', {}).get('tipo_caso')
-                        if tipo_caso:
-                            materia = tipo_caso
-                
-                summary = CaseSummary(
-                    case_id=caso_bd['case_id'],
-                    client_name=caso_bd.get('client_name') or 'N/A',
-                    rut_client=caso_bd.get('rut_client') or 'N/A',
-                    materia=materia,
-                    monto_disputa=caso_bd.get('monto_disputa') or 0,
-                    status=status,
-                    fecha_ingreso=caso_bd.get('fecha_ingreso') or '',
-                    empresa=caso_bd.get('empresa') or 'N/A'
-                )
-                summaries.append(summary)
-            
-            # Aplicar ordenamiento
-            if sort_by:
-                reverse_order = sort_order.lower() == 'desc'
-                summaries = _sort_summaries(summaries, sort_by, reverse_order)
-            
-            # Aplicar paginación
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
-            summaries = summaries[start_idx:end_idx]
-            
-            if summaries:
-                return summaries
+        # Filas materializadas por el gestor (estado y materia ya resueltos), con órdenes precalculados
+        if db_manager.count_casos():
+            rows, total, next_cursor = db_manager.list_casos(
+                q=q, estado=estado, tipo_caso=tipo_caso, empresa=empresa,
+                fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+                sort_by=sort_by, descending=sort_order.lower() == 'desc',
+                cursor=cursor, offset=max(page - 1, 0) * page_size, limit=page_size
+            )
+            response.headers["X-Total-Count"] = str(total)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            # CaseSummary sólo para la página pedida
+            return [CaseSummary(**row) for row in rows]
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error leyendo de JSON DB: {e}")
     
@@ -504,17 +573,13 @@ def get_casos(request: Request,
     casos_data = get_cases_data()
     summaries = []
     
-    # Cargar estados guardados desde casos.json
+    # Cargar estados guardados desde la base de datos
     estados_guardados = {}
     try:
-        casos_path = db_path / "casos.json"
-        if casos_path.exists():
-            with open(casos_path, "r", encoding="utf-8") as f:
-                casos_json = json.load(f)
-                for caso_json in casos_json:
-                    case_id = caso_json.get("case_id")
-                    if case_id:
-                        estados_guardados[case_id] = caso_json.get("estado")
+        for caso_json in db_manager.casos:
+            case_id = caso_json.get("case_id")
+            if case_id:
+                estados_guardados[case_id] = caso_json.get("estado")
     except Exception as e:
         print(f"Error leyendo estados de casos: {e}")
     
@@ -595,6 +660,8 @@ def get_casos(request: Request,
             fecha_ingreso=caso.get("fecha_ingreso") or "",
             empresa=caso.get("empresa") or "N/A"
         )
+        if not _matches_list_filters(summary, empresa, fecha_desde, fecha_hasta):
+            continue
         summaries.append(summary)
     
     # Aplicar ordenamiento
@@ -603,110 +670,32 @@ def get_casos(request: Request,
         summaries = _sort_summaries(summaries, sort_by, reverse_order)
     
     # Aplicar paginación
+    response.headers["X-Total-Count"] = str(len(summaries))
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
     summaries = summaries[start_idx:end_idx]
     
     return summaries
 
-@router.get("/casos/{case_id}", response_model=ExpedienteDigitalNormalizado)
-def get_caso(case_id: str, request: Request, mode: Optional[str] = None):
-    """Obtiene el EDN completo de un caso"""
-    app_mode = get_mode(request)
-    
-    # Si está en modo test, usar mock
-    if app_mode == 'test':
-        data = load_mock_cases()
-        for caso_data in data["casos"]:
-            if caso_data["compilation_metadata"]["case_id"] == case_id:
-                # Aplicar cambios en memoria si existen
-                if case_id in cases_store:
-                    stored = cases_store[case_id]
-                    if "document_inventory" in stored:
-                        caso_data["document_inventory"] = stored["document_inventory"]
-                    if "checklist" in stored:
-                        caso_data["checklist"] = stored["checklist"]
-                return ExpedienteDigitalNormalizado(**caso_data)
-        raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
-    
-    # Modo validate: usar casos reales
-    # Prioridad 1: JSON DB
-    try:
-        edn = db_manager.get_caso_by_case_id(case_id)
-        if edn:
-            # Asegurar que todos los campos requeridos existan
-            # Nota: get_caso_by_case_id ya fusiona metadatos del caso con el EDN
-            edn = ensure_edn_completeness(edn)
-            
-            # Aplicar cambios en memoria si existen
-            if case_id in cases_store:
-                stored = cases_store[case_id]
-                if "document_inventory" in stored:
-                    edn["document_inventory"] = stored["document_inventory"]
-                if "checklist" in stored:
-                    edn["checklist"] = stored["checklist"]
-            
-            # Siempre regenerar checklist usando MIN (para asegurar tipo_caso correcto)
-            try:
-                edn["checklist"] = checklist_generator.generate_checklist(edn)
-            except Exception as e:
-                print(f"Error generando checklist en get_caso: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            return ExpedienteDigitalNormalizado(**edn)
-    except Exception as e:
-        print(f"Error obteniendo caso de JSON DB: {e}")
-        import traceback
-        traceback.print_exc()
-    
-    # Prioridad 2: SQLite BD
-    try:
-        edn = db_manager.get_caso_by_case_id(case_id)
-        if edn:
-            # Aplicar cambios en memoria si existen
-            if case_id in cases_store:
-                stored = cases_store[case_id]
-                if "document_inventory" in stored:
-                    edn["document_inventory"] = stored["document_inventory"]
-                if "checklist" in stored:
-                    edn["checklist"] = stored["checklist"]
-            return ExpedienteDigitalNormalizado(**edn)
-    except Exception:
-        pass
-    
-    # Fallback a mock
-    casos_data = get_cases_data()
-    for caso in casos_data:
-        case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-        if not case_id_caso:
-            # Intentar obtener desde el caso directamente si no tiene compilation_metadata
-            case_id_caso = caso.get("case_id")
-        if case_id_caso == case_id:
-            return ExpedienteDigitalNormalizado(**caso)
-    
-    raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
-
+# Registrada antes de /casos/{case_id} para que "search" no se tome como case_id
 @router.get("/casos/search", response_model=List[CaseSummary])
 def search_casos(request: Request,
                  q: str = None,
                  mode: Optional[str] = None):
-    """Busca casos por texto en los campos del EDN"""
+    """
+    Busca casos por texto (cliente, RUT, NIS, empresa, materia, documentos, ...)
+    
+    En modo validate usa el índice invertido del gestor: sin distinguir tildes ni mayúsculas,
+    cada término de la consulta se busca por prefijo.
+    """
     app_mode = get_mode(request)
     
-    if app_mode == 'test':
-        # En modo test, buscar en mock data
-        data = load_mock_cases()
-        casos_data = data["casos"]
-    else:
-        # En modo validate, buscar en JSON DB
-        casos_bd = db_manager.get_all_casos()
-        casos_data = []
-        for caso_bd in casos_bd:
-            case_id = caso_bd['case_id']
-            edn = db_manager.get_caso_by_case_id(case_id)
-            if edn:
-                casos_data.append(edn)
+    if app_mode != 'test':
+        return [CaseSummary(**row) for row in db_manager.search_casos(q or '')]
+    
+    # En modo test, buscar en mock data
+    data = load_mock_cases()
+    casos_data = data["casos"]
     
     # Buscar en campos del EDN
     query_lower = q.lower()
@@ -752,7 +741,7 @@ def search_casos(request: Request,
         # Fallback a personas.json solo si no hay datos en EDN
         if not client_name or client_name in ['—', 'N/A', '']:
             rut = rut_client
-            persona = db_manager.data_store.get("personas", {}).get(rut) if rut else None
+            persona = db_manager.get_persona_by_rut(rut) if rut else None
             if persona:
                 client_name = persona.get('nombre', 'N/A')
                 if not rut_client or rut_client in ['—', 'N/A', '']:
@@ -767,14 +756,13 @@ def search_casos(request: Request,
         # Determinar estado (simplificado)
         status = CaseStatus.PENDIENTE
         # Buscar en casos.json para obtener estado real
-        for c in db_manager.data_store.get("casos", []):
-            if c.get('case_id') == case_id:
-                estado_bd = c.get('estado', 'PENDIENTE')
-                if estado_bd == CaseStatus.CERRADO.value:
-                    status = CaseStatus.CERRADO
-                elif estado_bd == 'RESUELTO':
-                    status = CaseStatus.RESUELTO
-                break
+        c = db_manager.get_caso_record(case_id)
+        if c:
+            estado_bd = c.get('estado', 'PENDIENTE')
+            if estado_bd == CaseStatus.CERRADO.value:
+                status = CaseStatus.CERRADO
+            elif estado_bd == 'RESUELTO':
+                status = CaseStatus.RESUELTO
         
         # Usar tipo_caso del EDN si materia no está disponible o es el valor por defecto
         materia = caso.get('materia') or 'N/A'
@@ -797,23 +785,92 @@ def search_casos(request: Request,
     
     return summaries
 
+@router.get("/casos/{case_id}", response_model=ExpedienteDigitalNormalizado)
+def get_caso(case_id: str, request: Request, response: Response, mode: Optional[str] = None):
+    """
+    Obtiene el EDN completo de un caso
+    
+    La ETag cambia con cada escritura del caso o de sus cambios en memoria (cases_store);
+    con If-None-Match y la misma ETag se responde 304.
+    """
+    app_mode = get_mode(request)
+    
+    revision = _data_revision(app_mode, case_id)
+    if revision is not None:
+        etag = _etag("caso", app_mode, case_id, revision, shared_state.revision('case_state', case_id))
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+        _set_etag(response, etag)
+    
+    # Si está en modo test, usar mock
+    if app_mode == 'test':
+        # Sólo lectura: basta una copia superficial del caso en cache
+        caso_data = load_mock_case(case_id, deep=False)
+        if caso_data:
+            # Aplicar cambios en memoria si existen
+            return ExpedienteDigitalNormalizado(**_apply_cases_store(case_id, caso_data))
+        raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
+    
+    # Modo validate: usar casos reales
+    # Prioridad 1: JSON DB
+    try:
+        edn = db_manager.get_caso_by_case_id(case_id)
+        if edn:
+            # Asegurar que todos los campos requeridos existan
+            # Nota: get_caso_by_case_id ya fusiona metadatos del caso con el EDN
+            edn = ensure_edn_completeness(edn)
+            
+            # Aplicar cambios en memoria si existen
+            if case_id in cases_store:
+                stored = cases_store[case_id]
+                if "document_inventory" in stored:
+                    edn["document_inventory"] = stored["document_inventory"]
+                if "checklist" in stored:
+                    edn["checklist"] = stored["checklist"]
+            
+            # Siempre regenerar checklist usando MIN (para asegurar tipo_caso correcto)
+            try:
+                edn["checklist"] = checklist_generator.generate_checklist(edn)
+            except Exception as e:
+                print(f"Error generando checklist en get_caso: {e}")
+                import traceback
+                traceback.print_exc()
+            
+            return ExpedienteDigitalNormalizado(**edn)
+    except Exception as e:
+        print(f"Error obteniendo caso de JSON DB: {e}")
+        import traceback
+        traceback.print_exc()
+    
+    # Prioridad 2: SQLite BD
+    try:
+        edn = db_manager.get_caso_by_case_id(case_id)
+        if edn:
+            # Aplicar cambios en memoria si existen
+            if case_id in cases_store:
+                stored = cases_store[case_id]
+                if "document_inventory" in stored:
+                    edn["document_inventory"] = stored["document_inventory"]
+                if "checklist" in stored:
+                    edn["checklist"] = stored["checklist"]
+            return ExpedienteDigitalNormalizado(**edn)
+    except Exception:
+        pass
+    
+    # Fallback a mock
+    caso = get_case_data(case_id)
+    if caso:
+        return ExpedienteDigitalNormalizado(**caso)
+    
+    raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
+
 @router.put("/casos/{case_id}/documentos/{file_id}")
 def update_documento(case_id: str, file_id: str, update: DocumentUpdateRequest,
                      request: Request,
                      mode: Optional[str] = None):
     """Actualiza el tipo de un documento (re-clasificación) y guarda en DataBase"""
     app_mode = get_mode(request)
-    casos_data = get_cases_data_with_mode(app_mode)
-    
-    caso_encontrado = None
-    for caso in casos_data:
-        case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-        if not case_id_caso:
-            # Intentar obtener desde el caso directamente si no tiene compilation_metadata
-            case_id_caso = caso.get("case_id")
-        if case_id_caso == case_id:
-            caso_encontrado = caso
-            break
+    caso_encontrado = get_case_data_with_mode(case_id, app_mode)
     
     if not caso_encontrado:
         raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -887,7 +944,6 @@ def update_documento(case_id: str, file_id: str, update: DocumentUpdateRequest,
                 edn_limpio = {k: v for k, v in edn_actualizado.items() 
                              if k not in ['materia', 'monto_disputa', 'empresa', 'fecha_ingreso']}
                 db_manager.update_edn(case_id, edn_limpio)
-                db_manager.reload_case(case_id)
     except Exception as e:
         print(f"Error guardando documento en DataBase: {e}")
         import traceback
@@ -912,23 +968,25 @@ def update_documento(case_id: str, file_id: str, update: DocumentUpdateRequest,
         "document_inventory": caso_encontrado["document_inventory"]  # Incluir el inventario completo actualizado
     }
 
+def _find_checklist_item(checklist: dict, item_id: str) -> Optional[dict]:
+    """Item del checklist con ese id (sin distinguir mayúsculas ni espacios), o None"""
+    search_id_normalized = str(item_id).strip().lower()
+    for category in ["group_a_admisibilidad", "group_b_instruccion", "group_c_analisis"]:
+        items = checklist.get(category, [])
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if isinstance(item, dict) and str(item.get("id", "")).strip().lower() == search_id_normalized:
+                return item
+    return None
+
 @router.put("/casos/{case_id}/checklist/{item_id}")
 def update_checklist_item(case_id: str, item_id: str, update: ChecklistItemUpdateRequest,
                           request: Request,
                           mode: Optional[str] = None):
     """Actualiza el estado de validación de un item del checklist"""
     app_mode = get_mode(request)
-    casos_data = get_cases_data_with_mode(app_mode)
-    
-    caso_encontrado = None
-    for caso in casos_data:
-        case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-        if not case_id_caso:
-            # Intentar obtener desde el caso directamente si no tiene compilation_metadata
-            case_id_caso = caso.get("case_id")
-        if case_id_caso == case_id:
-            caso_encontrado = caso
-            break
+    caso_encontrado = get_case_data_with_mode(case_id, app_mode)
     
     if not caso_encontrado:
         raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -1054,25 +1112,46 @@ def update_checklist_item(case_id: str, item_id: str, update: ChecklistItemUpdat
             logger.error(f"Checklist parece estar vacío o mal formado. Checklist keys: {list(checklist.keys()) if isinstance(checklist, dict) else 'not a dict'}")
         raise HTTPException(status_code=404, detail=f"Item {item_id} no encontrado en el checklist")
     
+    # Guardar cambios en memoria: el item se aplica sobre el checklist guardado dentro de una sola
+    # transacción, para no pisar los items que otro worker haya cambiado desde que se leyó el caso
+    def apply_item(stored):
+        stored = stored or {}
+        stored_checklist = stored.get("checklist")
+        stored_item = _find_checklist_item(stored_checklist, item_id) if stored_checklist else None
+        if stored_item is None:
+            # Sin checklist guardado (o sin ese item): se guarda el leído, que ya tiene el item actualizado
+            stored_checklist = checklist
+        else:
+            stored_item["validated"] = update.validated
+        stored["checklist"] = stored_checklist
+        return stored
+    
+    version, stored = shared_state.update_case_state(case_id, apply_item)
+    checklist = stored["checklist"]
+    item_encontrado = _find_checklist_item(checklist, item_id) or item_encontrado
+    
     # Guardar cambios en EDN
     if app_mode == 'validate':
-        # Obtener EDN actualizado
-        edn_actualizado = db_manager.get_caso_by_case_id(case_id)
-        if edn_actualizado:
+        while True:
+            # Obtener EDN actualizado
+            edn_actualizado = db_manager.get_caso_by_case_id(case_id)
+            if not edn_actualizado:
+                break
             # Actualizar checklist en EDN
             edn_actualizado["checklist"] = checklist
             # Remover campos de caso que no pertenecen al EDN
             edn_limpio = {k: v for k, v in edn_actualizado.items() 
                          if k not in ['materia', 'monto_disputa', 'empresa', 'fecha_ingreso']}
             db_manager.update_edn(case_id, edn_limpio)
-            db_manager.reload_case(case_id)
     
-    # Guardar cambios en memoria también
-    if case_id not in cases_store:
-        cases_store[case_id] = {}
-    cases_store[case_id]["checklist"] = checklist
+            # Si otro worker cambió el checklist después, su EDN pudo guardarse antes que éste:
+            # se vuelve a guardar con el checklist más reciente
+            latest_version, latest = shared_state.read_case_state(case_id)
+            if latest_version == version or not latest or not latest.get("checklist"):
+                break
+            version, checklist = latest_version, latest["checklist"]
     
-    return {"message": "Item del checklist actualizado", "item": item}
+    return {"message": "Item del checklist actualizado", "item": item_encontrado}
 
 @router.post("/casos/{case_id}/resolucion", response_model=ResolucionResponse)
 def generar_resolucion(case_id: str,
@@ -1081,16 +1160,7 @@ def generar_resolucion(case_id: str,
                        mode: Optional[str] = None):
     """Genera un borrador de resolución basado en el estado del checklist"""
     app_mode = get_mode(request)
-    casos_data = get_cases_data_with_mode(app_mode)
-    
-    caso_encontrado = None
-    for caso in casos_data:
-        case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-        if not case_id_caso:
-            case_id_caso = caso.get("case_id")
-        if case_id_caso == case_id:
-            caso_encontrado = caso
-            break
+    caso_encontrado = get_case_data_with_mode(case_id, app_mode)
     
     if not caso_encontrado:
         raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -1136,43 +1206,6 @@ def generar_resolucion(case_id: str,
         logger.error(f"Error inesperado al generar resolución para {case_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error interno al generar la resolución")
 
-def cleanup_temp_previews(case_id: str = None, max_age_hours: int = 1):
-    """
-    Limpia archivos temporales de preview.
-    
-    Args:
-        case_id: Si se proporciona, solo limpia previews de este caso. Si es None, limpia todos los previews antiguos.
-        max_age_hours: Edad máxima en horas para considerar un archivo como antiguo (default: 1 hora)
-    """
-    import time
-    from datetime import datetime, timedelta
-    
-    if not temp_dir.exists():
-        return
-    
-    current_time = time.time()
-    max_age_seconds = max_age_hours * 3600
-    deleted_count = 0
-    
-    for file_path in temp_dir.glob("resolucion_preview_*.pdf"):
-        try:
-            # Si se especifica un case_id, solo eliminar si el nombre contiene ese case_id
-            if case_id and case_id not in file_path.name:
-                continue
-            
-            # Verificar edad del archivo
-            file_age = current_time - file_path.stat().st_mtime
-            
-            # Eliminar si es específico del caso o si es antiguo
-            if case_id or file_age > max_age_seconds:
-                file_path.unlink()
-                deleted_count += 1
-        except Exception as e:
-            logger.warning(f"Error al eliminar archivo temporal {file_path}: {e}")
-    
-    if deleted_count > 0:
-        logger.info(f"Limpieza de previews temporales: {deleted_count} archivo(s) eliminado(s)")
-
 @router.post("/casos/{case_id}/resolucion/pdf-preview")
 def preview_resolucion_pdf(case_id: str,
                            resolucion_req: ResolucionRequest,
@@ -1180,16 +1213,7 @@ def preview_resolucion_pdf(case_id: str,
                            mode: Optional[str] = None):
     """Genera y devuelve un PDF de previsualización de la resolución"""
     app_mode = get_mode(request)
-    casos_data = get_cases_data_with_mode(app_mode)
-    
-    caso_encontrado = None
-    for caso in casos_data:
-        case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-        if not case_id_caso:
-            case_id_caso = caso.get("case_id")
-        if case_id_caso == case_id:
-            caso_encontrado = caso
-            break
+    caso_encontrado = get_case_data_with_mode(case_id, app_mode)
     
     if not caso_encontrado:
         raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -1200,44 +1224,38 @@ def preview_resolucion_pdf(case_id: str,
     empresa = caso_encontrado.get('empresa', 'N/A')
     materia = caso_encontrado.get('materia', 'N/A')
     
-    # Limpiar previews antiguos antes de generar uno nuevo
-    cleanup_temp_previews(max_age_hours=1)
-    
-    # Crear directorio temporal para PDFs
-    temp_dir.mkdir(exist_ok=True)
-    
-    # Generar PDF
-    import uuid
-    pdf_filename = f"resolucion_preview_{case_id}_{uuid.uuid4().hex[:8]}.pdf"
-    pdf_path = temp_dir / pdf_filename
-    
     resolucion_content = resolucion_req.content or ""
     
-    from src.utils.resolucion_pdf import generate_resolucion_pdf
-    success = generate_resolucion_pdf(
+    # Generar PDF en memoria (o reutilizar la previsualización del mismo borrador)
+    from src.utils.resolucion_pdf import render_resolucion_preview
+    preview = render_resolucion_preview(
         resolucion_content=resolucion_content,
         case_id=case_id,
-        output_path=pdf_path,
         client_name=client_name,
         rut_client=rut_client,
         empresa=empresa,
         materia=materia
     )
     
-    if not success:
+    if preview is None:
         raise HTTPException(status_code=500, detail="Error al generar PDF de resolución")
     
-    return FileResponse(
-        str(pdf_path),
+    pdf_bytes, digest = preview
+    return Response(
+        content=pdf_bytes,
         media_type='application/pdf',
-        filename=f"Resolucion_{case_id}_preview.pdf",
-        headers={"Content-Disposition": f'inline; filename="Resolucion_{case_id}_preview.pdf"'}
+        headers={
+            "Content-Disposition": f'inline; filename="Resolucion_{case_id}_preview.pdf"',
+            "ETag": _etag(digest)
+        }
     )
 
 @router.delete("/casos/{case_id}/resolucion/preview-cleanup")
 def cleanup_preview(case_id: str, request: Request):
-    """Limpia los archivos temporales de preview para un caso específico"""
+    """Limpia los archivos temporales y las previsualizaciones en memoria de un caso específico"""
+    from src.utils.resolucion_pdf import discard_resolucion_previews
     cleanup_temp_previews(case_id=case_id)
+    discard_resolucion_previews(case_id)
     return {"message": f"Previews temporales del caso {case_id} eliminados"}
 
 @router.post("/casos/{case_id}/calculate-cnr", response_model=CNRCalculationResponse)
@@ -1250,7 +1268,8 @@ def calculate_cnr(case_id: str, calculation_req: CNRCalculationRequest, request:
         # Obtener monto cobrado del caso si está disponible
         monto_cobrado = None
         try:
-            caso = db_manager.get_caso_by_case_id(case_id)
+            # Sólo se necesita la fila del caso, no el EDN fusionado
+            caso = db_manager.get_caso_record(case_id)
             if caso:
                 monto_cobrado = caso.get("monto_disputa")
         except Exception as e:
@@ -1285,22 +1304,9 @@ def cerrar_caso(case_id: str,
     if app_mode == 'test':
         raise HTTPException(status_code=400, detail="No se puede cerrar caso en modo test")
     
-    # Buscar caso en JSON DB
-    casos_path = db_path / "casos.json"
-    if not casos_path.exists():
-        raise HTTPException(status_code=404, detail="Base de datos no encontrada")
-    
+    # Buscar caso en la base de datos
     try:
-        with open(casos_path, "r", encoding="utf-8") as f:
-            casos = json.load(f)
-        
-        caso_encontrado = None
-        caso_index = None
-        for idx, caso in enumerate(casos):
-            if caso.get("case_id") == case_id:
-                caso_encontrado = caso
-                caso_index = idx
-                break
+        caso_encontrado = db_manager.get_caso_record(case_id)
         
         if not caso_encontrado:
             raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -1309,26 +1315,24 @@ def cerrar_caso(case_id: str,
         if caso_encontrado.get("estado") == CaseStatus.CERRADO.value:
             raise HTTPException(status_code=400, detail="El caso ya está cerrado")
         
-        # Actualizar estado a CERRADO
-        caso_encontrado["estado"] = CaseStatus.CERRADO.value
-        
         # Guardar fecha de cierre
         from datetime import datetime
         fecha_cierre = cerrar_req.fecha_cierre or datetime.now().isoformat()
-        caso_encontrado["fecha_cierre"] = fecha_cierre
         
-        # Guardar cambios en casos.json (solo metadatos del caso)
-        casos[caso_index] = caso_encontrado
-        with open(casos_path, "w", encoding="utf-8") as f:
-            json.dump(casos, f, indent=2, ensure_ascii=False)
+        # Actualizar estado a CERRADO (solo metadatos del caso)
+        caso_encontrado = db_manager.update_caso(case_id, {
+            "estado": CaseStatus.CERRADO.value,
+            "fecha_cierre": fecha_cierre
+        })
         
         # Limpiar previews temporales de este caso al cerrarlo
+        from src.utils.resolucion_pdf import discard_resolucion_previews, generate_resolucion_pdf
         cleanup_temp_previews(case_id=case_id)
+        discard_resolucion_previews(case_id)
         
         # Generar PDF de resolución si hay contenido
         resolucion_file_id = None
         if cerrar_req.resolucion_content:
-            from src.utils.resolucion_pdf import generate_resolucion_pdf
             import uuid
             
             # Crear directorio para resoluciones finales (en carpeta del caso)
@@ -1359,9 +1363,8 @@ def cerrar_caso(case_id: str,
             )
             
             if success:
-                # Guardar documento en documentos.json
+                # Guardar documento en la base de datos
                 resolucion_file_id = str(uuid.uuid4())
-                documentos_path = db_path / "documentos.json"
                 
                 # Calcular ruta relativa desde FILES_DIR
                 relative_resolucion_path = pdf_path.relative_to(FILES_DIR)
@@ -1380,16 +1383,7 @@ def cerrar_caso(case_id: str,
                     }
                 }
                 
-                if documentos_path.exists():
-                    with open(documentos_path, "r", encoding="utf-8") as f:
-                        documentos = json.load(f)
-                else:
-                    documentos = []
-                
-                documentos.append(documento_resolucion)
-                
-                with open(documentos_path, "w", encoding="utf-8") as f:
-                    json.dump(documentos, f, indent=2, ensure_ascii=False)
+                db_manager.add_documento(documento_resolucion)
                 
                 # Agregar resolución al document_inventory del EDN
                 if edn:
@@ -1424,9 +1418,6 @@ def cerrar_caso(case_id: str,
                              if k not in ['materia', 'monto_disputa', 'empresa', 'fecha_ingreso']}
                 db_manager.update_edn(case_id, edn_limpio)
         
-        # Recargar el caso desde la base de datos
-        db_manager.reload_case(case_id)
-        
         # Limpiar cache en memoria
         if case_id in cases_store:
             del cases_store[case_id]
@@ -1458,22 +1449,9 @@ def update_unified_context(case_id: str, update: UnifiedContextUpdateRequest,
     if app_mode == 'test':
         raise HTTPException(status_code=400, detail="No se puede editar en modo test")
     
-    # Buscar caso en JSON DB
-    casos_path = db_path / "casos.json"
-    if not casos_path.exists():
-        raise HTTPException(status_code=404, detail="Base de datos no encontrada")
-    
+    # Buscar caso en la base de datos
     try:
-        with open(casos_path, "r", encoding="utf-8") as f:
-            casos = json.load(f)
-        
-        caso_encontrado = None
-        caso_index = None
-        for idx, caso in enumerate(casos):
-            if caso.get("case_id") == case_id:
-                caso_encontrado = caso
-                caso_index = idx
-                break
+        caso_encontrado = db_manager.get_caso_record(case_id)
         
         if not caso_encontrado:
             raise HTTPException(status_code=404, detail=f"Caso {case_id} no encontrado")
@@ -1492,17 +1470,18 @@ def update_unified_context(case_id: str, update: UnifiedContextUpdateRequest,
                 edn["unified_context"][key] = value if value else None
         
         # Actualizar otros campos del caso (en casos.json)
+        campos_caso = {}
         if update.materia is not None:
-            caso_encontrado["materia"] = update.materia
+            campos_caso["materia"] = update.materia
         
         if update.monto_disputa is not None:
-            caso_encontrado["monto_disputa"] = update.monto_disputa
+            campos_caso["monto_disputa"] = update.monto_disputa
         
         if update.empresa is not None:
-            caso_encontrado["empresa"] = update.empresa
+            campos_caso["empresa"] = update.empresa
         
         if update.fecha_ingreso is not None:
-            caso_encontrado["fecha_ingreso"] = update.fecha_ingreso
+            campos_caso["fecha_ingreso"] = update.fecha_ingreso
         
         # Actualizar personas y suministros si cambió RUT o NIS
         if update.unified_context:
@@ -1525,19 +1504,15 @@ def update_unified_context(case_id: str, update: UnifiedContextUpdateRequest,
                     unified_context.get("address_standard")
                 )
         
-        # Guardar cambios en casos.json (solo metadatos)
-        casos[caso_index] = caso_encontrado
-        with open(casos_path, "w", encoding="utf-8") as f:
-            json.dump(casos, f, indent=2, ensure_ascii=False)
+        # Guardar cambios del caso (solo metadatos)
+        if campos_caso:
+            db_manager.update_caso(case_id, campos_caso)
         
         # Guardar cambios en EDN (remover campos de caso que no pertenecen al EDN)
         edn_limpio = {k: v for k, v in edn.items() 
                      if k not in ['materia', 'monto_disputa', 'empresa', 'fecha_ingreso']}
         db_manager.update_edn(case_id, edn_limpio)
         
-        # Recargar el caso desde la base de datos para reflejar cambios
-        db_manager.reload_case(case_id)
-        
         # Limpiar cache en memoria para forzar recarga desde disco
         if case_id in cases_store:
             del cases_store[case_id]
@@ -1554,161 +1529,55 @@ def update_unified_context(case_id: str, update: UnifiedContextUpdateRequest,
         raise HTTPException(status_code=500, detail=f"Error al actualizar: {str(e)}")
 
 def _save_document_to_database(case_id: str, documento: Dict[str, Any], level: str):
-    """Guarda actualización de documento en documentos.json"""
-    documentos_path = DATABASE_DIR / "documentos.json"
-    if not documentos_path.exists():
-        return
-    
+    """Guarda actualización de documento en la base de datos (documentos.json o SQLite)"""
     try:
-        with open(documentos_path, "r", encoding="utf-8") as f:
-            documentos = json.load(f)
-        
-        # Buscar y actualizar documento
-        for idx, doc in enumerate(documentos):
-            if doc.get("file_id") == documento["file_id"] and doc.get("case_id") == case_id:
-                documentos[idx]["type"] = documento["type"]
-                documentos[idx]["standardized_name"] = documento.get("standardized_name")
-                documentos[idx]["level"] = level
-                break
-        
-        # Guardar
-        with open(documentos_path, "w", encoding="utf-8") as f:
-            json.dump(documentos, f, indent=2, ensure_ascii=False)
-        
-        # Recargar documentos en JSONDBManager
-        db_manager.reload()
+        db_manager.update_documento(case_id, documento["file_id"], {
+            "type": documento["type"],
+            "standardized_name": documento.get("standardized_name"),
+            "level": level
+        })
     except Exception as e:
         print(f"Error guardando documento en DataBase: {e}")
 
 def _update_persona_in_database(rut: str, nombre: str = None, email: str = None, telefono: str = None):
-    """Actualiza persona en personas.json"""
-    personas_path = db_path / "personas.json"
-    if not personas_path.exists():
-        return
-    
+    """Actualiza persona en la base de datos (personas.json o SQLite)"""
     try:
-        with open(personas_path, "r", encoding="utf-8") as f:
-            personas = json.load(f)
-        
-        # Buscar y actualizar
-        for idx, persona in enumerate(personas):
-            if persona.get("rut") == rut:
-                if nombre:
-                    personas[idx]["nombre"] = nombre
-                if email:
-                    personas[idx]["email"] = email
-                if telefono:
-                    personas[idx]["telefono"] = telefono
-                break
-        
-        # Guardar
-        with open(personas_path, "w", encoding="utf-8") as f:
-            json.dump(personas, f, indent=2, ensure_ascii=False)
-        
-        # Recargar personas en JSONDBManager
-        db_manager.reload()
+        db_manager.update_persona(rut, nombre, email, telefono)
     except Exception as e:
         print(f"Error actualizando persona: {e}")
 
 def _update_suministro_in_database(nis: str, comuna: str = None, direccion: str = None):
-    """Actualiza suministro en suministros.json"""
-    suministros_path = db_path / "suministros.json"
-    if not suministros_path.exists():
-        return
-    
+    """Actualiza suministro en la base de datos (suministros.json o SQLite)"""
     try:
-        with open(suministros_path, "r", encoding="utf-8") as f:
-            suministros = json.load(f)
-        
-        # Buscar y actualizar
-        for idx, suministro in enumerate(suministros):
-            if suministro.get("nis") == nis:
-                if comuna:
-                    suministros[idx]["comuna"] = comuna
-                if direccion:
-                    suministros[idx]["direccion"] = direccion
-                break
-        
-        # Guardar
-        with open(suministros_path, "w", encoding="utf-8") as f:
-            json.dump(suministros, f, indent=2, ensure_ascii=False)
-        
-        # Recargar suministros en JSONDBManager
-        db_manager.reload()
+        db_manager.update_suministro(nis, comuna, direccion)
     except Exception as e:
         print(f"Error actualizando suministro: {e}")
 
 def _find_documento(case_id: str, file_id: str, request: Request):
-    """Helper para buscar un documento en documentos.json o EDN"""
-    documento_encontrado = None
-    documentos_path = db_path / "documentos.json"
-    
-    if documentos_path.exists():
-        try:
-            with open(documentos_path, "r", encoding="utf-8") as f:
-                documentos = json.load(f)
-                for doc in documentos:
-                    if doc.get("file_id") == file_id and doc.get("case_id") == case_id:
-                        documento_encontrado = doc
-                        break
-        except Exception as e:
-            print(f"Error leyendo documentos.json: {e}")
-    
-    # Si no se encuentra en documentos.json, buscar en EDN
-    if not documento_encontrado:
-        app_mode = get_mode(request)
-        casos_data = get_cases_data_with_mode(app_mode)
-        
-        for caso in casos_data:
-            case_id_caso = caso.get("compilation_metadata", {}).get("case_id") if isinstance(caso.get("compilation_metadata"), dict) else None
-            if not case_id_caso:
-                case_id_caso = caso.get("case_id")
-            if case_id_caso == case_id:
-                doc_inventory = caso.get("document_inventory", {})
-                # Buscar en todas las categorías funcionales y niveles
-                categories_to_search = [
-                    "reclamo_respuesta", "informe_evidencias", "historial_calculos", "otros",
-                    "level_1_critical", "level_2_supporting", "level_0_missing"
-                ]
-                for category in categories_to_search:
-                    docs = doc_inventory.get(category, [])
-                    if not isinstance(docs, list):
-                        continue
-                    for doc in docs:
-                        if isinstance(doc, dict) and doc.get("file_id") == file_id:
-                            documento_encontrado = doc
-                            break
-                    if documento_encontrado:
-                        break
-                if documento_encontrado:
-                    break
-        
-        # Si aún no se encuentra, buscar directamente en el EDN desde el db_manager
-        if not documento_encontrado:
-            try:
-                edn = db_manager.get_caso_by_case_id(case_id)
-                if edn:
-                    doc_inventory = edn.get("document_inventory", {})
-                    for category in ["reclamo_respuesta", "informe_evidencias", "historial_calculos", "otros", "level_1_critical", "level_2_supporting", "level_0_missing"]:
-                        docs = doc_inventory.get(category, [])
-                        if isinstance(docs, list):
-                            for doc in docs:
-                                if isinstance(doc, dict) and doc.get("file_id") == file_id:
-                                    documento_encontrado = doc
-                                    break
-                        if documento_encontrado:
-                            break
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.debug(f"Error buscando documento en EDN: {e}")
+    """
+    Helper para buscar un documento en la tabla de documentos o EDN
     
-    return documento_encontrado
+    Usa el índice de documentos del db_manager ((case_id, file_id) en documentos.json y
+    file_id en el inventario del EDN), sin recorrer las listas en cada request.
+    """
+    try:
+        if get_mode(request) == 'test' or not db_manager.count_casos():
+            # Modo test (o base vacía): el caso viene de los datos mock, que no están indexados
+            documento_encontrado = db_manager.get_documento(case_id, file_id)
+            if documento_encontrado:
+                return documento_encontrado
+            caso = _find_mock_case(case_id)
+            documento_encontrado = find_inventory_documento(caso.get("document_inventory") if caso else None, file_id)
+            if documento_encontrado:
+                return documento_encontrado
+        
+        return db_manager.find_documento(case_id, file_id)
+    except Exception as e:
+        print(f"Error buscando documento: {e}")
+        return None
 
 def _get_file_path(documento_encontrado: dict, case_id: str):
     """Helper para obtener la ruta del archivo físico con múltiples estrategias de búsqueda"""
-    file_path = None
-    
     # Prioridad 1: relative_path (ruta relativa desde FILES_DIR)
     if documento_encontrado.get("relative_path"):
         file_path = files_dir / documento_encontrado["relative_path"]
@@ -1717,37 +1586,53 @@ def _get_file_path(documento_encontrado: dict, case_id: str):
     
     # Prioridad 2: file_path relativo desde la carpeta del caso (compatibilidad con datos antiguos)
     if documento_encontrado.get("file_path"):
-        case_dir = example_cases_dir / case_id
-        file_path = case_dir / documento_encontrado["file_path"]
+        file_path = example_cases_dir / case_id / documento_encontrado["file_path"]
         if file_path.exists():
             return file_path
     
-    # Prioridad 3: Buscar por original_name en la carpeta del caso
+    # Prioridad 3: original_name directamente en la carpeta del caso
     original_name = documento_encontrado.get("original_name")
     if original_name:
-        case_dir = example_cases_dir / case_id
-        if case_dir.exists():
-            # Buscar directamente por nombre
-            file_path = case_dir / original_name
-            if file_path.exists():
-                return file_path
-            
-            # Buscar recursivamente en subdirectorios
-            for found_file in case_dir.rglob(original_name):
-                if found_file.is_file():
-                    return found_file
-    
-    # Prioridad 4: Buscar por file_id en la carpeta del caso (último recurso)
-    doc_file_id = documento_encontrado.get("file_id")
-    if doc_file_id:
-        case_dir = example_cases_dir / case_id
-        if case_dir.exists():
-            # Buscar archivos que contengan el file_id en el nombre
-            for found_file in case_dir.rglob("*"):
-                if found_file.is_file() and doc_file_id in found_file.name:
-                    return found_file
+        file_path = example_cases_dir / case_id / original_name
+        if file_path.is_file():
+            _schedule_relative_path_repair(case_id, documento_encontrado, file_path)
+            return file_path
     
-    return None
+    # Prioridad 4: catálogo de archivos del caso (por nombre en subcarpetas, por file_id y por nombre normalizado)
+    file_path = file_catalog.find(case_id, original_name, documento_encontrado.get("file_id"))
+    if file_path:
+        _schedule_relative_path_repair(case_id, documento_encontrado, file_path)
+    return file_path
+
+def _schedule_relative_path_repair(case_id: str, documento: dict, file_path: Path):
+    """Corrige en segundo plano el relative_path de un documento que se encontró por otra vía"""
+    try:
+        relative_path = str(file_path.relative_to(files_dir))
+    except ValueError:
+        return
+    file_id = documento.get("file_id")
+    if not file_id or documento.get("relative_path") == relative_path:
+        return
+    # Documentos que sólo están en el inventario del EDN: no hay fila que corregir
+    if not db_manager.get_documento(case_id, file_id):
+        return
+    key = (case_id, file_id)
+    with _path_repairs_lock:
+        if key in _path_repairs_pending:
+            return
+        _path_repairs_pending.add(key)
+    _path_repair_executor.submit(_repair_relative_path, case_id, file_id, relative_path)
+
+def _repair_relative_path(case_id: str, file_id: str, relative_path: str):
+    """Guarda un relative_path corregido (sólo documentos de la tabla de documentos; los del EDN se dejan igual)"""
+    try:
+        if db_manager.update_documento(case_id, file_id, {"relative_path": relative_path}):
+            logger.info(f"relative_path de {case_id}/{file_id} corregido a {relative_path}")
+    except Exception as e:
+        print(f"Error corrigiendo relative_path de {case_id}/{file_id}: {e}")
+    finally:
+        with _path_repairs_lock:
+            _path_repairs_pending.discard((case_id, file_id))
 
 @router.get("/casos/{case_id}/documentos/{file_id}/preview")
 @router.head("/casos/{case_id}/documentos/{file_id}/preview")
@@ -1755,14 +1640,19 @@ def preview_documento(case_id: str, file_id: str,
                      request: Request,
                      mode: Optional[str] = None,
                      format: Optional[str] = None):
-    """Sirve el archivo del documento para vista previa. Para DOCX, convierte a PDF automáticamente.
-    Soporta tanto GET como HEAD para verificación de existencia."""
+    """Sirve el archivo del documento para vista previa. Para DOCX, sirve la vista previa (PDF, o HTML
+    si no hubo conversor) pre-renderizada al compilar el caso; si no está, la convierte y la guarda.
+    Soporta tanto GET como HEAD para verificación de existencia.
+    
+    La ETag sale del tamaño y mtime del archivo: con If-None-Match y la misma ETag se responde 304
+    sin leerlo (ni convertirlo). Los archivos se sirven con soporte de Range (206), así que un
+    visor de PDF puede pedir sólo las partes que muestra."""
     documento_encontrado = _find_documento(case_id, file_id, request)
     
     if not documento_encontrado:
         import logging
         logger = logging.getLogger(__name__)
-        logger.warning(f"Documento {file_id} no encontrado en documentos.json ni EDN para caso {case_id}")
+        logger.warning(f"Documento {file_id} no encontrado en documentos ni EDN para caso {case_id}")
         raise HTTPException(status_code=404, detail=f"Documento {file_id} no encontrado")
     
     file_path = _get_file_path(documento_encontrado, case_id)
@@ -1774,44 +1664,137 @@ def preview_documento(case_id: str, file_id: str,
         file_path_old = documento_encontrado.get("file_path")
         original_name = documento_encontrado.get("original_name")
         logger.warning(f"Archivo físico no encontrado para documento {file_id}. relative_path: {relative_path}, file_path: {file_path_old}, original_name: {original_name}")
-        
-        # Intentar una búsqueda más exhaustiva como último recurso
-        if original_name:
-            case_dir = example_cases_dir / case_id
-            if case_dir.exists():
-                # Buscar cualquier archivo con un nombre similar
-                all_files = list(case_dir.rglob("*"))
-                similar_files = [f for f in all_files if f.is_file() and original_name.lower() in f.name.lower()]
-                if similar_files:
-                    logger.info(f"Encontrado archivo similar: {similar_files[0]}")
-                    file_path = similar_files[0]
-        
-        if not file_path:
-            raise HTTPException(status_code=404, detail=f"Archivo físico no encontrado para documento {file_id}")
+        raise HTTPException(status_code=404, detail=f"Archivo físico no encontrado para documento {file_id}")
     
-    # Si es HEAD, solo verificar existencia y retornar headers
-    if request.method == "HEAD":
-        from fastapi.responses import Response
-        return Response(status_code=200)
+    etag = _file_etag(file_path)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
     
-    # Si es DOCX, convertir a PDF automáticamente
+    # Si es DOCX, servir su vista previa (PDF, o HTML si no se pudo convertir)
     if file_path.suffix.lower() == '.docx':
-        from src.utils.docx_to_pdf import docx_to_pdf
-        pdf_path = docx_to_pdf(file_path)
-        if pdf_path and pdf_path.exists():
-            return _serve_file(pdf_path, documento_encontrado.get("original_name", "documento.docx").replace('.docx', '.pdf'))
-        else:
-            # Si falla la conversión, intentar HTML como fallback
-            from src.utils.docx_to_html import docx_to_html
-            html_content = docx_to_html(file_path)
-            if html_content:
-                from fastapi.responses import HTMLResponse
-                return HTMLResponse(content=html_content)
+        # Si es HEAD, solo verificar existencia y retornar headers (sin convertir)
+        if request.method == "HEAD":
+            return Response(status_code=200, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        try:
+            # Normalmente ya está en el cache de vistas previas (pre-renderizada al compilar); si no, se convierte ahora
+            preview_path = render_preview(example_cases_dir / case_id, file_path)
+        except OfficeBusyError as e:
+            # Backpressure: la cola de LibreOffice está llena, el cliente reintenta
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        if not preview_path:
             raise HTTPException(status_code=500, detail="No se pudo convertir DOCX a PDF ni HTML")
+        if preview_path.suffix == '.html':
+            from fastapi.responses import HTMLResponse
+            return HTMLResponse(content=preview_path.read_text(encoding="utf-8"), headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return _serve_file(preview_path, documento_encontrado.get("original_name", "documento.docx").replace('.docx', '.pdf'), etag)
+    
+    # FileResponse responde HEAD sólo con headers y atiende Range / If-Range
+    return _serve_file(file_path, documento_encontrado.get("original_name", "documento.pdf"), etag)
+
+def _document_pdf(case_id: str, file_id: str, request: Request):
+    """
+    Archivo de un documento y su PDF (el mismo archivo, o la vista previa si es DOCX)
+    
+    Returns:
+        Tupla (archivo, PDF)
+    
+    Raises:
+        HTTPException: 404 si no existe, 415 si no tiene PDF, 501 sin pypdfium2, 503 con la cola de LibreOffice llena
+    """
+    if not page_renderer.PAGE_RENDERING_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Renderizado de páginas no disponible (instale pypdfium2)")
+    documento_encontrado = _find_documento(case_id, file_id, request)
+    if not documento_encontrado:
+        raise HTTPException(status_code=404, detail=f"Documento {file_id} no encontrado")
+    file_path = _get_file_path(documento_encontrado, case_id)
+    if not file_path:
+        raise HTTPException(status_code=404, detail=f"Archivo físico no encontrado para documento {file_id}")
+    try:
+        pdf_path = pdf_source(example_cases_dir / case_id, file_path)
+    except OfficeBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if pdf_path is None:
+        raise HTTPException(status_code=415, detail=f"El documento {file_id} no tiene páginas para renderizar")
+    return file_path, pdf_path
+
+@router.get("/casos/{case_id}/documentos/{file_id}/paginas")
+def get_documento_paginas(case_id: str, file_id: str, request: Request):
+    """
+    Número de páginas de un documento (PDF o DOCX), para armar las miniaturas
+    """
+    _, pdf_path = _document_pdf(case_id, file_id, request)
+    try:
+        return {"file_id": file_id, "page_count": page_renderer.page_count(pdf_path)}
+    except PageRenderError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/casos/{case_id}/documentos/{file_id}/paginas/{page_index}")
+def get_documento_pagina(case_id: str, file_id: str, page_index: int,
+                         request: Request,
+                         dpi: Optional[int] = None,
+                         thumbnail: bool = False,
+                         format: str = "png",
+                         mode: Optional[str] = None):
+    """
+    Imagen de una página de un documento (page_index desde 0, como en evidence_data)
+    
+    Sirve para abrir la evidencia de un ítem del checklist o mostrar miniaturas sin descargar el
+    PDF completo. Las páginas se guardan en un cache en disco; las primeras de los documentos
+    críticos ya se renderizan al compilar el caso.
     
-    return _serve_file(file_path, documento_encontrado.get("original_name", "documento.pdf"))
+    Args:
+        dpi: Resolución (por defecto PAGE_RENDER_DPI, o PAGE_THUMBNAIL_DPI con thumbnail=true)
+        thumbnail: Miniatura en vez de página completa
+        format: 'png' o 'jpeg'
+    """
+    if format not in page_renderer.IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}. Use: {', '.join(page_renderer.IMAGE_FORMATS)}")
+    file_path, pdf_path = _document_pdf(case_id, file_id, request)
+    dpi = page_renderer.clamp_dpi(dpi or (PAGE_THUMBNAIL_DPI if thumbnail else PAGE_RENDER_DPI))
+    
+    etag = _etag(_file_etag(file_path), page_index, dpi, format)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    try:
+        image_path = page_renderer.render_page(pdf_path, page_index, dpi, format)
+    except PageOutOfRangeError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PageRenderError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return FileResponse(
+        str(image_path),
+        media_type=page_renderer.IMAGE_FORMATS[format][2],
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
 
-def _serve_file(file_path: Path, filename: str) -> FileResponse:
+@router.get("/conversiones/stats")
+def get_conversion_stats():
+    """
+    Estado del servicio de conversión de DOCX a PDF (LibreOffice headless) de este worker
+    
+    Incluye la profundidad de la cola, workers ocupados, contadores (convertidos, fallidos,
+    timeouts, rechazados por cola llena, pedidos combinados) y latencias en ms (p50, p95, máx).
+    En "cache", los aciertos, fallos y desalojos del cache de PDFs convertidos (ver preview_cache);
+    en "pages", los del cache de páginas renderizadas (ver page_renderer).
+    """
+    stats = get_office_converter().stats()
+    stats["cache"] = get_preview_cache().stats()
+    stats["pages"] = page_renderer.get_page_cache().stats()
+    return stats
+
+def _file_etag(file_path: Path) -> str:
+    """
+    ETag de un archivo por su tamaño y mtime (sin leerlo)
+    
+    Es fuerte (sirve para If-Range) salvo para DOCX: el PDF convertido no es byte a byte
+    el mismo entre conversiones.
+    """
+    stat = file_path.stat()
+    if file_path.suffix.lower() == '.docx':
+        return _etag("docx", stat.st_size, stat.st_mtime_ns)
+    return _etag(stat.st_size, stat.st_mtime_ns, weak=False)
+
+def _serve_file(file_path: Path, filename: str, etag: Optional[str] = None) -> FileResponse:
     """Helper para servir archivos con el MIME type correcto"""
     suffix = file_path.suffix.lower()
     
@@ -1830,12 +1813,17 @@ def _serve_file(file_path: Path, filename: str) -> FileResponse:
     
     media_type = mime_types.get(suffix, 'application/octet-stream')
     
+    headers = {
+        "Content-Disposition": f'inline; filename="{filename}"'
+    }
+    if etag:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+    
     return FileResponse(
         str(file_path),
         media_type=media_type,
         filename=filename,
-        headers={
-            "Content-Disposition": f'inline; filename="{filename}"'
-        }
+        headers=headers
     )
 
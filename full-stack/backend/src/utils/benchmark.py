@@ -0,0 +1,16 @@
+"""
+Utilidades comunes de los scripts de benchmark (benchmark_storage, benchmark_serialization)
+"""
+
+import time
+from typing import Callable, List
+
+
+def timed(fn: Callable, repeat: int = 1) -> List[float]:
+    """Ejecuta fn repeat veces y retorna los tiempos en milisegundos"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
@@ -0,0 +1,78 @@
+"""
+Benchmark de la capa de serialización (json estándar vs src.utils.serialization)
+Usa el corpus sintético de benchmark_storage y mide lectura, escritura y render de respuestas
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio backend al path para imports
+# Este script está en: full-stack/backend/src/utils/benchmark_serialization.py
+backend_dir = Path(__file__).resolve().parent.parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from fastapi.responses import JSONResponse
+
+from src.database.benchmark_storage import build_corpus
+from src.utils.benchmark import timed
+from src.utils import serialization
+from src.utils.serialization import FastJSONResponse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara json estándar con la capa de serialización del backend")
+    parser.add_argument("--cases", type=int, default=10000, help="Casos del corpus sintético (default: 10000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición; se informa la mejor (default: 3)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = Path(tmp) / "json"
+        print(f"Generando corpus sintético de {args.cases} casos...")
+        build_corpus(corpus_dir, args.cases)
+        edn_path = corpus_dir / "edn.json"
+        
+        def stdlib_load():
+            with open(edn_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        
+        edns = stdlib_load()
+        summaries = [
+            {"case_id": case_id, "client_name": edn.get("unified_context", {}).get("client_name"),
+             "materia": edn.get("materia"), "monto_disputa": edn.get("monto_disputa"), "status": "PENDIENTE"}
+            for case_id, edn in edns.items()
+        ]
+        one_edn = next(iter(edns.values()))
+        
+        pretty_path = Path(tmp) / "pretty.json"
+        compact_path = Path(tmp) / "compact.json"
+        
+        def stdlib_dump():
+            with open(pretty_path, "w", encoding="utf-8") as f:
+                json.dump(edns, f, indent=2, ensure_ascii=False)
+        
+        def best(fn):
+            return min(timed(fn, repeat=args.repeat))
+        
+        rows = [
+            ("carga edn.json (ms)", best(stdlib_load), best(lambda: serialization.load_file(edn_path))),
+            ("escritura edn.json (ms)", best(stdlib_dump),
+             best(lambda: serialization.dump_file(compact_path, edns))),
+            ("respuesta GET /casos (ms)", best(lambda: JSONResponse(summaries)),
+             best(lambda: FastJSONResponse(summaries))),
+            ("respuesta GET /casos/{id} (ms)", best(lambda: JSONResponse(one_edn)),
+             best(lambda: FastJSONResponse(one_edn))),
+        ]
+        sizes = (pretty_path.stat().st_size / (1024 * 1024), compact_path.stat().st_size / (1024 * 1024))
+    
+    print(f"\n{'Operación':<34}{'json (indent=2)':>18}{serialization.BACKEND + ' (compacto)':>22}")
+    for metric, stdlib_value, fast_value in rows:
+        print(f"{metric:<34}{stdlib_value:>18.2f}{fast_value:>22.2f}")
+    print(f"{'tamaño edn.json (MB)':<34}{sizes[0]:>18.2f}{sizes[1]:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Índice LRU en memoria de un cache en disco, con desalojo por tamaño total
+Lo comparten el cache de vistas previas, el de páginas y el de extracción
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+# Al superar el tamaño máximo se libera espacio hasta esta fracción, para no desalojar en cada escritura
+EVICTION_TARGET = 0.9
+
+
+class DiskLRU:
+    """
+    Archivos de un directorio de cache, del menos al más usado recientemente, con su tamaño.
+    
+    El directorio se recorre una sola vez (al primer uso) y el índice se mantiene en cada
+    acierto (touch), escritura (add) y desalojo, así que ni el desalojo ni el tamaño total
+    vuelven a recorrerlo. El mtime de cada archivo se actualiza en cada acierto, para que el
+    índice de otro proceso arranque con el mismo orden; los archivos que guardan otros procesos
+    se agregan al encontrarlos.
+    """
+    
+    def __init__(self, root: Path, pattern: str, max_bytes: int, prune_dirs: bool = False):
+        """
+        Args:
+            root: Directorio del cache
+            pattern: Patrón (rglob) de los archivos del cache dentro de root
+            max_bytes: Tamaño máximo en bytes (0 = sin límite)
+            prune_dirs: Si True, al desalojar un archivo se borra también su carpeta si queda vacía
+        """
+        self.root = root
+        self.pattern = pattern
+        self.max_bytes = max_bytes
+        self.prune_dirs = prune_dirs
+        self.evictions = 0
+        self._total_bytes = 0
+        # Ruta -> tamaño, del menos al más usado recientemente (None = sin construir)
+        self._entries: Optional["OrderedDict[Path, int]"] = None
+        self._lock = threading.Lock()
+    
+    def _index(self) -> "OrderedDict[Path, int]":
+        """Índice (con self._lock tomado); la primera vez recorre el directorio"""
+        if self._entries is None:
+            entries = []
+            for path in self.root.rglob(self.pattern):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, str(path), stat.st_size))
+            entries.sort()
+            self._entries = OrderedDict((Path(path), size) for _, path, size in entries)
+            self._total_bytes = sum(self._entries.values())
+        return self._entries
+    
+    def touch(self, path: Path) -> bool:
+        """
+        Marca un archivo como usado recientemente (mtime e índice)
+        
+        Returns:
+            False si el archivo ya no existe (desalojado, quizás por otro proceso)
+        """
+        with self._lock:
+            entries = self._index()
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self._total_bytes -= entries.pop(path, 0)
+                return False
+            except OSError:
+                if not path.exists():
+                    return False
+            if path in entries:
+                entries.move_to_end(path)
+            else:
+                # Lo guardó otro proceso después de armar el índice
+                try:
+                    entries[path] = path.stat().st_size
+                except OSError:
+                    return True
+                self._total_bytes += entries[path]
+            return True
+    
+    def add(self, path: Path, size: int) -> List[Path]:
+        """
+        Registra un archivo recién escrito (si reemplaza a uno del índice, descuenta el tamaño anterior)
+        y desaloja los menos usados si se supera el tamaño máximo
+        
+        Returns:
+            Archivos desalojados
+        """
+        with self._lock:
+            entries = self._index()
+            self._total_bytes += size - entries.pop(path, 0)
+            entries[path] = size
+            if self.max_bytes and self._total_bytes > self.max_bytes:
+                return self._evict(keep=path)
+            return []
+    
+    def discard(self, path: Path):
+        """Quita un archivo del índice (y del disco)"""
+        with self._lock:
+            self._total_bytes -= self._index().pop(path, 0)
+            path.unlink(missing_ok=True)
+    
+    def _evict(self, keep: Optional[Path] = None) -> List[Path]:
+        """Elimina los archivos menos usados hasta bajar a EVICTION_TARGET del límite (con self._lock tomado)"""
+        entries = self._index()
+        target = int(self.max_bytes * EVICTION_TARGET)
+        evicted = []
+        for path in list(entries):
+            if self._total_bytes <= target:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            self._total_bytes -= entries.pop(path)
+            evicted.append(path)
+            self.evictions += 1
+            if self.prune_dirs:
+                try:
+                    path.parent.rmdir()
+                except OSError:
+                    pass
+        return evicted
+    
+    @property
+    def total_bytes(self) -> int:
+        """Tamaño total de los archivos del índice"""
+        with self._lock:
+            self._index()
+            return self._total_bytes
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index())
@@ -5,14 +5,17 @@ Usa pypandoc (requiere Pandoc instalado) o docx2pdf como fallback
 
 from pathlib import Path
 from typing import Optional
-import tempfile
-import hashlib
+import shutil
 
-def docx_to_pdf(file_path: Path, output_path: Optional[Path] = None) -> Optional[Path]:
+from src.utils.office_converter import OfficeBusyError, get_office_converter
+from src.utils.preview_cache import get_preview_cache, stat_key
+
+def docx_to_pdf(file_path: Path, output_path: Optional[Path] = None,
+                timeout: Optional[float] = None) -> Optional[Path]:
     """
     Convierte un archivo DOCX a PDF para previsualización
     Preserva imágenes y formato
-    Usa caché para evitar reconvertir el mismo archivo
+    Usa caché para evitar reconvertir el mismo archivo (ver preview_cache)
     
     Estrategia de conversión (en orden de prioridad):
     1. LibreOffice headless (funciona en Linux/Windows/Mac)
@@ -22,47 +25,47 @@ def docx_to_pdf(file_path: Path, output_path: Optional[Path] = None) -> Optional
     Args:
         file_path: Ruta al archivo DOCX
         output_path: Ruta donde guardar el PDF (opcional, se crea temporal si no se proporciona)
+        timeout: Segundos máximos de espera a LibreOffice (por defecto OFFICE_WAIT_TIMEOUT)
         
     Returns:
         Ruta al PDF generado o None si hay error
+    
+    Raises:
+        OfficeBusyError: Si la cola de conversión de LibreOffice está llena o no responde a tiempo (reintentar más tarde)
     """
     try:
-        # Crear directorio de caché
-        cache_dir = Path(tempfile.gettempdir()) / "docx_previews_cache"
-        cache_dir.mkdir(exist_ok=True)
-        
-        # Generar hash del archivo para caché
-        file_hash = _get_file_hash(file_path)
-        cached_pdf = cache_dir / f"{file_hash}.pdf"
-        
-        # Si existe en caché y es más reciente que el original, usarlo
-        if cached_pdf.exists() and cached_pdf.stat().st_mtime >= file_path.stat().st_mtime:
-            return cached_pdf
-        
-        pdf_path = None
-        
-        # Estrategia 1: LibreOffice headless (mejor para Linux)
-        pdf_path = _convert_with_libreoffice(file_path, cached_pdf)
-        if pdf_path and pdf_path.exists():
-            if output_path and output_path != pdf_path:
-                import shutil
-                shutil.copy2(pdf_path, output_path)
-                return output_path
-            return pdf_path
-        
-        # Estrategia 2: Pandoc con diferentes motores
-        pdf_path = _convert_with_pypandoc(file_path, cached_pdf)
-        if pdf_path and pdf_path.exists():
-            if output_path and output_path != pdf_path:
-                import shutil
-                shutil.copy2(pdf_path, output_path)
+        # Buscar en caché por (dispositivo, inodo, tamaño, mtime), sin leer el archivo
+        cache = get_preview_cache()
+        # Si no está, el SHA-256 que calculó la búsqueda se reutiliza al guardar (el archivo se lee una vez)
+        cached_pdf, sha256 = cache.lookup(file_path)
+        if cached_pdf is None:
+            work_pdf = cache.work_path(file_path)
+            
+            # Estrategia 1: LibreOffice headless (mejor para Linux)
+            # Pedidos simultáneos del mismo archivo comparten la conversión (misma clave de caché)
+            pdf_path = _convert_with_libreoffice(file_path, work_pdf, key=stat_key(file_path), timeout=timeout)
+            if pdf_path:
+                # Si otro pedido compartió la conversión y ya la guardó, put retorna ese PDF
+                cached_pdf = cache.put(file_path, pdf_path, sha256=sha256)
+            
+            # Estrategia 2: Pandoc con diferentes motores
+            if cached_pdf is None:
+                pdf_path = _convert_with_pypandoc(file_path, work_pdf)
+                if pdf_path and pdf_path.exists():
+                    cached_pdf = cache.put(file_path, pdf_path, sha256=sha256)
+        
+        if cached_pdf is not None:
+            if output_path and output_path != cached_pdf:
+                shutil.copy2(cached_pdf, output_path)
                 return output_path
-            return pdf_path
+            return cached_pdf
         
         # Si todo falla, retornar None (el endpoint usará HTML como fallback)
         print("Warning: No se pudo convertir DOCX a PDF. Se usará HTML como fallback.")
         return None
             
+    except OfficeBusyError:
+        raise
     except Exception as e:
         print(f"Error convirtiendo DOCX a PDF: {e}")
         import traceback
@@ -70,73 +73,23 @@ def docx_to_pdf(file_path: Path, output_path: Optional[Path] = None) -> Optional
         return None
 
 
-def _convert_with_libreoffice(file_path: Path, output_path: Path) -> Optional[Path]:
-    """Convierte DOCX a PDF usando LibreOffice headless (funciona en Linux/Windows/Mac)"""
-    try:
-        import subprocess
-        import sys
-        
-        # Detectar comando de LibreOffice según el sistema
-        if sys.platform == "win32":
-            # Windows: buscar en ubicaciones comunes
-            lo_paths = [
-                r"C:\Program Files\LibreOffice\program\soffice.exe",
-                r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-            ]
-            lo_cmd = None
-            for path in lo_paths:
-                if Path(path).exists():
-                    lo_cmd = path
-                    break
-            if not lo_cmd:
-                return None
-        else:
-            # Linux/Mac: usar comando del sistema
-            lo_cmd = "libreoffice"
-        
-        # Crear directorio de salida si no existe
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Convertir usando LibreOffice headless
-        # --headless: sin interfaz gráfica
-        # --convert-to pdf: convertir a PDF
-        # --outdir: directorio de salida
-        result = subprocess.run(
-            [
-                lo_cmd,
-                "--headless",
-                "--convert-to", "pdf",
-                "--outdir", str(output_path.parent),
-                str(file_path)
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60  # Timeout de 60 segundos
-        )
-        
-        # LibreOffice genera el PDF con el mismo nombre que el DOCX
-        expected_pdf = output_path.parent / f"{file_path.stem}.pdf"
-        
-        if result.returncode == 0 and expected_pdf.exists():
-            # Renombrar al nombre esperado si es diferente
-            if expected_pdf != output_path:
-                import shutil
-                shutil.move(str(expected_pdf), str(output_path))
-            return output_path
-        else:
-            if result.stderr:
-                print(f"LibreOffice error: {result.stderr}")
-            return None
-            
-    except FileNotFoundError:
+def _convert_with_libreoffice(file_path: Path, output_path: Path, key: Optional[str] = None,
+                              timeout: Optional[float] = None) -> Optional[Path]:
+    """
+    Convierte DOCX a PDF con el servicio de LibreOffice headless (ver office_converter)
+    
+    Los procesos de office se reutilizan entre conversiones y la cola es acotada, así que
+    varios previews a la vez no lanzan un soffice cada uno. Un request espera a lo más timeout
+    segundos (por defecto OFFICE_WAIT_TIMEOUT) y no lo que tardaría la cola completa.
+    
+    Raises:
+        OfficeBusyError: Si la cola de conversión está llena o no responde a tiempo
+    """
+    converter = get_office_converter()
+    if not converter.available:
         print("LibreOffice no está instalado o no está en PATH")
         return None
-    except subprocess.TimeoutExpired:
-        print("Timeout al convertir con LibreOffice")
-        return None
-    except Exception as e:
-        print(f"Error con LibreOffice: {e}")
-        return None
+    return converter.convert(file_path, output_path, key=key, timeout=timeout)
 
 
 def _convert_with_pypandoc(file_path: Path, output_path: Path) -> Optional[Path]:
@@ -190,15 +143,3 @@ def _convert_with_pypandoc(file_path: Path, output_path: Path) -> Optional[Path]
         print(f"Error con pypandoc: {e}")
         return None
 
-
-def _get_file_hash(file_path: Path) -> str:
-    """Genera un hash del archivo para usar como clave de caché"""
-    hasher = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        # Leer solo los primeros bytes para hash rápido
-        hasher.update(f.read(8192))
-        hasher.update(str(file_path.stat().st_mtime).encode())
-    return hasher.hexdigest()
-
-
-
@@ -1,18 +1,73 @@
+import copy
 import json
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from src.config import MOCK_CASOS_PATH
+from src.utils.serialization import load_file
 from src.models import ExpedienteDigitalNormalizado, CaseStatus
 
-def load_mock_cases() -> Dict[str, Any]:
-    """Carga los casos de prueba desde el archivo mock."""
+# mock_casos.json parseado una sola vez; se vuelve a leer si cambia su mtime o tamaño
+_mock_cache: Dict[str, Any] = {"fingerprint": None, "casos": [], "by_case_id": {}}
+_mock_lock = threading.Lock()
+
+def _mock_casos() -> Dict[str, Any]:
+    """Cache de mock_casos.json, revalidado con un stat por llamada"""
     try:
-        with open(MOCK_CASOS_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        stat = MOCK_CASOS_PATH.stat()
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
     except FileNotFoundError:
-        return {"casos": []}
-    except json.JSONDecodeError:
-        return {"casos": []}
+        fingerprint = None
+    
+    with _mock_lock:
+        if fingerprint != _mock_cache["fingerprint"]:
+            casos = []
+            if fingerprint is not None:
+                try:
+                    casos = load_file(MOCK_CASOS_PATH).get("casos", [])
+                except (FileNotFoundError, json.JSONDecodeError):
+                    casos = []
+            _mock_cache["casos"] = casos
+            by_case_id = {}
+            for caso in casos:
+                # Con case_id repetidos gana el primero, como al recorrer la lista
+                by_case_id.setdefault(caso.get("compilation_metadata", {}).get("case_id"), caso)
+            _mock_cache["by_case_id"] = by_case_id
+            _mock_cache["fingerprint"] = fingerprint
+        return _mock_cache
+
+def load_mock_cases() -> Dict[str, Any]:
+    """
+    Carga los casos de prueba desde el archivo mock.
+    
+    El archivo se parsea una sola vez (se relee si cambia). Cada llamada recibe copias
+    superficiales de los casos: reemplazar claves de primer nivel (p. ej. aplicar cases_store)
+    no altera el cache, pero los objetos anidados son compartidos y no se deben modificar;
+    para eso usar load_mock_case.
+    """
+    return {"casos": [dict(caso) for caso in _mock_casos()["casos"]]}
+
+def load_mock_case(case_id: str, deep: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Un caso de prueba por su case_id
+    
+    Args:
+        case_id: ID del caso
+        deep: Copia profunda (el llamador puede modificar el caso libremente); si es False,
+              copia superficial como en load_mock_cases
+    
+    Returns:
+        Copia del caso o None si no existe
+    """
+    caso = _mock_casos()["by_case_id"].get(case_id)
+    if caso is None:
+        return None
+    return copy.deepcopy(caso) if deep else dict(caso)
+
+def mock_revision() -> str:
+    """Versión de mock_casos.json (mtime y tamaño) para las ETags del modo test"""
+    fingerprint = _mock_casos()["fingerprint"]
+    return f"{fingerprint[0]}-{fingerprint[1]}" if fingerprint else "0"
 
 def determine_case_status(caso: Dict[str, Any]) -> CaseStatus:
     """Determina el estado de un caso basado en su checklist."""
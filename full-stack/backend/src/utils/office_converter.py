@@ -0,0 +1,429 @@
+"""
+Servicio de conversión a PDF con LibreOffice headless
+Mantiene abiertos unos pocos procesos de office, atiende los pedidos desde una cola acotada con
+timeout por trabajo y convierte una sola vez un archivo pedido varias veces a la vez
+"""
+
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+import logging
+
+from src.config import OFFICE_JOB_TIMEOUT, OFFICE_QUEUE_SIZE, OFFICE_WAIT_TIMEOUT, OFFICE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Bindings de LibreOffice (paquete python3-uno): permiten convertir en un proceso ya abierto
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+except ImportError:
+    uno = None
+
+# Latencias que se guardan para los percentiles de stats()
+_LATENCY_SAMPLES = 500
+# Espera máxima a que un proceso de office recién lanzado acepte conexiones
+_STARTUP_TIMEOUT = 30
+
+
+class OfficeBusyError(RuntimeError):
+    """La cola de conversión está llena o no atendió el pedido a tiempo: se debe reintentar más tarde"""
+
+
+def find_soffice() -> Optional[str]:
+    """Ejecutable de LibreOffice, o None si no está instalado"""
+    if sys.platform == "win32":
+        candidates = [
+            r"C:\Program Files\LibreOffice\program\soffice.exe",
+            r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+        ]
+    else:
+        candidates = [shutil.which("soffice"), shutil.which("libreoffice"),
+                      "/Applications/LibreOffice.app/Contents/MacOS/soffice"]
+    return next((path for path in candidates if path and Path(path).exists()), None)
+
+
+def _replace_output(source: Path, output: Path):
+    """Mueve el PDF generado a output sin que otro request vea un archivo a medio copiar"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    partial = output.with_name(f".{output.name}.partial")
+    shutil.move(str(source), str(partial))
+    os.replace(partial, output)
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 1),
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1)
+    }
+
+
+class _Job:
+    __slots__ = ("source", "output", "key", "future", "enqueued_at")
+    
+    def __init__(self, source: Path, output: Path, key: str):
+        self.source = source
+        self.output = output
+        self.key = key
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _OfficeWorker:
+    """
+    Un proceso de office con su propio perfil de usuario.
+    
+    Con los bindings de UNO el proceso queda abierto escuchando en un puerto local y cada trabajo
+    es un documento más (sin arranque en frío). Sin ellos cada trabajo lanza soffice --convert-to,
+    pero sobre el perfil del worker, que ya está inicializado (la primera ejecución lo crea).
+    """
+    
+    def __init__(self, soffice: str, root: Path, index: int):
+        self.soffice = soffice
+        self.profile_dir = root / f"profile_{index}"
+        self.work_dir = root / f"out_{index}"
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.busy = False
+        self._timed_out = False
+    
+    def _base_args(self) -> List[str]:
+        return [self.soffice, f"-env:UserInstallation={self.profile_dir.as_uri()}",
+                "--headless", "--invisible", "--nologo", "--norestore", "--nolockcheck"]
+    
+    def convert(self, source: Path, output: Path, timeout: int):
+        """
+        Convierte source a PDF en output
+        
+        Raises:
+            TimeoutError: Si la conversión tarda más de timeout segundos
+            RuntimeError: Si office no generó el PDF
+        """
+        if uno is not None:
+            self._convert_uno(source, output, timeout)
+        else:
+            self._convert_cli(source, output, timeout)
+    
+    def _convert_cli(self, source: Path, output: Path, timeout: int):
+        try:
+            result = subprocess.run(
+                self._base_args() + ["--convert-to", "pdf", "--outdir", str(self.work_dir), str(source)],
+                capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"Conversión de {source.name} excedió {timeout}s")
+        
+        # LibreOffice genera el PDF con el mismo nombre que el documento
+        generated = self.work_dir / f"{source.stem}.pdf"
+        if result.returncode != 0 or not generated.exists():
+            raise RuntimeError(f"LibreOffice no generó el PDF: {result.stderr.strip()}")
+        _replace_output(generated, output)
+    
+    def _start(self):
+        """Lanza el proceso de office y espera a que acepte conexiones de UNO"""
+        self.stop()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.process = subprocess.Popen(
+            self._base_args() + ["--nodefault",
+                                 f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + _STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+                )
+                break
+            except NoConnectException:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("No se pudo iniciar LibreOffice headless")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        logger.info(f"LibreOffice headless iniciado (pid {self.process.pid}, puerto {port})")
+    
+    def _kill(self):
+        self._timed_out = True
+        self.stop()
+    
+    def _convert_uno(self, source: Path, output: Path, timeout: int):
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        
+        def prop(name: str, value: Any):
+            property_value = PropertyValue()
+            property_value.Name = name
+            property_value.Value = value
+            return property_value
+        
+        generated = self.work_dir / f"{source.stem}.pdf"
+        self._timed_out = False
+        # Si el documento cuelga al proceso, se cierra; la llamada de UNO en curso falla y el
+        # próximo trabajo lanza un proceso nuevo
+        watchdog = threading.Timer(timeout, self._kill)
+        watchdog.start()
+        try:
+            document = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(str(source.resolve())), "_blank", 0,
+                (prop("Hidden", True), prop("ReadOnly", True))
+            )
+            if document is None:
+                raise RuntimeError(f"LibreOffice no pudo abrir {source.name}")
+            try:
+                document.storeToURL(uno.systemPathToFileUrl(str(generated)),
+                                    (prop("FilterName", "writer_pdf_Export"),))
+            finally:
+                document.close(True)
+        except Exception:
+            if self._timed_out:
+                raise TimeoutError(f"Conversión de {source.name} excedió {timeout}s")
+            # Un error de UNO puede dejar el proceso en mal estado: empezar de nuevo
+            self.stop()
+            raise
+        finally:
+            watchdog.cancel()
+        _replace_output(generated, output)
+    
+    def stop(self):
+        """Cierra el proceso de office (si está abierto)"""
+        process, self.process, self.desktop = self.process, None, None
+        if process is not None and process.poll() is None:
+            process.kill()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+
+
+class OfficeConverter:
+    """
+    Cola de conversiones atendida por un grupo fijo de procesos de office.
+    
+    - A lo más `workers` conversiones a la vez, sin importar cuántos requests lleguen.
+    - La cola tiene `queue_size` lugares: con la cola llena submit() lanza OfficeBusyError en
+      vez de acumular trabajo (backpressure).
+    - Cada trabajo tiene `job_timeout` segundos; al vencer se cierra su proceso de office.
+    - Los pedidos con la misma clave (hash del archivo) mientras hay uno en curso reciben
+      el mismo resultado, sin convertir de nuevo.
+    
+    Los procesos se lanzan con el primer pedido. stats() expone la profundidad de la cola y
+    las latencias para monitoreo.
+    """
+    
+    def __init__(self, workers: int = OFFICE_WORKERS, queue_size: int = OFFICE_QUEUE_SIZE,
+                 job_timeout: int = OFFICE_JOB_TIMEOUT, wait_timeout: float = OFFICE_WAIT_TIMEOUT,
+                 soffice: Optional[str] = None):
+        """
+        Args:
+            workers: Procesos de office (conversiones simultáneas)
+            queue_size: Conversiones en espera como máximo
+            job_timeout: Segundos máximos por conversión
+            wait_timeout: Segundos que convert() espera el resultado por defecto
+            soffice: Ejecutable de LibreOffice (None = buscarlo en el sistema)
+        """
+        self.workers = max(1, workers)
+        self.job_timeout = job_timeout
+        self.wait_timeout = wait_timeout
+        self.soffice = soffice or find_soffice()
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._pending: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._office_workers: List[_OfficeWorker] = []
+        self._root: Optional[Path] = None
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._waits: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.counters = {"submitted": 0, "merged": 0, "rejected": 0,
+                         "completed": 0, "failed": 0, "timeouts": 0, "abandoned": 0}
+    
+    @property
+    def available(self) -> bool:
+        """True si LibreOffice está instalado"""
+        return self.soffice is not None
+    
+    def _ensure_started(self):
+        """Lanza los threads de los workers (con self._lock tomado)"""
+        if self._threads:
+            return
+        self._root = Path(tempfile.mkdtemp(prefix="sec_office_"))
+        for index in range(self.workers):
+            office_worker = _OfficeWorker(self.soffice, self._root, index)
+            thread = threading.Thread(target=self._run, args=(office_worker,),
+                                      name=f"office-converter-{index}", daemon=True)
+            self._office_workers.append(office_worker)
+            self._threads.append(thread)
+            thread.start()
+    
+    def submit(self, source: Path, output: Path, key: Optional[str] = None) -> Future:
+        """
+        Encola la conversión de source a PDF en output
+        
+        Args:
+            source: Documento a convertir
+            output: Ruta del PDF
+            key: Identifica el contenido (p. ej. hash del archivo); por defecto la ruta de output
+        
+        Returns:
+            Future con la ruta del PDF, o None si la conversión falló
+        
+        Raises:
+            OfficeBusyError: Si la cola está llena
+        """
+        key = key or str(output)
+        with self._lock:
+            job = self._pending.get(key)
+            if job is not None:
+                self.counters["merged"] += 1
+                return job.future
+            if not self.available:
+                future: Future = Future()
+                future.set_result(None)
+                return future
+            
+            self._ensure_started()
+            job = _Job(source, output, key)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.counters["rejected"] += 1
+                raise OfficeBusyError(f"Cola de conversión llena ({self._queue.maxsize} en espera)")
+            self._pending[key] = job
+            self.counters["submitted"] += 1
+            return job.future
+    
+    @property
+    def max_wait(self) -> float:
+        """
+        Segundos que puede tardar un pedido en el peor caso: los trabajos que caben delante en la
+        cola y en los workers, más el suyo, cada uno con su timeout y el arranque de office
+        
+        Sólo para los pre-renderizados en segundo plano; un request espera wait_timeout.
+        """
+        rounds = -(-(self._queue.maxsize + self.workers) // self.workers)
+        return rounds * (self.job_timeout + _STARTUP_TIMEOUT)
+    
+    def convert(self, source: Path, output: Path, key: Optional[str] = None,
+                timeout: Optional[float] = None) -> Optional[Path]:
+        """
+        Convierte source a PDF y espera el resultado (ver submit)
+        
+        Args:
+            source: Documento a convertir
+            output: Ruta del PDF
+            key: Identifica el contenido (ver submit)
+            timeout: Segundos máximos de espera (por defecto wait_timeout)
+        
+        Returns:
+            Ruta del PDF o None si la conversión falló o LibreOffice no está instalado
+        
+        Raises:
+            OfficeBusyError: Si la cola está llena o el resultado no llega dentro del timeout
+        """
+        future = self.submit(source, output, key)
+        timeout = self.wait_timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # El trabajo sigue en curso: los pedidos con la misma clave que lleguen mientras tanto lo comparten
+            with self._lock:
+                self.counters["abandoned"] += 1
+            raise OfficeBusyError(f"La conversión de {source.name} no terminó en {timeout:.0f}s")
+    
+    def _run(self, office_worker: _OfficeWorker):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            started = time.monotonic()
+            result = None
+            outcome = "failed"
+            office_worker.busy = True
+            try:
+                office_worker.convert(job.source, job.output, self.job_timeout)
+                result = job.output
+                outcome = "completed"
+            except TimeoutError as e:
+                outcome = "timeouts"
+                logger.warning(str(e))
+            except Exception as e:
+                logger.warning(f"Error convirtiendo {job.source.name} con LibreOffice: {e}")
+            finally:
+                office_worker.busy = False
+                finished = time.monotonic()
+                with self._lock:
+                    self.counters[outcome] += 1
+                    self._waits.append((started - job.enqueued_at) * 1000)
+                    self._latencies.append((finished - job.enqueued_at) * 1000)
+                    self._pending.pop(job.key, None)
+                job.future.set_result(result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Estado de la cola y contadores (latencias en ms, desde que el pedido entra a la cola)"""
+        with self._lock:
+            return {
+                "available": self.available,
+                "mode": "uno" if uno is not None else "convert-to",
+                "workers": self.workers,
+                "busy_workers": sum(1 for office_worker in self._office_workers if office_worker.busy),
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "in_flight": len(self._pending),
+                **self.counters,
+                "wait_ms": _percentiles(self._waits),
+                "latency_ms": _percentiles(self._latencies)
+            }
+    
+    def shutdown(self):
+        """Detiene los workers y cierra los procesos de office"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            office_workers, self._office_workers = self._office_workers, []
+        for _ in threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for office_worker in office_workers:
+            office_worker.stop()
+        if self._root is not None:
+            shutil.rmtree(self._root, ignore_errors=True)
+            self._root = None
+
+
+_converter: Optional[OfficeConverter] = None
+_converter_lock = threading.Lock()
+
+
+def get_office_converter() -> OfficeConverter:
+    """Servicio de conversión del proceso (configurado con OFFICE_WORKERS, OFFICE_QUEUE_SIZE y OFFICE_JOB_TIMEOUT)"""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = OfficeConverter()
+            atexit.register(_converter.shutdown)
+        return _converter
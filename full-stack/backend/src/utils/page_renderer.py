@@ -0,0 +1,194 @@
+"""
+Renderizado de páginas de PDF a imagen (páginas y miniaturas) con cache en disco
+Usa pypdfium2 (dependencia de pdfplumber); sin él, el renderizado no está disponible
+"""
+
+import io
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from src.config import (
+    PAGE_CACHE_DIR,
+    PAGE_CACHE_MAX_BYTES,
+    PAGE_RENDER_MAX_DPI,
+    PAGE_RENDER_MIN_DPI
+)
+from src.utils.disk_lru import DiskLRU
+from src.utils.preview_cache import stat_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pypdfium2 as pdfium
+    PAGE_RENDERING_AVAILABLE = True
+except ImportError:
+    pdfium = None
+    PAGE_RENDERING_AVAILABLE = False
+
+# Formatos de imagen: nombre en la URL -> (formato de Pillow, extensión, MIME type)
+IMAGE_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "png": ("PNG", ".png", "image/png"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg")
+}
+
+# pdfium no admite llamadas simultáneas desde varios threads del mismo proceso
+_pdfium_lock = threading.Lock()
+
+
+class PageRenderError(Exception):
+    """El PDF no se puede abrir o no tiene la página pedida"""
+
+
+class PageOutOfRangeError(PageRenderError):
+    """El PDF no tiene la página pedida"""
+
+
+def clamp_dpi(dpi: int) -> int:
+    """Limita la resolución a [PAGE_RENDER_MIN_DPI, PAGE_RENDER_MAX_DPI]"""
+    return max(PAGE_RENDER_MIN_DPI, min(PAGE_RENDER_MAX_DPI, int(dpi)))
+
+
+class PageCache:
+    """
+    Cache en disco de páginas renderizadas.
+    
+    Cada imagen se guarda en {root}/{clave[:2]}/{clave}/p{página}-{dpi}{ext}, donde la clave es
+    stat_key del PDF (dispositivo, inodo, tamaño, mtime): si el PDF cambia, sus páginas se
+    vuelven a renderizar y las anteriores salen del cache por LRU, con el mismo índice en memoria
+    (DiskLRU) que PreviewCache.
+    """
+    
+    def __init__(self, root: Path, max_bytes: int):
+        """
+        Args:
+            root: Directorio del cache
+            max_bytes: Tamaño máximo en bytes (0 = sin límite)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lru = DiskLRU(root, "p*-*", max_bytes, prune_dirs=True)
+        self._lock = threading.Lock()
+    
+    def entry_path(self, pdf_path: Path, page_index: int, dpi: int, fmt: str) -> Path:
+        key = stat_key(pdf_path)
+        return self.root / key[:2] / key / f"p{page_index}-{dpi}{IMAGE_FORMATS[fmt][1]}"
+    
+    def get(self, entry_path: Path) -> bool:
+        """True si la página está en el cache (y la marca como usada recientemente)"""
+        found = self._lru.touch(entry_path)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+    
+    def put(self, entry_path: Path, data: bytes):
+        """Guarda una página renderizada"""
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = entry_path.with_name(f".{entry_path.name}.{uuid.uuid4().hex}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar página en cache {entry_path}: {e}")
+            return
+        self._lru.add(entry_path, len(data))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de este proceso y tamaño actual del cache (según su índice, sin recorrer el directorio)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self._lru.evictions,
+                "entries": len(self._lru),
+                "size_bytes": self._lru.total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """Cache de páginas del proceso (PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES)"""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES)
+        return _page_cache
+
+
+def page_count(pdf_path: Path) -> int:
+    """
+    Número de páginas de un PDF
+    
+    Raises:
+        PageRenderError: Si el PDF no se puede abrir
+    """
+    with _pdfium_lock:
+        try:
+            pdf = pdfium.PdfDocument(str(pdf_path))
+        except Exception as e:
+            raise PageRenderError(f"No se pudo abrir el PDF: {e}")
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def render_page(pdf_path: Path, page_index: int, dpi: int, fmt: str = "png") -> Path:
+    """
+    Imagen de una página de un PDF (del cache, o la renderiza y la guarda)
+    
+    Args:
+        pdf_path: Archivo PDF
+        page_index: Página (desde 0)
+        dpi: Resolución (se limita con clamp_dpi)
+        fmt: Formato de imagen ('png' o 'jpeg', ver IMAGE_FORMATS)
+    
+    Returns:
+        Ruta de la imagen en el cache
+    
+    Raises:
+        PageRenderError: Si el PDF no se puede abrir (PageOutOfRangeError si no tiene esa página)
+    """
+    dpi = clamp_dpi(dpi)
+    cache = get_page_cache()
+    entry_path = cache.entry_path(pdf_path, page_index, dpi, fmt)
+    if cache.get(entry_path):
+        return entry_path
+    
+    pil_format = IMAGE_FORMATS[fmt][0]
+    with _pdfium_lock:
+        try:
+            pdf = pdfium.PdfDocument(str(pdf_path))
+        except Exception as e:
+            raise PageRenderError(f"No se pudo abrir el PDF: {e}")
+        try:
+            if page_index < 0 or page_index >= len(pdf):
+                raise PageOutOfRangeError(f"Página {page_index} fuera de rango (el documento tiene {len(pdf)})")
+            page = pdf[page_index]
+            try:
+                image = page.render(scale=dpi / 72).to_pil()
+            finally:
+                page.close()
+        finally:
+            pdf.close()
+    
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, optimize=True)
+    cache.put(entry_path, buffer.getvalue())
+    return entry_path
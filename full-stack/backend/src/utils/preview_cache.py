@@ -0,0 +1,249 @@
+"""
+Cache persistente de las conversiones de DOCX a PDF para vista previa
+Encuentra el PDF de un archivo con un stat (sin leerlo) y limita el tamaño total con desalojo LRU
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from src.config import PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES
+from src.utils.disk_lru import DiskLRU
+
+logger = logging.getLogger(__name__)
+
+
+def _content_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def stat_key(file_path: Path) -> str:
+    """
+    Clave rápida de un archivo: (dispositivo, inodo, tamaño, mtime)
+    
+    Cambia si el archivo se modifica o se reemplaza, sin leer su contenido.
+    """
+    stat = file_path.stat()
+    raw = f"{stat.st_dev}-{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class PreviewCache:
+    """
+    Cache en disco de PDFs de vista previa.
+    
+    Los PDFs se guardan por SHA-256 del archivo original en {root}/pdf/{sha[:2]}/{sha}.pdf, así que
+    dos copias del mismo DOCX comparten la conversión. Para no leer el DOCX completo en cada
+    vista previa, {root}/keys/{clave[:2]}/{clave} asocia la clave rápida (stat_key) con el SHA-256.
+    Si la clave rápida no está (archivo copiado, restaurado o con otro mtime), el SHA-256 del
+    contenido sirve de segunda búsqueda antes de convertir.
+    
+    El tamaño total se limita con desalojo LRU sobre un índice en memoria de los PDFs (DiskLRU),
+    así que ni el desalojo ni stats() recorren el directorio. Las escrituras son atómicas (archivo
+    temporal + rename), por lo que varios workers pueden compartir el directorio.
+    """
+    
+    def __init__(self, root: Path, max_bytes: int):
+        """
+        Args:
+            root: Directorio del cache
+            max_bytes: Tamaño máximo en bytes (0 = sin límite)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        self._keys: Dict[str, str] = {}
+        self._lru = DiskLRU(root / "pdf", "*.pdf", max_bytes)
+        self._lock = threading.Lock()
+    
+    def _pdf_path(self, sha256: str) -> Path:
+        return self.root / "pdf" / sha256[:2] / f"{sha256}.pdf"
+    
+    def _key_path(self, key: str) -> Path:
+        return self.root / "keys" / key[:2] / key
+    
+    def work_path(self, file_path: Path) -> Path:
+        """
+        Ruta donde convertir un archivo antes de guardarlo con put()
+        
+        Es la misma para pedidos simultáneos del mismo archivo, que comparten la conversión.
+        """
+        work_dir = self.root / "tmp"
+        work_dir.mkdir(parents=True, exist_ok=True)
+        return work_dir / f"{stat_key(file_path)}.pdf"
+    
+    def _read_key(self, key: str) -> Optional[str]:
+        sha256 = self._keys.get(key)
+        if sha256 is None:
+            try:
+                sha256 = self._key_path(key).read_text(encoding="utf-8").strip()
+            except OSError:
+                return None
+            self._keys[key] = sha256
+        return sha256
+    
+    def _write_key(self, key: str, sha256: str):
+        key_path = self._key_path(key)
+        try:
+            key_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = key_path.with_name(f".{key}.{uuid.uuid4().hex}.tmp")
+            tmp_path.write_text(sha256, encoding="utf-8")
+            os.replace(tmp_path, key_path)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir clave de cache {key_path}: {e}")
+        self._keys[key] = sha256
+    
+    def _touch(self, sha256: str) -> Optional[Path]:
+        """
+        Marca un PDF como usado recientemente (ver DiskLRU.touch)
+        
+        Returns:
+            Ruta del PDF, o None si ya no existe (desalojado, quizás por otro proceso)
+        """
+        pdf_path = self._pdf_path(sha256)
+        return pdf_path if self._lru.touch(pdf_path) else None
+    
+    def _get_by_key(self, key: str) -> Optional[Path]:
+        """PDF registrado para una clave rápida (con self._lock tomado), o None"""
+        sha256 = self._read_key(key)
+        if sha256 is None:
+            return None
+        pdf_path = self._touch(sha256)
+        if pdf_path is not None:
+            return pdf_path
+        # El PDF fue desalojado: la clave ya no sirve
+        self._keys.pop(key, None)
+        self._key_path(key).unlink(missing_ok=True)
+        return None
+    
+    def peek(self, file_path: Path) -> Optional[Path]:
+        """
+        PDF de vista previa de un archivo sólo por su clave rápida: no lee el archivo ni cuenta en stats()
+        
+        Returns:
+            Ruta del PDF en el cache o None si la clave rápida no está
+        """
+        try:
+            key = stat_key(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            return self._get_by_key(key)
+    
+    def lookup(self, file_path: Path) -> Tuple[Optional[Path], Optional[str]]:
+        """
+        PDF de vista previa de un archivo y SHA-256 de su contenido
+        
+        Args:
+            file_path: Archivo original
+        
+        Returns:
+            (ruta del PDF en el cache o None si no está, SHA-256 del archivo o None si no se pudo
+            leer). Si no está, el SHA-256 se pasa a put() para no volver a leer el archivo.
+        """
+        key = stat_key(file_path)
+        with self._lock:
+            sha256 = self._read_key(key)
+            pdf_path = self._get_by_key(key)
+            if pdf_path is not None:
+                self.hits += 1
+                return pdf_path, sha256
+        
+        # Segunda búsqueda por contenido (lee el archivo una vez y deja registrada la clave rápida)
+        try:
+            sha256 = _content_hash(file_path)
+        except OSError:
+            sha256 = None
+        with self._lock:
+            if sha256 is not None:
+                pdf_path = self._touch(sha256)
+                if pdf_path is not None:
+                    self._write_key(key, sha256)
+                    self.content_hits += 1
+                    return pdf_path, sha256
+            self.misses += 1
+            return None, sha256
+    
+    def get(self, file_path: Path) -> Optional[Path]:
+        """
+        PDF de vista previa de un archivo (ver lookup)
+        
+        Returns:
+            Ruta del PDF en el cache o None si no está
+        """
+        return self.lookup(file_path)[0]
+    
+    def put(self, file_path: Path, pdf_path: Path, sha256: Optional[str] = None) -> Optional[Path]:
+        """
+        Guarda en el cache el PDF convertido de un archivo (lo mueve, no lo copia)
+        
+        Args:
+            file_path: Archivo original
+            pdf_path: PDF convertido (normalmente en work_path(file_path))
+            sha256: SHA-256 del archivo original, si ya se calculó (ver lookup)
+        
+        Returns:
+            Ruta del PDF en el cache, o None si no se pudo guardar
+        """
+        key = stat_key(file_path)
+        if sha256 is None:
+            sha256 = _content_hash(file_path)
+        cached_pdf = self._pdf_path(sha256)
+        with self._lock:
+            try:
+                cached_pdf.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(pdf_path, cached_pdf)
+            except FileNotFoundError:
+                # Otro pedido que compartía la conversión ya lo guardó
+                return self._touch(sha256)
+            except OSError as e:
+                logger.warning(f"No se pudo guardar vista previa en cache {cached_pdf}: {e}")
+                return None
+            self._write_key(key, sha256)
+            
+            evicted = {pdf.stem for pdf in self._lru.add(cached_pdf, cached_pdf.stat().st_size)}
+            if evicted:
+                # Las claves de otros procesos se descartan cuando se buscan y su PDF ya no está
+                for known_key, known_sha256 in list(self._keys.items()):
+                    if known_sha256 in evicted:
+                        del self._keys[known_key]
+                        self._key_path(known_key).unlink(missing_ok=True)
+        return cached_pdf
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de este proceso y tamaño actual del cache (según su índice, sin recorrer el directorio)"""
+        with self._lock:
+            lookups = self.hits + self.content_hits + self.misses
+            return {
+                "hits": self.hits,
+                "content_hits": self.content_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.content_hits) / lookups if lookups else 0.0,
+                "evictions": self._lru.evictions,
+                "entries": len(self._lru),
+                "size_bytes": self._lru.total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+_preview_cache: Optional[PreviewCache] = None
+_preview_cache_lock = threading.Lock()
+
+
+def get_preview_cache() -> PreviewCache:
+    """Cache de vistas previas del proceso (PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)"""
+    global _preview_cache
+    with _preview_cache_lock:
+        if _preview_cache is None:
+            _preview_cache = PreviewCache(PREVIEW_CACHE_DIR, PREVIEW_CACHE_MAX_BYTES)
+        return _preview_cache
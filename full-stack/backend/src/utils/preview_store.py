@@ -0,0 +1,329 @@
+"""
+Vistas previas pre-renderizadas de los documentos de un caso
+Los DOCX se convierten al compilar el caso: el PDF queda en el cache de vistas previas (ver
+PreviewCache, con tamaño limitado) y sólo el HTML de respaldo, si no hay conversor, en la carpeta
+oculta .previews/ del caso; la vista previa sirve ese archivo sin convertir en el request.
+Las primeras páginas de los documentos críticos se renderizan a imagen (ver page_renderer)
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+import logging
+
+from src.config import PAGE_RENDER_DPI, PAGE_THUMBNAIL_DPI
+from src.utils.office_converter import OfficeBusyError, get_office_converter
+from src.utils.preview_cache import get_preview_cache
+from src.utils import page_renderer
+
+logger = logging.getLogger(__name__)
+
+# Carpeta de las vistas previas dentro de la carpeta del caso (oculta: el OMC y el catálogo de archivos la ignoran)
+PREVIEWS_DIRNAME = ".previews"
+# Extensiones que se pre-renderizan
+PRERENDERED_SUFFIXES = (".docx",)
+# Reintentos (con pausa de algunos segundos) si la cola de LibreOffice está llena
+_BUSY_RETRIES = 5
+# Marca (en la carpeta de casos) de que ya se borraron los PDFs de .previews/ de versiones anteriores
+_LEGACY_PDFS_MARKER = ".previews_pdf_removed"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_scheduled: List[Future] = []
+
+
+def _artifact_prefix(case_folder: Path, source: Path) -> Optional[str]:
+    """Prefijo de las vistas previas de un archivo (hash de su ruta relativa), o None si está fuera del caso"""
+    try:
+        rel_path = source.resolve().relative_to(case_folder.resolve())
+    except ValueError:
+        return None
+    return hashlib.sha1(rel_path.as_posix().encode("utf-8")).hexdigest()[:16]
+
+
+def _artifact_stem(case_folder: Path, source: Path) -> Optional[str]:
+    """
+    Nombre (sin extensión) de la vista previa de la versión actual de un archivo
+    
+    Incluye el tamaño y mtime del archivo: si cambia, el nombre cambia y la vista previa anterior
+    deja de encontrarse (no hay que comparar fechas).
+    """
+    prefix = _artifact_prefix(case_folder, source)
+    if prefix is None:
+        return None
+    stat = source.stat()
+    version = hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:8]
+    return f"{prefix}-{version}"
+
+
+def find_preview(case_folder: Path, source: Path) -> Optional[Path]:
+    """
+    Vista previa ya renderizada de la versión actual de un archivo
+    
+    Args:
+        case_folder: Carpeta del caso
+        source: Archivo original (dentro de case_folder)
+    
+    Returns:
+        Ruta del PDF en el cache de vistas previas (o del HTML de .previews/ si no se pudo
+        convertir a PDF), o None si no hay
+    """
+    cached_pdf = get_preview_cache().peek(source)
+    if cached_pdf is not None:
+        return cached_pdf
+    try:
+        stem = _artifact_stem(case_folder, source)
+    except OSError:
+        return None
+    if stem is None:
+        return None
+    artifact = case_folder / PREVIEWS_DIRNAME / f"{stem}.html"
+    return artifact if artifact.is_file() else None
+
+
+def _store(previews_dir: Path, name: str, data: bytes) -> Path:
+    """Escribe una vista previa sin que un request concurrente lea un archivo a medio escribir"""
+    previews_dir.mkdir(parents=True, exist_ok=True)
+    artifact = previews_dir / name
+    partial = previews_dir / f".{name}.partial"
+    partial.write_bytes(data)
+    os.replace(partial, artifact)
+    return artifact
+
+
+def render_preview(case_folder: Path, source: Path, timeout: Optional[float] = None) -> Optional[Path]:
+    """
+    Vista previa de un archivo: la ya renderizada o, si no hay, la convierte y la guarda
+    
+    Los DOCX se convierten con docx_to_pdf, que deja el PDF en el cache de vistas previas (no se
+    copia a .previews/); si falla, con docx_to_html. Los HTML de versiones anteriores del mismo
+    archivo se borran.
+    
+    Args:
+        case_folder: Carpeta del caso
+        source: Archivo original
+        timeout: Segundos máximos de espera a LibreOffice (por defecto OFFICE_WAIT_TIMEOUT)
+    
+    Returns:
+        Ruta de la vista previa, o None si no se pudo convertir
+    
+    Raises:
+        OfficeBusyError: Si la cola de conversión de LibreOffice está llena o no responde a tiempo
+    """
+    existing = find_preview(case_folder, source)
+    if existing is not None:
+        return existing
+    
+    from src.utils.docx_to_pdf import docx_to_pdf
+    stem = _artifact_stem(case_folder, source)
+    pdf_path = docx_to_pdf(source, timeout=timeout)
+    if stem is None:
+        # Fuera de la carpeta del caso: sólo la conversión (cache de docx_to_pdf)
+        return pdf_path if pdf_path and pdf_path.exists() else None
+    
+    previews_dir = case_folder / PREVIEWS_DIRNAME
+    if pdf_path and pdf_path.exists():
+        artifact = pdf_path
+        keep = None
+    else:
+        from src.utils.docx_to_html import docx_to_html
+        html_content = docx_to_html(source)
+        if not html_content:
+            return None
+        artifact = _store(previews_dir, f"{stem}.html", html_content.encode("utf-8"))
+        keep = artifact.name
+    
+    # Descartar las vistas previas de versiones anteriores del archivo
+    prefix = stem.split("-")[0]
+    for old in previews_dir.glob(f"{prefix}-*"):
+        if old.name != keep:
+            old.unlink(missing_ok=True)
+    return artifact
+
+
+def pdf_source(case_folder: Path, source: Path, timeout: Optional[float] = None) -> Optional[Path]:
+    """
+    PDF de un documento: el mismo archivo si es PDF, su vista previa si es un DOCX convertido a PDF
+    
+    Args:
+        timeout: Segundos máximos de espera a LibreOffice (ver render_preview)
+    
+    Returns:
+        Ruta del PDF, o None si el documento no tiene uno (imagen, DOCX convertido sólo a HTML)
+    
+    Raises:
+        OfficeBusyError: Si hay que convertir el DOCX y la cola de LibreOffice está llena
+    """
+    suffix = source.suffix.lower()
+    if suffix == ".pdf":
+        return source
+    if suffix in PRERENDERED_SUFFIXES:
+        preview = render_preview(case_folder, source, timeout=timeout)
+        if preview is not None and preview.suffix == ".pdf":
+            return preview
+    return None
+
+
+def _render_in_background(case_folder: Path, source: Path):
+    for attempt in range(_BUSY_RETRIES + 1):
+        try:
+            # Fuera de un request se puede esperar a que pase toda la cola
+            render_preview(case_folder, source, timeout=get_office_converter().max_wait)
+            return
+        except OfficeBusyError:
+            # La cola de LibreOffice la están usando los requests: esperar y reintentar
+            time.sleep(2 * (attempt + 1))
+        except Exception as e:
+            logger.warning(f"Error pre-renderizando vista previa de {source.name}: {e}")
+            return
+    logger.warning(f"Vista previa de {source.name} no pre-renderizada: cola de conversión ocupada")
+
+
+def _submit(jobs: List[tuple]):
+    """Encola trabajos (función, *args) en el thread de renderizado, en orden"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview-render")
+        _scheduled[:] = [future for future in _scheduled if not future.done()]
+        for fn, *args in jobs:
+            _scheduled.append(_executor.submit(fn, *args))
+
+
+def schedule_previews(case_folder: Path, files: Iterable[Path]) -> int:
+    """
+    Encola en segundo plano la vista previa de los archivos que no la tienen
+    
+    Las conversiones corren una a la vez en un thread aparte, así que el caso siguiente se
+    procesa mientras tanto. Ver wait_previews.
+    
+    Args:
+        case_folder: Carpeta del caso
+        files: Archivos del caso (se consideran los de PRERENDERED_SUFFIXES)
+    
+    Returns:
+        Número de vistas previas encoladas
+    """
+    pending = [
+        source for source in files
+        if source.suffix.lower() in PRERENDERED_SUFFIXES and find_preview(case_folder, source) is None
+    ]
+    if not pending:
+        return 0
+    _submit([(_render_in_background, case_folder, source) for source in pending])
+    logger.info(f"{len(pending)} vistas previas encoladas para {case_folder.name}")
+    return len(pending)
+
+
+def remove_legacy_pdf_previews(cases_dir: Path) -> int:
+    """
+    Borra los PDFs que versiones anteriores copiaban a .previews/ (ahora viven sólo en el cache
+    de vistas previas)
+    
+    Recorre las carpetas de los casos una sola vez: al terminar deja una marca en cases_dir.
+    
+    Args:
+        cases_dir: Carpeta con las carpetas de los casos
+    
+    Returns:
+        Número de PDFs borrados
+    """
+    marker = cases_dir / _LEGACY_PDFS_MARKER
+    if marker.exists() or not cases_dir.is_dir():
+        return 0
+    removed = 0
+    for legacy_pdf in cases_dir.glob(f"*/{PREVIEWS_DIRNAME}/*.pdf"):
+        legacy_pdf.unlink(missing_ok=True)
+        removed += 1
+    marker.touch()
+    return removed
+
+
+def _render_pages(case_folder: Path, source: Path, pages: int):
+    """Renderiza las primeras páginas de un documento como página y como miniatura"""
+    for attempt in range(_BUSY_RETRIES + 1):
+        try:
+            pdf_path = pdf_source(case_folder, source, timeout=get_office_converter().max_wait)
+            break
+        except OfficeBusyError:
+            time.sleep(2 * (attempt + 1))
+        except Exception as e:
+            logger.warning(f"Error obteniendo PDF de {source.name}: {e}")
+            return
+    else:
+        logger.warning(f"Páginas de {source.name} no pre-renderizadas: cola de conversión ocupada")
+        return
+    if pdf_path is None:
+        return
+    try:
+        for page_index in range(min(pages, page_renderer.page_count(pdf_path))):
+            for dpi in (PAGE_RENDER_DPI, PAGE_THUMBNAIL_DPI):
+                page_renderer.render_page(pdf_path, page_index, dpi)
+    except Exception as e:
+        logger.warning(f"Error pre-renderizando páginas de {source.name}: {e}")
+
+
+def _pages_missing(case_folder: Path, source: Path) -> bool:
+    """True si falta la primera página renderizada del documento (sin convertir ni renderizar nada)"""
+    suffix = source.suffix.lower()
+    if suffix == ".pdf":
+        pdf_path = source
+    elif suffix in PRERENDERED_SUFFIXES:
+        pdf_path = find_preview(case_folder, source)
+        if pdf_path is None:
+            return True
+        if pdf_path.suffix != ".pdf":
+            return False
+    else:
+        return False
+    cache = page_renderer.get_page_cache()
+    return any(
+        not cache.entry_path(pdf_path, 0, page_renderer.clamp_dpi(dpi), "png").exists()
+        for dpi in (PAGE_RENDER_DPI, PAGE_THUMBNAIL_DPI)
+    )
+
+
+def schedule_pages(case_folder: Path, files: Iterable[Path], pages: int) -> int:
+    """
+    Encola en segundo plano el renderizado de las primeras páginas de los documentos indicados
+    
+    Usa el mismo thread que schedule_previews, así que un DOCX se renderiza después de convertirse.
+    
+    Args:
+        case_folder: Carpeta del caso
+        files: Documentos (PDF o DOCX; los demás se ignoran)
+        pages: Páginas por documento, como página (PAGE_RENDER_DPI) y miniatura (PAGE_THUMBNAIL_DPI)
+    
+    Returns:
+        Número de documentos encolados
+    """
+    if pages <= 0 or not page_renderer.PAGE_RENDERING_AVAILABLE:
+        return 0
+    pending = [source for source in files if source.is_file() and _pages_missing(case_folder, source)]
+    if not pending:
+        return 0
+    _submit([(_render_pages, case_folder, source, pages) for source in pending])
+    logger.info(f"Páginas de {len(pending)} documentos críticos encoladas para {case_folder.name}")
+    return len(pending)
+
+
+def wait_previews(timeout: Optional[float] = None) -> int:
+    """
+    Espera a que terminen las vistas previas y páginas encoladas
+    
+    Returns:
+        Número de trabajos que se esperaron
+    """
+    with _executor_lock:
+        futures = list(_scheduled)
+        _scheduled.clear()
+    for future in futures:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+    return len(futures)
@@ -1,5 +1,6 @@
 """
 Utilidad para generar PDF de resolución con template
+El PDF se arma en memoria; las previsualizaciones se guardan en un cache LRU por contenido
 """
 
 from reportlab.lib.pagesizes import letter, A4
@@ -9,33 +10,49 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime
+import hashlib
+import io
+import json
 import re
+import threading
 
-def generate_resolucion_pdf(resolucion_content: str, case_id: str, output_path: Path, 
-                           client_name: str = "N/A", rut_client: str = "N/A", 
-                           empresa: str = "N/A", materia: str = "N/A") -> bool:
+from src.config import RESOLUCION_PREVIEW_CACHE_SIZE
+
+# Previsualizaciones recientes: hash de los datos -> (case_id, bytes del PDF)
+_preview_cache: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
+
+def _fecha_actual() -> str:
+    return datetime.now().strftime("%d de %B de %Y").replace("January", "enero").replace("February", "febrero").replace("March", "marzo").replace("April", "abril").replace("May", "mayo").replace("June", "junio").replace("July", "julio").replace("August", "agosto").replace("September", "septiembre").replace("October", "octubre").replace("November", "noviembre").replace("December", "diciembre")
+
+
+def render_resolucion_pdf(resolucion_content: str, case_id: str,
+                          client_name: str = "N/A", rut_client: str = "N/A",
+                          empresa: str = "N/A", materia: str = "N/A") -> Optional[bytes]:
     """
-    Genera un PDF de resolución con template formal
+    Genera en memoria un PDF de resolución con template formal
     
     Args:
         resolucion_content: Contenido de la resolución
         case_id: ID del caso
-        output_path: Ruta donde guardar el PDF
         client_name: Nombre del cliente
         rut_client: RUT del cliente
         empresa: Nombre de la empresa
         materia: Materia del caso
         
     Returns:
-        True si se generó correctamente, False en caso contrario
+        Bytes del PDF, o None si hubo un error
     """
     try:
         # Crear documento PDF
+        buffer = io.BytesIO()
         doc = SimpleDocTemplate(
-            str(output_path),
+            buffer,
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
@@ -91,7 +108,7 @@ def generate_resolucion_pdf(resolucion_content: str, case_id: str, output_path:
         story.append(Spacer(1, 0.3*inch))
         
         # Fecha
-        fecha_actual = datetime.now().strftime("%d de %B de %Y").replace("January", "enero").replace("February", "febrero").replace("March", "marzo").replace("April", "abril").replace("May", "mayo").replace("June", "junio").replace("July", "julio").replace("August", "agosto").replace("September", "septiembre").replace("October", "octubre").replace("November", "noviembre").replace("December", "diciembre")
+        fecha_actual = _fecha_actual()
         fecha_text = f"<b>Fecha:</b> {fecha_actual}"
         story.append(Paragraph(fecha_text, header_style))
         story.append(Spacer(1, 0.2*inch))
@@ -178,11 +195,85 @@ def generate_resolucion_pdf(resolucion_content: str, case_id: str, output_path:
         
         # Construir PDF
         doc.build(story)
-        return True
+        return buffer.getvalue()
         
     except Exception as e:
         print(f"Error generando PDF de resolución: {e}")
         import traceback
         traceback.print_exc()
+        return None
+
+
+def generate_resolucion_pdf(resolucion_content: str, case_id: str, output_path: Path, 
+                           client_name: str = "N/A", rut_client: str = "N/A", 
+                           empresa: str = "N/A", materia: str = "N/A") -> bool:
+    """
+    Genera un PDF de resolución con template formal y lo guarda en output_path
+    
+    Args:
+        resolucion_content: Contenido de la resolución
+        case_id: ID del caso
+        output_path: Ruta donde guardar el PDF
+        client_name: Nombre del cliente
+        rut_client: RUT del cliente
+        empresa: Nombre de la empresa
+        materia: Materia del caso
+        
+    Returns:
+        True si se generó correctamente, False en caso contrario
+    """
+    pdf_bytes = render_resolucion_pdf(resolucion_content, case_id, client_name, rut_client, empresa, materia)
+    if pdf_bytes is None:
         return False
+    try:
+        output_path.write_bytes(pdf_bytes)
+        return True
+    except OSError as e:
+        print(f"Error guardando PDF de resolución en {output_path}: {e}")
+        return False
+
+
+def render_resolucion_preview(resolucion_content: str, case_id: str,
+                              client_name: str = "N/A", rut_client: str = "N/A",
+                              empresa: str = "N/A", materia: str = "N/A") -> Optional[Tuple[bytes, str]]:
+    """
+    PDF de previsualización de una resolución, desde el cache si los datos no cambiaron
+    
+    La clave es el hash de (contenido, caso, cliente, RUT, empresa, materia, fecha): la fecha
+    también va impresa en el PDF, así que una previsualización de ayer se vuelve a generar.
+    
+    Returns:
+        Tupla (bytes del PDF, hash de los datos), o None si hubo un error
+    """
+    key_data = [resolucion_content, case_id, client_name, rut_client, empresa, materia, _fecha_actual()]
+    digest = hashlib.sha256(json.dumps(key_data, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+    with _preview_cache_lock:
+        entry = _preview_cache.get(digest)
+        if entry is not None:
+            _preview_cache.move_to_end(digest)
+            return entry[1], digest
+    
+    pdf_bytes = render_resolucion_pdf(resolucion_content, case_id, client_name, rut_client, empresa, materia)
+    if pdf_bytes is None:
+        return None
+    if RESOLUCION_PREVIEW_CACHE_SIZE > 0:
+        with _preview_cache_lock:
+            _preview_cache[digest] = (case_id, pdf_bytes)
+            while len(_preview_cache) > RESOLUCION_PREVIEW_CACHE_SIZE:
+                _preview_cache.popitem(last=False)
+    return pdf_bytes, digest
+
+
+def discard_resolucion_previews(case_id: Optional[str] = None) -> int:
+    """
+    Descarta del cache las previsualizaciones de un caso (todas si case_id es None)
+    
+    Returns:
+        Número de previsualizaciones descartadas
+    """
+    with _preview_cache_lock:
+        digests = [digest for digest, (entry_case, _) in _preview_cache.items() if case_id is None or entry_case == case_id]
+        for digest in digests:
+            del _preview_cache[digest]
+    return len(digests)
 
@@ -0,0 +1,77 @@
+"""
+Serialización JSON del backend (base de datos JSON y respuestas de la API)
+Usa orjson si está instalado y la librería estándar json en caso contrario
+"""
+
+import json
+from enum import Enum
+from pathlib import Path
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa json (mismo formato, más lento)
+    orjson = None
+
+# Backend activo, para logs y benchmarks
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que JSON no soporta: fechas en ISO 8601 (igual que orjson), enums por valor y el resto como texto"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """
+    Serializa un objeto a JSON en UTF-8
+    
+    Args:
+        obj: Objeto a serializar
+        pretty: Indentar con 2 espacios (para archivos que se leen o versionan a mano)
+    
+    Returns:
+        JSON como bytes (compacto salvo que pretty=True)
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserializa JSON desde bytes o texto"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path: Path) -> Any:
+    """Lee y deserializa un archivo JSON"""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump_file(path: Path, obj: Any, pretty: bool = False):
+    """Serializa un objeto a un archivo JSON (sin escritura atómica; ver atomic_write_json)"""
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa con dumps() (orjson si está disponible)"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,85 @@
+"""
+Limpieza de los archivos temporales de previsualización (TEMP_PDFS_DIR)
+Corre en un thread en segundo plano cada TEMP_CLEANUP_INTERVAL segundos, en vez de en cada request
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import logging
+
+from src.config import TEMP_CLEANUP_INTERVAL, TEMP_MAX_AGE_HOURS, TEMP_PDFS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def cleanup_temp_previews(case_id: Optional[str] = None, max_age_hours: int = TEMP_MAX_AGE_HOURS,
+                          temp_dir: Path = TEMP_PDFS_DIR) -> int:
+    """
+    Limpia archivos temporales de preview.
+    
+    Args:
+        case_id: Si se proporciona, solo limpia previews de este caso. Si es None, limpia todos los previews antiguos.
+        max_age_hours: Edad máxima en horas para considerar un archivo como antiguo
+        temp_dir: Directorio de los archivos temporales
+    
+    Returns:
+        Número de archivos eliminados
+    """
+    if not temp_dir.exists():
+        return 0
+    
+    current_time = time.time()
+    max_age_seconds = max_age_hours * 3600
+    deleted_count = 0
+    
+    for file_path in temp_dir.glob("resolucion_preview_*.pdf"):
+        try:
+            # Si se especifica un case_id, solo eliminar si el nombre contiene ese case_id
+            if case_id and case_id not in file_path.name:
+                continue
+            
+            # Verificar edad del archivo
+            file_age = current_time - file_path.stat().st_mtime
+            
+            # Eliminar si es específico del caso o si es antiguo
+            if case_id or file_age > max_age_seconds:
+                file_path.unlink()
+                deleted_count += 1
+        except Exception as e:
+            logger.warning(f"Error al eliminar archivo temporal {file_path}: {e}")
+    
+    if deleted_count > 0:
+        logger.info(f"Limpieza de previews temporales: {deleted_count} archivo(s) eliminado(s)")
+    return deleted_count
+
+
+class TempCleaner:
+    """Thread que llama a cleanup_temp_previews cada interval segundos hasta stop()"""
+    
+    def __init__(self, interval: int = TEMP_CLEANUP_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="temp-cleanup", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        # La primera limpieza al iniciar: quedan archivos de ejecuciones anteriores
+        while True:
+            try:
+                cleanup_temp_previews()
+            except Exception as e:
+                logger.warning(f"Error en la limpieza de archivos temporales: {e}")
+            if self._stop.wait(self.interval):
+                return
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -107,7 +107,25 @@ export const casosAPI = {
   
   // Calcular CNR (What-if, no guarda en BD)
   calculateCNR: (caseId, calculationData) =>
-    api.post(`/casos/${caseId}/calculate-cnr`, calculationData)
+    api.post(`/casos/${caseId}/calculate-cnr`, calculationData),
+  
+  // Número de páginas de un documento (PDF o DOCX)
+  getDocumentoPaginas: (caseId, fileId) => {
+    const mode = getMode()
+    return api.get(`/casos/${caseId}/documentos/${fileId}/paginas`, { params: { mode } })
+  },
+  
+  // URL de la imagen de una página (evidence_data.page_index) o de su miniatura, para usar en <img>
+  getPaginaUrl: (caseId, fileId, pageIndex = 0, thumbnail = false, dpi = null) => {
+    const params = new URLSearchParams({ mode: getMode() })
+    if (thumbnail) {
+      params.set('thumbnail', 'true')
+    }
+    if (dpi) {
+      params.set('dpi', dpi)
+    }
+    return `${api.defaults.baseURL}/casos/${caseId}/documentos/${fileId}/paginas/${pageIndex}?${params}`
+  }
 }
 
 export default api